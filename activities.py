@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+宜忌事项编码模块
+黄历宜忌、各星座宜忌和冲煞提醒中的每个事项对应一个整数编号，
+合并多组事项时用编号位掩码记录已出现的事项，按首次出现的顺序（黄历 → 星座 → 冲煞提醒）输出，
+输出只取决于输入顺序，与编号无关，同一输入在任何进程中都得到完全相同的输出
+"""
+
+import threading
+
+from metaphysics import MetaphysicsAnalyzer
+from horoscope import HoroscopeGenerator
+
+
+# 冲煞时追加的忌做事项
+CLASH_EXTRAS = ["避免重大决策"]
+
+
+class ActivityCatalog:
+    """
+    事项编号表
+
+    编号按注册顺序分配，只用于合并时去重；未登记的事项在首次出现时追加到末尾
+    """
+
+    def __init__(self, groups=()):
+        self._ids = {}
+        self._names = []
+        self._lock = threading.Lock()
+        for names in groups:
+            for name in names:
+                self.register(name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def register(self, name):
+        """返回事项编号，未登记时分配新编号"""
+        activity_id = self._ids.get(name)
+        if activity_id is None:
+            with self._lock:
+                activity_id = self._ids.get(name)
+                if activity_id is None:
+                    activity_id = len(self._names)
+                    self._names.append(name)
+                    self._ids[name] = activity_id
+        return activity_id
+
+    def merge(self, *groups, limit=None):
+        """
+        合并多组事项：按首次出现的顺序保留，重复的事项用位掩码跳过，最多 limit 个
+        """
+        seen = 0
+        merged = []
+        for names in groups:
+            for name in names:
+                bit = 1 << self.register(name)
+                if seen & bit:
+                    continue
+                seen |= bit
+                merged.append(name)
+                if limit is not None and len(merged) >= limit:
+                    return merged
+        return merged
+
+
+def _almanac_activities():
+    for advice in MetaphysicsAnalyzer.DAILY_Advice.values():
+        yield from advice["宜"]
+        yield from advice["忌"]
+    yield from MetaphysicsAnalyzer.DEFAULT_ADVICE["宜"]
+    yield from MetaphysicsAnalyzer.DEFAULT_ADVICE["忌"]
+
+
+# 默认星座排在最前，新增星座不改变已有事项的编号顺序
+_SIGN_ORDER = [HoroscopeGenerator.DEFAULT_SIGN] + [
+    sign for sign in HoroscopeGenerator.STAR_SIGNS if sign != HoroscopeGenerator.DEFAULT_SIGN
+]
+
+CATALOG = ActivityCatalog([
+    _almanac_activities(),
+    *(HoroscopeGenerator.SIGNS[sign]["yi"] for sign in _SIGN_ORDER),
+    *(HoroscopeGenerator.SIGNS[sign]["ji"] for sign in _SIGN_ORDER),
+    CLASH_EXTRAS,
+])
+
+
+# 测试
+if __name__ == "__main__":
+    print(f"事项数: {len(CATALOG)}")
+    print(CATALOG.merge(["整理家居", "祭祀", "沐浴"], ["祭祀", "理财规划"]))
+    print(CATALOG.merge(["整理家居", "祭祀", "沐浴"], ["祭祀", "理财规划"], CLASH_EXTRAS, limit=3))
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+性能基准测试
+覆盖分析、星座运势、综合报告、消息渲染和推送（本地模拟服务）等热点路径，
+输出吞吐、延迟分位数和内存分配，可保存 JSON 基线并在性能回退时失败
+
+用法:
+    python3 benchmark.py                          # 运行全部基准
+    python3 benchmark.py --filter synthesize      # 只运行名称包含 synthesize 的基准
+    python3 benchmark.py --save bench.json        # 保存基线
+    python3 benchmark.py --compare bench.json --threshold 0.15   # 吞吐下降超过 15% 时失败
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from metaphysics import MetaphysicsAnalyzer
+from horoscope import HoroscopeGenerator
+from synthesizer import FortuneSynthesizer
+from pusher import ServerChanPusher
+from channels import latency_stats
+from mock_server import MockServerChan
+
+
+def _dates(count=366):
+    """基准使用的日期序列（循环使用，避免只测单一日期）"""
+    start = datetime.date(2026, 1, 1)
+    return [start + datetime.timedelta(days=i) for i in range(count)]
+
+
+class Benchmark:
+    """单个基准：setup 返回被测函数 (接收第 i 次调用的序号)，teardown 可选"""
+
+    def __init__(self, name, setup, teardown=None):
+        self.name = name
+        self.setup = setup
+        self.teardown = teardown
+
+
+def _bench_analyze_day():
+    analyzer = MetaphysicsAnalyzer()
+    dates = _dates()
+    return lambda i: analyzer.analyze_day(dates[i % len(dates)])
+
+
+def _bench_get_daily_fortune():
+    generator = HoroscopeGenerator()
+    dates = _dates()
+    return lambda i: generator.get_daily_fortune(dates[i % len(dates)])
+
+
+def _bench_synthesize():
+    synthesizer = FortuneSynthesizer()
+    dates = _dates()
+    return lambda i: synthesizer.synthesize(dates[i % len(dates)])
+
+
+def _bench_format_fortune_message():
+    synthesizer = FortuneSynthesizer()
+    pusher = ServerChanPusher()
+    reports = [synthesizer.synthesize(d) for d in _dates()]
+    return lambda i: pusher.format_fortune_message(reports[i % len(reports)])
+
+
+_mock = None
+
+
+def _bench_push():
+    global _mock
+    _mock = MockServerChan().start()
+    pusher = ServerChanPusher(api_url=_mock.url, rate_limit=0)
+    report = FortuneSynthesizer().synthesize(_dates()[0])
+    title, content, short = pusher.format_fortune_message(report)
+    return lambda i: pusher.push(title, content, short, sckey="BENCH")
+
+
+def _stop_mock():
+    global _mock
+    if _mock is not None:
+        _mock.stop()
+        _mock = None
+
+
+BENCHMARKS = [
+    Benchmark("analyze_day", _bench_analyze_day),
+    Benchmark("get_daily_fortune", _bench_get_daily_fortune),
+    Benchmark("synthesize", _bench_synthesize),
+    Benchmark("format_fortune_message", _bench_format_fortune_message),
+    Benchmark("push", _bench_push, _stop_mock),
+]
+
+
+def run_benchmark(bench, duration=1.0, warmup=0.2, alloc_samples=200):
+    """
+    运行单个基准
+
+    Returns:
+        dict: ops_per_sec、延迟分位数（微秒）、每次调用的内存分配
+    """
+    func = bench.setup()
+    try:
+        # 预热
+        i = 0
+        deadline = time.perf_counter() + warmup
+        while time.perf_counter() < deadline:
+            func(i)
+            i += 1
+
+        # 计时
+        latencies = []
+        clock = time.perf_counter
+        started = clock()
+        deadline = started + duration
+        while True:
+            t0 = clock()
+            func(i)
+            t1 = clock()
+            latencies.append(t1 - t0)
+            i += 1
+            if t1 >= deadline:
+                break
+        elapsed = clock() - started
+
+        # 内存分配（单独测量，避免 tracemalloc 影响计时）
+        samples = min(alloc_samples, len(latencies))
+        tracemalloc.start()
+        peak_total = 0
+        for j in range(samples):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            func(i + j)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - base
+        tracemalloc.stop()
+    finally:
+        if bench.teardown:
+            bench.teardown()
+
+    stats = latency_stats(latencies)
+    return {
+        "ops": len(latencies),
+        "ops_per_sec": len(latencies) / elapsed,
+        "mean_us": stats["mean_ms"] * 1000,
+        "p50_us": stats["p50_ms"] * 1000,
+        "p95_us": stats["p95_ms"] * 1000,
+        "p99_us": stats["p99_ms"] * 1000,
+        "max_us": stats["max_ms"] * 1000,
+        "alloc_peak_bytes": peak_total / samples if samples else 0
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    与基线对比吞吐
+
+    Returns:
+        list: 回退超过阈值的 (名称, 基线 ops/s, 当前 ops/s, 变化比例)
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        change = result["ops_per_sec"] / base["ops_per_sec"] - 1
+        if change < -threshold:
+            regressions.append((name, base["ops_per_sec"], result["ops_per_sec"], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="每日运势性能基准测试")
+    parser.add_argument("--filter", default="", help="只运行名称包含该字符串的基准")
+    parser.add_argument("--duration", type=float, default=1.0, help="每个基准的计时时长（秒）")
+    parser.add_argument("--save", help="将结果保存为 JSON 基线")
+    parser.add_argument("--compare", help="与 JSON 基线对比")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="允许的吞吐下降比例，默认 0.10")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'基准':<24}{'ops/s':>12}{'p50(us)':>12}{'p95(us)':>12}{'p99(us)':>12}{'分配(KB)':>12}")
+    for bench in BENCHMARKS:
+        if args.filter not in bench.name:
+            continue
+        result = run_benchmark(bench, duration=args.duration)
+        results[bench.name] = result
+        print(f"{bench.name:<24}{result['ops_per_sec']:>12.0f}{result['p50_us']:>12.1f}"
+              f"{result['p95_us']:>12.1f}{result['p99_us']:>12.1f}"
+              f"{result['alloc_peak_bytes'] / 1024:>12.1f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "results": results
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ 性能回退超过 {args.threshold:.0%}:")
+            for name, before, after, change in regressions:
+                print(f"  {name}: {before:.0f} -> {after:.0f} ops/s ({change:+.1%})")
+            return 1
+        print(f"\n✅ 无超过 {args.threshold:.0%} 的性能回退")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+运势报告缓存模块
+报告和渲染结果只取决于日期和少数用户字段，按 (日期, 用户指纹, 代码版本) 缓存，
+相同指纹的用户每晚只需合成和渲染一次
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from config import REPORT_CACHE_DIR, REPORT_CACHE_MAX_BYTES
+from metrics import STAGE_SECONDS
+from synthesizer import FortuneSynthesizer
+from templates import default_template
+
+
+logger = logging.getLogger(__name__)
+
+# 影响报告内容的用户字段
+FINGERPRINT_FIELDS = ("birth_year", "zodiac", "element_detail", "favored_elements", "忌用元素", "star_sign")
+
+# 参与计算代码版本的模块（任一文件变化都会使缓存失效）
+VERSION_MODULES = ("config", "metaphysics", "horoscope", "synthesizer", "templates", "activities", "rules")
+
+# 参与计算代码版本的数据文件
+VERSION_DATA = ("star_signs.json",)
+
+# 磁盘层文件损坏或写入不完整时 pickle.loads 可能抛出的异常（视为未命中）
+CORRUPT_ERRORS = (pickle.UnpicklingError, EOFError, ValueError, TypeError, IndexError,
+                  AttributeError, ImportError)
+
+_code_version = None
+
+
+def code_version():
+    """根据运势计算相关源码生成版本号（首次调用时计算）"""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha1()
+        here = os.path.dirname(os.path.abspath(__file__))
+        for file_name in [name + ".py" for name in VERSION_MODULES] + list(VERSION_DATA):
+            with open(os.path.join(here, file_name), "rb") as f:
+                digest.update(f.read())
+        _code_version = digest.hexdigest()[:12]
+    return _code_version
+
+
+def profile_fingerprint(profile):
+    """用户指纹：只包含影响报告内容的字段"""
+    data = [profile.get(field) for field in FINGERPRINT_FIELDS]
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    """
+    两级报告缓存
+    内存层为按字节数淘汰的 LRU，磁盘层（可选）每个条目一个 pickle 文件
+
+    条目格式: {"title": 标题, "content": 正文, "short": 摘要}
+    """
+
+    def __init__(self, max_bytes=None, disk_dir=None, version=None):
+        self.max_bytes = max_bytes or REPORT_CACHE_MAX_BYTES
+        self.disk_dir = disk_dir if disk_dir is not None else REPORT_CACHE_DIR
+        self.version = version or code_version()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def key(self, target_date, profile):
+        """缓存键: (日期, 用户指纹, 代码版本)"""
+        if isinstance(target_date, datetime.date):
+            target_date = target_date.strftime("%Y-%m-%d")
+        return (target_date, profile_fingerprint(profile), self.version)
+
+    def _disk_path(self, key):
+        name = hashlib.sha1("|".join(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, key[0], name + ".pkl")
+
+    def get(self, key):
+        """读取缓存条目，未命中返回 None"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[0]
+
+        if self.disk_dir:
+            entry, size = self._load(key)
+            if entry is not None:
+                self._store(key, entry, size)
+                with self._lock:
+                    self.disk_hits += 1
+                return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _load(self, key):
+        """
+        读取磁盘层条目，文件不存在或已损坏时返回 (None, 0)，损坏的文件直接删除
+
+        Returns:
+            tuple: (条目, 字节数)
+        """
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+        except FileNotFoundError:
+            return None, 0
+        try:
+            entry = pickle.loads(blob)
+        except CORRUPT_ERRORS as e:
+            logger.warning(f"缓存文件损坏，删除后重新生成: {path}（{type(e).__name__}: {e}）")
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None, 0
+        return entry, len(blob)
+
+    def put(self, key, entry):
+        """写入缓存条目（内存层，启用时同时写磁盘层）"""
+        blob = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store(key, entry, len(blob))
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, path)
+
+    def _store(self, key, entry, size):
+        """写入内存层，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (entry, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def build_many(self, profiles, target_date, synthesizer=None, template=None, timings=None):
+        """
+        批量获取渲染结果
+        按指纹去重，只对未命中的指纹合成并渲染一次
+
+        Args:
+            timings: 可选字典，各阶段（synthesize / format）耗时秒数累加到其中，
+                     供工作进程把耗时带回主进程记录指标
+
+        Returns:
+            list: 与 profiles 顺序一致的缓存条目（相同指纹的用户共享同一条目）
+        """
+        synthesizer = synthesizer or FortuneSynthesizer()
+        template = template or default_template()
+
+        profiles = list(profiles)
+        keys = [self.key(target_date, profile) for profile in profiles]
+
+        found = {}
+        missing = {}
+        for key, profile in zip(keys, profiles):
+            if key in found or key in missing:
+                continue
+            entry = self.get(key)
+            if entry is None:
+                missing[key] = profile
+            else:
+                found[key] = entry
+
+        if missing:
+            started = time.perf_counter()
+            reports = synthesizer.synthesize_many(list(missing.values()), target_date)
+            rendered = time.perf_counter()
+            for key, report in zip(missing, reports):
+                title, content, short = template.render(report)
+                entry = {"title": title, "content": content, "short": short}
+                self.put(key, entry)
+                found[key] = entry
+            finished = time.perf_counter()
+
+            STAGE_SECONDS.labels("synthesize").observe(rendered - started)
+            STAGE_SECONDS.labels("format").observe(finished - rendered)
+            if timings is not None:
+                timings["synthesize"] = timings.get("synthesize", 0.0) + rendered - started
+                timings["format"] = timings.get("format", 0.0) + finished - rendered
+
+        return [found[key] for key in keys]
+
+    def prune_disk(self, before_date):
+        """删除磁盘层中早于 before_date 的日期目录"""
+        if not self.disk_dir:
+            return 0
+        if isinstance(before_date, datetime.date):
+            before_date = before_date.strftime("%Y-%m-%d")
+        removed = 0
+        for name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, name)
+            if os.path.isdir(path) and name < before_date:
+                for file_name in os.listdir(path):
+                    os.remove(os.path.join(path, file_name))
+                    removed += 1
+                os.rmdir(path)
+        return removed
+
+    def stats(self):
+        """缓存统计"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses
+            }
+
+
+# 测试
+if __name__ == "__main__":
+    from config import USER_PROFILE
+
+    target = datetime.date.today() + datetime.timedelta(days=1)
+    profiles = [dict(USER_PROFILE, name=f"用户{i}") for i in range(1000)]
+
+    cache = ReportCache()
+    entries = cache.build_many(profiles, target)
+    print(f"用户数: {len(entries)}, 不同条目: {len({id(e) for e in entries})}")
+    print(f"缓存统计: {cache.stats()}")
+    print(entries[0]["title"])
@@ -0,0 +1,638 @@
+# -*- coding: utf-8 -*-
+"""
+多渠道推送模块
+各推送渠道（Server酱、Webhook、SMTP 邮件）共用限速、重试和自适应并发逻辑，
+每个渠道有独立的连接池、工作线程池、并发上限和重试策略；
+ChannelRouter 按每条消息的 channel 字段把消息分发到对应渠道，慢渠道不会拖住其他渠道
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    CHANNELS, DEFAULT_CHANNEL,
+    PUSH_RATE_LIMIT, PUSH_BURST, PUSH_MAX_RETRIES, PUSH_CONCURRENCY
+)
+from ratelimit import TokenBucket, RetryPolicy, AimdLimiter
+from templates import default_template
+from metrics import PUSH_REQUEST_SECONDS, PUSH_REQUESTS, PUSH_RETRIES, PUSH_RESULTS
+
+
+# 各渠道从用户信息中读取地址的字段
+ADDRESS_FIELDS = {
+    "serverchan": "sckey",
+    "webhook": "webhook_url",
+    "email": "email"
+}
+
+
+def route_fields(profile, default=None):
+    """
+    订阅用户的推送渠道和地址，合并到消息字典中使用
+
+    Returns:
+        dict: {"channel": 渠道名, "address": 渠道地址（未设置时为 None，使用渠道默认地址）}
+    """
+    name = profile.get("channel") or default or DEFAULT_CHANNEL
+    return {"channel": name, "address": profile.get(ADDRESS_FIELDS.get(name, ""))}
+
+
+def latency_stats(latencies, elapsed=None):
+    """
+    汇总延迟统计（单位：毫秒）
+
+    Args:
+        latencies: 每条消息的耗时列表（秒）
+        elapsed: 整批总耗时（秒），用于计算吞吐
+    """
+    ordered = sorted(latencies)
+    count = len(ordered)
+
+    def percentile(p):
+        if not ordered:
+            return 0.0
+        index = min(count - 1, max(0, int(round(p / 100 * count + 0.5)) - 1))
+        return ordered[index] * 1000
+
+    stats = {
+        "count": count,
+        "mean_ms": (sum(ordered) / count * 1000) if count else 0.0,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0
+    }
+    if elapsed is not None:
+        stats["elapsed_s"] = elapsed
+        stats["throughput"] = count / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+def summarize(results, elapsed):
+    """汇总批量推送结果"""
+    stats = latency_stats([r["latency"] for r in results], elapsed)
+    stats["success"] = sum(1 for r in results if r["success"])
+    stats["failed"] = len(results) - stats["success"]
+    stats["retries"] = sum(r["attempts"] - 1 for r in results if r["attempts"])
+    return stats
+
+
+class Channel:
+    """
+    推送渠道基类
+    子类实现 _endpoint（地址 → 请求目标）、_payload（消息 → 请求数据）和 _send（发送一次并解析结果）；
+    未显式传入的参数取 config.CHANNELS 中该渠道的配置
+
+    Args:
+        timeout: 单次请求超时（秒）
+        concurrency: 最大并发数（也是该渠道工作线程数和连接池大小）
+        rate_limit: 每个目标每秒最多请求数，0 表示不限速
+        burst: 令牌桶容量
+        retry_policy: 重试策略，默认按渠道配置的 max_retries 重试
+    """
+
+    # 渠道名（消息和用户信息中 channel 字段的取值）
+    NAME = ""
+
+    # 默认请求超时（秒）
+    TIMEOUT = 10
+
+    def __init__(self, timeout=None, concurrency=None, rate_limit=None, burst=None, retry_policy=None):
+        settings = CHANNELS.get(self.NAME, {})
+        self.timeout = timeout or settings.get("timeout") or self.TIMEOUT
+        self.concurrency = concurrency or settings.get("concurrency") or PUSH_CONCURRENCY
+        if rate_limit is None:
+            rate_limit = settings.get("rate_limit", PUSH_RATE_LIMIT)
+        self.rate_limit = rate_limit
+        self.burst = burst or settings.get("burst") or PUSH_BURST
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_retries=settings.get("max_retries", PUSH_MAX_RETRIES)
+        )
+        # 自适应并发：从较低并发起步，根据上游反馈增减
+        self.limiter = AimdLimiter(
+            initial=min(4, self.concurrency),
+            maximum=self.concurrency,
+            latency_target=self.timeout / 2
+        )
+        self._buckets = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        """渠道专属的工作线程池，线程数与并发上限一致"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.concurrency, thread_name_prefix=f"push-{self.NAME}"
+                    )
+        return self._executor
+
+    def warm(self):
+        """提前创建工作线程池（和连接池），发送时不再承担这些开销"""
+        self.executor
+
+    def close(self):
+        """关闭工作线程池和连接"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _bucket(self, key):
+        """每个目标一个令牌桶"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(key, TokenBucket(self.rate_limit, self.burst))
+        return bucket
+
+    def _rate_key(self, endpoint):
+        """限速维度，默认按请求目标"""
+        return endpoint
+
+    def _endpoint(self, address):
+        raise NotImplementedError
+
+    def _payload(self, title, content, short_content):
+        raise NotImplementedError
+
+    def _send(self, endpoint, data):
+        raise NotImplementedError
+
+    def address_of(self, message):
+        """消息在本渠道的地址"""
+        return message.get("address") or message.get(ADDRESS_FIELDS.get(self.NAME, ""))
+
+    def push(self, title, content, short_content=None, address=None):
+        """
+        发送一条消息
+        按目标限速，可重试的失败（超时、限流、服务端错误）按指数退避重试
+
+        Args:
+            title: 推送标题
+            content: 推送内容（Markdown格式）
+            short_content: 简短内容摘要
+            address: 渠道地址，默认使用渠道配置的地址
+
+        Returns:
+            dict: 推送结果（attempts 为实际请求次数）
+        """
+        endpoint = self._endpoint(address)
+        bucket = self._bucket(self._rate_key(endpoint)) if self.rate_limit else None
+        data = self._payload(title, content, short_content)
+
+        attempt = 0
+        while True:
+            if bucket is not None:
+                bucket.acquire()
+
+            start = time.perf_counter()
+            result = self._send(endpoint, data)
+            latency = time.perf_counter() - start
+            PUSH_REQUEST_SECONDS.labels(self.NAME).observe(latency)
+            PUSH_REQUESTS.labels(self.NAME, result.get("status") or "network").inc()
+
+            retryable = self.retry_policy.is_retryable(result)
+            self.limiter.feedback(result["success"], latency, overloaded=retryable)
+
+            if not retryable or attempt >= self.retry_policy.max_retries:
+                result["attempts"] = attempt + 1
+                PUSH_RESULTS.labels(self.NAME, "success" if result["success"] else "failed").inc()
+                return result
+
+            retry_after = result.get("retry_after")
+            if retry_after is not None and bucket is not None:
+                bucket.penalize(retry_after)
+            time.sleep(self.retry_policy.backoff(attempt, retry_after))
+            PUSH_RETRIES.labels(self.NAME).inc()
+            attempt += 1
+
+    def _push_message(self, message):
+        """在自适应并发限制下推送单条消息并记录耗时"""
+        with self.limiter:
+            start = time.perf_counter()
+            result = self.push(
+                message["title"],
+                message["content"],
+                message.get("short"),
+                self.address_of(message)
+            )
+            result["latency"] = time.perf_counter() - start
+        return result
+
+    def submit(self, message):
+        """提交到渠道的工作线程池，返回 Future"""
+        return self.executor.submit(self._push_message, message)
+
+    def _summarize(self, results, elapsed):
+        stats = summarize(results, elapsed)
+        stats["concurrency"] = self.limiter.current
+        return {"results": results, "stats": stats}
+
+    def push_many(self, messages, concurrency=None):
+        """
+        批量推送，共享连接池
+        并发数在 concurrency 以内按上游的错误率和延迟自适应调整
+
+        Args:
+            messages: 消息列表，每条为 {"title", "content", "short", "address"} 字典
+                      （short / address 可省略）
+            concurrency: 最大并发数，默认使用渠道的工作线程池（self.concurrency）
+
+        Returns:
+            dict: {"results": 与 messages 顺序一致的推送结果, "stats": 延迟统计}
+        """
+        messages = list(messages)
+
+        start = time.perf_counter()
+        if concurrency is None:
+            futures = [self.submit(message) for message in messages]
+            results = [future.result() for future in futures]
+        else:
+            workers = min(concurrency, max(1, len(messages)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._push_message, messages))
+        return self._summarize(results, time.perf_counter() - start)
+
+    async def push_many_async(self, messages, concurrency=None):
+        """
+        push_many 的 asyncio 版本
+        请求在渠道的工作线程池中执行，由信号量限制同时在途的请求数
+        """
+        import asyncio
+
+        messages = list(messages)
+        workers = min(concurrency or self.concurrency, max(1, len(messages)))
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(workers)
+
+        async def send(message):
+            async with semaphore:
+                return await loop.run_in_executor(self.executor, self._push_message, message)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(send(m) for m in messages))
+        return self._summarize(list(results), time.perf_counter() - start)
+
+
+class HttpChannel(Channel):
+    """基于 HTTP 的渠道，复用 requests 会话"""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._session = None
+
+    @property
+    def session(self):
+        """
+        复用的 HTTP 会话
+        连接池大小与并发数一致，避免每条消息都重新 DNS 解析和 TCP/TLS 握手
+        """
+        if self._session is None:
+            # requests 加载较慢，首次推送时才导入
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.concurrency
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def warm(self):
+        super().warm()
+        self.session
+
+    def close(self):
+        """关闭工作线程池和连接池"""
+        super().close()
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    @staticmethod
+    def _retry_after(response):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return int(retry_after)
+        return None
+
+
+class WebhookChannel(HttpChannel):
+    """
+    通用 Webhook 渠道
+    以 JSON 形式 POST {"title", "content", "short"}，2xx 视为送达
+
+    Args:
+        url: 默认 Webhook 地址（用户信息中的 webhook_url 优先）
+        headers: 附加请求头（如鉴权）
+    """
+
+    NAME = "webhook"
+
+    def __init__(self, url=None, headers=None, **options):
+        super().__init__(**options)
+        settings = CHANNELS.get(self.NAME, {})
+        self.url = url or settings.get("url")
+        self.headers = headers or settings.get("headers") or {}
+
+    def _endpoint(self, address):
+        return address or self.url
+
+    def _payload(self, title, content, short_content):
+        return {"title": title, "content": content, "short": short_content or ""}
+
+    def _send(self, url, data):
+        if not url:
+            return {"success": False, "message": "推送失败: 未配置 Webhook 地址",
+                    "status": None, "retryable": False, "data": None}
+        status = None
+        try:
+            response = self.session.post(url, json=data, headers=self.headers, timeout=self.timeout)
+            status = response.status_code
+            if 200 <= status < 300:
+                return {"success": True, "message": "推送成功", "status": status, "data": None}
+            failure = {
+                "success": False,
+                "message": f"推送失败: HTTP {status}",
+                "status": status,
+                "data": response.text[:200]
+            }
+            retry_after = self._retry_after(response)
+            if retry_after is not None:
+                failure["retry_after"] = retry_after
+            return failure
+        except Exception as e:
+            return {"success": False, "message": f"推送异常: {str(e)}", "status": None, "data": None}
+
+
+class SmtpChannel(Channel):
+    """
+    SMTP 邮件渠道
+    连接在工作线程间复用（连接数不超过并发上限），4xx 临时错误和断线可重试，5xx 永久错误不重试
+
+    Args:
+        host / port: SMTP 服务地址
+        sender: 发件人
+        username / password: 登录凭据，为空时不登录
+        starttls: 是否使用 STARTTLS
+    """
+
+    NAME = "email"
+
+    def __init__(self, host=None, port=None, sender=None, username=None, password=None,
+                 starttls=None, **options):
+        super().__init__(**options)
+        settings = CHANNELS.get(self.NAME, {})
+        self.host = host or settings.get("host", "localhost")
+        self.port = port or settings.get("port", 25)
+        self.sender = sender or settings.get("sender", "fortune@localhost")
+        self.username = username or settings.get("username")
+        self.password = password or settings.get("password")
+        self.starttls = settings.get("starttls", False) if starttls is None else starttls
+        self._idle = []
+
+    def _connect(self):
+        import smtplib
+
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password or "")
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.concurrency:
+                self._idle.append(conn)
+                return
+        self._quit(conn)
+
+    @staticmethod
+    def _quit(conn):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def close(self):
+        """关闭工作线程池和所有空闲连接"""
+        super().close()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._quit(conn)
+
+    def _rate_key(self, endpoint):
+        # 限速针对 SMTP 服务而不是收件人
+        return f"{self.host}:{self.port}"
+
+    def _endpoint(self, address):
+        return address
+
+    def _payload(self, title, content, short_content):
+        return {"title": title, "content": content}
+
+    def _send(self, recipient, data):
+        import smtplib
+        from email.message import EmailMessage
+
+        if not recipient:
+            return {"success": False, "message": "推送失败: 未设置收件地址",
+                    "status": None, "retryable": False, "data": None}
+
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = recipient
+        message["Subject"] = data["title"]
+        message.set_content(data["content"])
+
+        conn = None
+        try:
+            conn = self._acquire()
+            conn.send_message(message)
+            self._release(conn)
+            return {"success": True, "message": "推送成功", "status": 250, "data": None}
+        except smtplib.SMTPRecipientsRefused as e:
+            self._release(conn)
+            code = min(code for code, _ in e.recipients.values())
+            return {"success": False, "message": f"推送失败: 收件人被拒绝 {recipient}",
+                    "status": code, "retryable": code < 500, "data": None}
+        except smtplib.SMTPResponseException as e:
+            # 连接或登录阶段的错误没有可复用的连接
+            if conn is not None:
+                self._release(conn)
+            return {"success": False, "message": f"推送失败: SMTP {e.smtp_code} {e.smtp_error!r}",
+                    "status": e.smtp_code, "retryable": e.smtp_code < 500, "data": None}
+        except Exception as e:
+            # 断线或连接失败，丢弃连接
+            if conn is not None:
+                conn.close()
+            return {"success": False, "message": f"推送异常: {str(e)}", "status": None, "data": None}
+
+
+def channel_types():
+    """渠道名 → 渠道类"""
+    from pusher import ServerChanPusher
+    return {cls.NAME: cls for cls in (ServerChanPusher, WebhookChannel, SmtpChannel)}
+
+
+class ChannelRouter:
+    """
+    多渠道推送路由
+    按消息的 channel 字段（缺省为 default）分发到各渠道的工作线程池，各渠道并行发送，
+    提供与单个渠道相同的 push / push_many 接口
+
+    Args:
+        channels: {渠道名: 渠道实例}，未提供的渠道在首次使用时按 config.CHANNELS 创建
+        default: 默认渠道名
+        template: 消息模板
+    """
+
+    def __init__(self, channels=None, default=None, template=None):
+        self.channels = dict(channels or {})
+        self.default = default or DEFAULT_CHANNEL
+        self.template = template or default_template()
+        # 重试判断只取决于推送结果，各渠道共用
+        self.retry_policy = RetryPolicy(max_retries=PUSH_MAX_RETRIES)
+        self._lock = threading.Lock()
+
+    def channel(self, name=None):
+        """获取渠道实例，未知渠道返回 None"""
+        name = name or self.default
+        channel = self.channels.get(name)
+        if channel is None:
+            cls = channel_types().get(name)
+            if cls is None:
+                return None
+            with self._lock:
+                channel = self.channels.get(name)
+                if channel is None:
+                    channel = self.channels[name] = cls()
+        return channel
+
+    def warm(self, names=None):
+        """提前创建指定渠道（默认 default）的实例、工作线程池和连接池"""
+        for name in names or [self.default]:
+            channel = self.channel(name)
+            if channel is not None:
+                channel.warm()
+
+    def close(self):
+        """关闭所有渠道"""
+        for channel in self.channels.values():
+            channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _unknown(name):
+        return {"success": False, "message": f"未知推送渠道: {name}", "status": None,
+                "retryable": False, "data": None, "attempts": 0, "latency": 0.0}
+
+    def push(self, title, content, short_content=None, channel=None, address=None):
+        """通过指定渠道（默认 default）发送一条消息"""
+        target = self.channel(channel)
+        if target is None:
+            return self._unknown(channel)
+        return target.push(title, content, short_content, address)
+
+    def push_many(self, messages):
+        """
+        批量推送，每条消息提交到所属渠道的工作线程池
+
+        Returns:
+            dict: {"results": 与 messages 顺序一致的推送结果,
+                   "stats": 整体延迟统计，stats["channels"] 为各渠道的统计}
+        """
+        messages = list(messages)
+
+        start = time.perf_counter()
+        # 各渠道最后一条消息完成的时间，用于计算各渠道自己的吞吐
+        finished = {}
+
+        def deliver(channel, name, message):
+            result = channel._push_message(message)
+            now = time.perf_counter()
+            with self._lock:
+                finished[name] = max(finished.get(name, now), now)
+            return result
+
+        names = []
+        pending = []
+        for message in messages:
+            name = message.get("channel") or self.default
+            channel = self.channel(name)
+            names.append(name)
+            if channel is None:
+                pending.append(self._unknown(name))
+            else:
+                pending.append(channel.executor.submit(deliver, channel, name, message))
+        results = [item if isinstance(item, dict) else item.result() for item in pending]
+        elapsed = time.perf_counter() - start
+
+        grouped = {}
+        for name, result in zip(names, results):
+            grouped.setdefault(name, []).append(result)
+
+        stats = summarize(results, elapsed)
+        stats["channels"] = {}
+        for name, group in grouped.items():
+            channel_stats = summarize(group, finished.get(name, start) - start)
+            channel = self.channels.get(name)
+            channel_stats["concurrency"] = channel.limiter.current if channel is not None else 0
+            stats["channels"][name] = channel_stats
+        return {"results": results, "stats": stats}
+
+    def format_fortune_message(self, report):
+        """
+        格式化运势报告为Markdown消息（各渠道共用）
+
+        Returns:
+            tuple: (标题, 正文, 简短摘要)
+        """
+        return self.template.render(report)
+
+
+# 测试
+if __name__ == "__main__":
+    from mock_server import MockServerChan
+    from pusher import ServerChanPusher
+
+    with MockServerChan(latency_ms=5) as fast, MockServerChan(latency_ms=200) as slow:
+        router = ChannelRouter({
+            "serverchan": ServerChanPusher(api_url=fast.url, rate_limit=0),
+            "webhook": WebhookChannel(url=slow.url.format(sckey="hook"), rate_limit=0, concurrency=4)
+        })
+        messages = [{"title": "标题", "content": f"正文{i}", "short": "摘要", "sckey": "KEY",
+                     "channel": "serverchan" if i % 4 else "webhook"} for i in range(200)]
+        with router:
+            outcome = router.push_many(messages)
+        for name, stats in outcome["stats"]["channels"].items():
+            print(f"{name}: {stats['count']} 条, 成功 {stats['success']}, "
+                  f"p95 {stats['p95_ms']:.0f}ms, {stats['throughput']:.0f} 条/s")
@@ -26,6 +26,92 @@ USER_PROFILE = {
 PUSH_HOUR = 21
 PUSH_MINUTE = 0
 
+# 调度器模式下提前多少分钟合成并渲染第二天的消息（推送时间只发送）
+PRECOMPUTE_LEAD_MINUTES = 10
+
+# 默认时区（用户未指定 timezone 时使用）
+TIMEZONE = "Asia/Shanghai"
+
+# 订阅用户列表（serve 模式按每个用户的 timezone / push_hour / push_minute / channel / sckey 推送）
+# 每个用户需要唯一标识：id，或渠道地址（sckey / webhook_url / email），两者都没有的用户不会推送
+SUBSCRIBERS = [dict(USER_PROFILE, id="default")]
+
+# 订阅用户文件（JSONL / CSV，可为 .gz），batch 模式逐行流式读取，None 表示使用 SUBSCRIBERS
+SUBSCRIBERS_FILE = None
+
+# 推送限速与重试
+PUSH_RATE_LIMIT = 10      # 每个 SendKey 每秒最多请求数，0 表示不限速
+PUSH_BURST = 10           # 令牌桶容量
+PUSH_MAX_RETRIES = 3      # 可重试失败的最大重试次数
+PUSH_CONCURRENCY = 8      # 批量推送最大并发数
+
+# 推送渠道（用户信息中的 channel 字段选择渠道，缺省为 DEFAULT_CHANNEL）
+# 渠道地址取自用户信息：serverchan → sckey，webhook → webhook_url，email → email
+# 每个渠道有独立的并发数（工作线程数和连接池大小）、限速和重试次数
+DEFAULT_CHANNEL = "serverchan"
+CHANNELS = {
+    "serverchan": {
+        "concurrency": PUSH_CONCURRENCY,
+        "rate_limit": PUSH_RATE_LIMIT,
+        "burst": PUSH_BURST,
+        "max_retries": PUSH_MAX_RETRIES,
+        "timeout": 10
+    },
+    "webhook": {
+        "url": None,              # 默认地址，用户的 webhook_url 优先
+        "headers": {},
+        "concurrency": 16,
+        "rate_limit": 0,
+        "burst": 16,
+        "max_retries": 3,
+        "timeout": 10
+    },
+    "email": {
+        "host": "localhost",
+        "port": 25,
+        "sender": "fortune@localhost",
+        "username": None,
+        "password": None,
+        "starttls": False,
+        "concurrency": 4,
+        "rate_limit": 20,         # 每秒最多发送数（针对 SMTP 服务）
+        "burst": 20,
+        "max_retries": 3,
+        "timeout": 30
+    }
+}
+
+# 报告缓存
+REPORT_CACHE_MAX_BYTES = 64 * 1024 * 1024   # 内存层容量（字节）
+REPORT_CACHE_DIR = None                      # 磁盘层目录，None 表示不启用
+
+# 预计算运势日历（python3 main.py precompute 生成，不存在时实时计算）
+FORTUNE_CALENDAR_PATH = "fortune_calendar.bin"
+
+# 运行指标（Prometheus 文本格式）
+METRICS_TEXTFILE = None   # 单次执行结束后写入的 textfile 路径，None 表示不写
+METRICS_PORT = None       # 调度器模式下 /metrics 接口端口，None 表示不启动
+
+# 分阶段 CPU 性能分析（once / loadtest 的 --profile）结果目录
+PROFILE_DIR = "profile"
+
+# 推送发件箱（SQLite，记录每个用户每天的消息和送达状态，重跑时不会重复推送）
+OUTBOX_PATH = "outbox.db"      # None 表示不使用发件箱
+OUTBOX_LEASE_SECONDS = 300     # 领取后未确认的消息超过此时长可被重新领取
+OUTBOX_MAX_ATTEMPTS = 5        # 单条消息最多发送次数
+OUTBOX_RETRY_DELAY = 10        # 发送失败后重新领取前的退避基数（秒），每次失败翻倍并加抖动
+OUTBOX_RETRY_MAX_DELAY = 120   # 退避上限（秒）
+OUTBOX_ONCE_WORKER = "once"    # 单用户模式（once）的消费者标识，固定不变，重跑时释放上次中断留下的领取
+
+# 批量推送流水线（python3 main.py batch）
+PIPELINE_WORKERS = None     # 合成/渲染进程数，None 表示 CPU 核数
+PIPELINE_CHUNK_SIZE = 500   # 每个分片的用户数
+PIPELINE_QUEUE_SIZE = 4     # 待推送分片队列容量，队列满时暂停合成（背压）
+
+# 运势批量导出（python3 main.py export）
+EXPORT_WORKERS = None          # 进程数，None 表示 CPU 核数
+EXPORT_CHUNK_RECORDS = 20000   # 每个分片的记录数（日期数 × 用户数）
+
 # 颜色映射
 COLOR_MAPPING = {
     "红": {"color": "#FF4444", "element": "火", "rgb": "255, 68, 68"},
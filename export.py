@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+历史 / 未来运势批量导出模块
+日期范围 × 用户 按记录数切分为分片，分发到进程池合成并编码为 JSONL / CSV 文本，
+主进程按分片顺序流式写出（可 gzip 压缩）；在途分片数有上限，内存占用与日期范围长度无关
+scores 格式只导出评分，由向量化引擎整片计算（需要 NumPy，见 requirements-vectorized.txt）
+"""
+
+import csv
+import datetime
+import gzip
+import io
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from config import EXPORT_WORKERS, EXPORT_CHUNK_RECORDS, PIPELINE_QUEUE_SIZE, FORTUNE_CALENDAR_PATH
+from outbox import subscriber_id
+
+
+logger = logging.getLogger(__name__)
+
+# CSV 列（列表字段用 | 连接，与订阅用户 CSV 的列表格式一致）
+CSV_FIELDS = (
+    "date", "weekday", "subscriber", "name", "ganzhi", "day_element", "day_zodiac", "star_sign",
+    "fortune_level", "lucky_color", "lucky_number", "score", "do_list", "dont_list",
+    "summary", "wearing_advice", "warnings", "clash_warning"
+)
+
+# scores 格式的 CSV 列
+SCORE_FIELDS = ("date", "subscriber", "ganzhi", "fortune_level", "score")
+
+FORMATS = ("jsonl", "csv", "scores")
+
+# 进度日志间隔（秒）
+PROGRESS_INTERVAL = 5
+
+# 工作进程内复用的用户列表和合成器
+_worker_profiles = None
+_worker_synthesizer = None
+# scores 格式：向量化引擎和编码后的用户数组（首次使用时创建）
+_worker_engine = None
+_worker_encoded = None
+
+
+def _init_worker(profiles):
+    global _worker_profiles, _worker_synthesizer
+    from synthesizer import FortuneSynthesizer
+    from fortune_calendar import open_calendar
+    _worker_profiles = profiles
+    # 有预计算日历时，范围内的日期直接查表
+    _worker_synthesizer = FortuneSynthesizer(calendar=open_calendar(FORTUNE_CALENDAR_PATH))
+
+
+def _csv_row(profile, report):
+    meta, horo, final = report["metaphysics"], report["horoscope"], report["final"]
+    return (
+        report["date"], report["weekday"], subscriber_id(profile) or "", profile.get("name", ""),
+        meta["ganzhi"], meta["day_element"], meta["day_zodiac"], horo["star_sign"],
+        horo["fortune_level"], final["lucky_color"]["color"], final["lucky_number"], final["score"],
+        "|".join(final["do_list"]), "|".join(final["dont_list"]),
+        final["summary"], final["wearing_advice"], "|".join(final["warnings"]), meta["clash_warning"]
+    )
+
+
+def _score_chunk(start_date, days, offset, count):
+    """工作进程：用向量化引擎计算一个分片的评分并编码为 CSV"""
+    global _worker_engine, _worker_encoded
+    if _worker_engine is None:
+        from vectorized import VectorizedAnalyzer
+        _worker_engine = VectorizedAnalyzer()
+        _worker_encoded = _worker_engine.encode_profiles(_worker_profiles)
+
+    engine = _worker_engine
+    encoded = tuple(codes[offset:offset + count] for codes in _worker_encoded)
+    dates = engine.date_range(start_date, days)
+    result = engine.analyze(dates, encoded)
+
+    subscribers = [subscriber_id(profile) or "" for profile in _worker_profiles[offset:offset + count]]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for i, d in enumerate(dates.tolist()):
+        date_str = d.strftime("%Y-%m-%d")
+        ganzhi = engine.STEMS[result["stem"][i]] + engine.BRANCHES[result["branch"][i]]
+        levels = [engine.LEVELS[level] for level in result["horoscope_level"][i].tolist()]
+        writer.writerows(zip([date_str] * count, subscribers, [ganzhi] * count,
+                             levels, result["score"][i].tolist()))
+    return buffer.getvalue(), days * count, days
+
+
+def export_chunk(start_date, days, offset, count, fmt):
+    """
+    工作进程：合成一个分片（连续 days 天 × 用户 [offset, offset + count)）并编码
+
+    Returns:
+        tuple: (编码后的文本, 记录数, 天数)
+    """
+    if fmt == "scores":
+        return _score_chunk(start_date, days, offset, count)
+
+    profiles = _worker_profiles[offset:offset + count]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    records = 0
+    for i in range(days):
+        target_date = start_date + datetime.timedelta(days=i)
+        for profile, report in zip(profiles, _worker_synthesizer.iter_reports(profiles, target_date)):
+            if writer is not None:
+                writer.writerow(_csv_row(profile, report))
+            else:
+                record = {"subscriber": subscriber_id(profile) or "", "name": profile.get("name", ""), **report}
+                buffer.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                buffer.write("\n")
+            records += 1
+    return buffer.getvalue(), records, days
+
+
+def plan_chunks(start_date, end_date, subscribers, chunk_records=None):
+    """
+    切分分片：每个分片约 chunk_records 条记录，用户数超过 chunk_records 时同一天也按用户切分
+
+    Yields:
+        tuple: (起始日期, 天数, 用户偏移, 用户数)
+    """
+    chunk_records = chunk_records or EXPORT_CHUNK_RECORDS
+    total_days = (end_date - start_date).days + 1
+    per_slice = min(subscribers, chunk_records)
+    days_per_chunk = max(1, chunk_records // max(1, subscribers))
+    for day in range(0, total_days, days_per_chunk):
+        days = min(days_per_chunk, total_days - day)
+        for offset in range(0, subscribers, per_slice):
+            yield start_date + datetime.timedelta(days=day), days, offset, min(per_slice, subscribers - offset)
+
+
+def open_output(path, compress=None):
+    """打开输出文件，"-" 表示标准输出；.gz 结尾或 compress=True 时 gzip 压缩"""
+    compress = path.endswith(".gz") if compress is None else compress
+    if path == "-":
+        if compress:
+            return gzip.open(sys.stdout.buffer, "wt", encoding="utf-8", compresslevel=6)
+        return sys.stdout
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6)
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+class Exporter:
+    """
+    并行导出
+
+    Args:
+        profiles: 用户信息列表（每个工作进程持有一份）
+        workers: 进程数，默认 CPU 核数
+        chunk_records: 每个分片的记录数
+        queue_size: 已完成但等待写出的分片数上限，与 workers 一起限制在途分片数
+    """
+
+    def __init__(self, profiles, workers=None, chunk_records=None, queue_size=None):
+        self.profiles = list(profiles)
+        unidentified = sum(1 for profile in self.profiles if subscriber_id(profile) is None)
+        if unidentified:
+            logger.warning(f"{unidentified} 位用户没有 id 或渠道地址，导出记录的 subscriber 为空")
+        self.workers = workers or EXPORT_WORKERS or os.cpu_count() or 1
+        self.chunk_records = chunk_records or EXPORT_CHUNK_RECORDS
+        self.queue_size = queue_size or PIPELINE_QUEUE_SIZE
+
+    def run(self, start_date, end_date, output, fmt="jsonl"):
+        """
+        导出 [start_date, end_date] 范围内所有用户的运势，分片按顺序写入 output
+
+        Args:
+            output: 可写的文本文件对象
+            fmt: "jsonl"、"csv" 或 "scores"（仅评分的 CSV，需要 NumPy）
+
+        Returns:
+            dict: {"records", "days", "chunks", "elapsed_seconds", "throughput"}
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"不支持的格式: {fmt}，可选: {', '.join(FORMATS)}")
+        if fmt == "scores":
+            # 在主进程中检查，缺少 NumPy 时不必等工作进程报错
+            import numpy  # noqa: F401
+
+        total_days = (end_date - start_date).days + 1
+        stats = {"records": 0, "days": 0, "chunks": 0}
+        if fmt == "csv":
+            csv.writer(output).writerow(CSV_FIELDS)
+        elif fmt == "scores":
+            csv.writer(output).writerow(SCORE_FIELDS)
+        if total_days <= 0 or not self.profiles:
+            stats.update(elapsed_seconds=0.0, throughput=0.0)
+            return stats
+
+        started = time.perf_counter()
+        last_report = started
+        slices = -(-len(self.profiles) // min(len(self.profiles), self.chunk_records))
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.profiles,)) as pool:
+            pending = deque()
+
+            def write_next():
+                nonlocal last_report
+                text, records, days = pending.popleft().result()
+                output.write(text)
+                stats["records"] += records
+                stats["chunks"] += 1
+                stats["days"] += days / slices
+                now = time.perf_counter()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    self._log_progress(stats, total_days, now - started)
+
+            for chunk in plan_chunks(start_date, end_date, len(self.profiles), self.chunk_records):
+                pending.append(pool.submit(export_chunk, *chunk, fmt))
+                # 按提交顺序写出，在途分片数受限
+                while len(pending) >= self.workers + self.queue_size:
+                    write_next()
+
+            while pending:
+                write_next()
+
+        elapsed = time.perf_counter() - started
+        stats["days"] = total_days
+        stats["elapsed_seconds"] = elapsed
+        stats["throughput"] = stats["records"] / elapsed if elapsed > 0 else 0.0
+        return stats
+
+    @staticmethod
+    def _log_progress(stats, total_days, elapsed):
+        rate = stats["records"] / elapsed if elapsed > 0 else 0.0
+        done = stats["days"] / total_days
+        eta = elapsed / done - elapsed if done > 0 else 0.0
+        logger.info(f"进度 {done:.1%}（{stats['days']:.0f}/{total_days} 天），已导出 {stats['records']} 条，"
+                    f"{rate:.0f} 条/s，预计剩余 {eta:.0f}s")
+
+
+# 测试
+if __name__ == "__main__":
+    from config import USER_PROFILE
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    zodiacs = ["鼠", "牛", "虎", "兔", "龙", "蛇", "马", "羊", "猴", "鸡", "狗", "猪"]
+    profiles = [dict(USER_PROFILE, id=f"user{i}", zodiac=zodiacs[i % 12], birth_year=1950 + i % 60)
+                for i in range(100)]
+
+    import tempfile
+    path = os.path.join(tempfile.gettempdir(), "fortune_export.jsonl.gz")
+    with open_output(path) as f:
+        stats = Exporter(profiles).run(datetime.date(2020, 1, 1), datetime.date(2029, 12, 31), f)
+    logger.info(f"✅ 导出 {stats['records']} 条（{stats['days']} 天），耗时 {stats['elapsed_seconds']:.2f}s，"
+                f"{stats['throughput']:.0f} 条/s，写入 {path}（{os.path.getsize(path)} 字节）")
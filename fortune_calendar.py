@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+预计算运势日历模块
+将一段日期内与用户无关的运势数据写入定长二进制文件，推送时内存映射后按日期 O(1) 查找
+
+文件结构:
+    文件头 | 每日记录 × 天数
+    每日记录 = 日期信息 | 12 个生肖的冲煞/三合标志 | 每个星座的运势抽取结果
+"""
+
+import datetime
+import mmap
+import os
+import struct
+
+from cache import code_version
+from config import ZODIAC_CLASH, ZODIAC_HARMONY
+from horoscope import HoroscopeGenerator
+from metaphysics import MetaphysicsAnalyzer
+
+
+MAGIC = b"FCAL"
+FORMAT_VERSION = 1
+
+# 魔数, 格式版本, 星座数, 单条记录字节数, 起始日(距1900-01-01天数), 天数, 代码版本
+HEADER = struct.Struct("<4sHBHiI12s")
+# 天干索引, 地支索引, 当日五行编码, 当日生肖编码
+DAY = struct.Struct("<BBBB")
+# 等级, 描述, 颜色抽签值, 幸运数字, 宜×4, 忌×4, 特征×3（不足用 0xFF 补齐）
+SIGN = struct.Struct("<BBHB4B4B3B")
+
+ZODIACS = ["鼠", "牛", "虎", "兔", "龙", "蛇", "马", "羊", "猴", "鸡", "狗", "猪"]
+ELEMENTS = ["木", "火", "土", "金", "水"]
+
+# 生肖标志位
+FLAG_CLASH = 1
+FLAG_HARMONY = 2
+
+BASE_DATE = datetime.date(1900, 1, 1)
+EMPTY = 0xFF
+
+
+def _pad(values, size):
+    return tuple(values) + (EMPTY,) * (size - len(values))
+
+
+def _unpad(values):
+    return tuple(v for v in values if v != EMPTY)
+
+
+def build_calendar(path, start_date, days, signs=None):
+    """
+    预计算从 start_date 开始 days 天的运势日历并写入 path
+
+    Returns:
+        int: 写入的字节数
+    """
+    analyzer = MetaphysicsAnalyzer()
+    generator = HoroscopeGenerator()
+    signs = list(signs or HoroscopeGenerator.STAR_SIGNS)
+    record_size = DAY.size + len(ZODIACS) + SIGN.size * len(signs)
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(signs), record_size,
+        (start_date - BASE_DATE).days, days, code_version().encode("ascii")
+    )
+    # 星座名列表紧跟文件头，以 \0 分隔
+    sign_table = "\0".join(signs).encode("utf-8")
+    sign_table_header = struct.pack("<H", len(sign_table))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(sign_table_header)
+        f.write(sign_table)
+
+        for offset in range(days):
+            target_date = start_date + datetime.timedelta(days=offset)
+            ganzhi = analyzer.get_daily_ganzhi(target_date)
+            info = analyzer.day_info_from_ganzhi(target_date, ganzhi)
+
+            branch = analyzer.BRANCHES.index(ganzhi[1])
+            record = [DAY.pack(
+                analyzer.STEMS.index(ganzhi[0]),
+                branch,
+                ELEMENTS.index(info["day_element"]),
+                ZODIACS.index(info["day_zodiac"])
+            )]
+
+            flags = bytearray(len(ZODIACS))
+            for i, zodiac in enumerate(ZODIACS):
+                if info["day_zodiac"] in ZODIAC_CLASH.get(zodiac, []):
+                    flags[i] |= FLAG_CLASH
+                if info["day_zodiac"] in ZODIAC_HARMONY.get(zodiac, []):
+                    flags[i] |= FLAG_HARMONY
+            record.append(bytes(flags))
+
+            for sign in signs:
+                level, text, color_roll, number, yi, ji, traits = generator.draw(target_date, sign)
+                record.append(SIGN.pack(
+                    level, text, color_roll, number,
+                    *_pad(yi, 4), *_pad(ji, 4), *_pad(traits, 3)
+                ))
+
+            f.write(b"".join(record))
+        size = f.tell()
+
+    os.replace(tmp_path, path)
+    return size
+
+
+class FortuneCalendar:
+    """
+    内存映射的预计算运势日历
+    day_info / horoscope 返回与 MetaphysicsAnalyzer.get_day_info /
+    HoroscopeGenerator.get_daily_fortune 相同的结构，不在日历范围内时返回 None
+    """
+
+    def __init__(self, path, check_version=True):
+        self.path = path
+        self._map = None
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._read_header(check_version)
+        except (ValueError, struct.error):
+            self.close()
+            raise
+
+        self.analyzer = MetaphysicsAnalyzer()
+        self.generator = HoroscopeGenerator()
+
+    def _read_header(self, check_version):
+        """解析文件头和星座表，并检查数据区完整（截断的文件在打开时就报错，而不是查询时）"""
+        path = self.path
+        (magic, version, sign_count, self.record_size,
+         self.start_day, self.days, built_version) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"不是有效的运势日历文件: {path}")
+        self.code_version = built_version.decode("ascii")
+        if check_version and self.code_version != code_version():
+            raise ValueError(f"运势日历与当前代码版本不一致，请重新预计算: {path}")
+
+        offset = HEADER.size
+        (table_size,) = struct.unpack_from("<H", self._map, offset)
+        offset += 2
+        self.signs = bytes(self._map[offset:offset + table_size]).decode("utf-8").split("\0")
+        self.data_offset = offset + table_size
+        self.sign_index = {sign: i for i, sign in enumerate(self.signs)}
+
+        if (len(self.signs) != sign_count
+                or self.record_size != DAY.size + len(ZODIACS) + SIGN.size * sign_count
+                or len(self._map) < self.data_offset + self.days * self.record_size):
+            raise ValueError(f"运势日历文件不完整或已损坏: {path}")
+
+    @property
+    def start_date(self):
+        return BASE_DATE + datetime.timedelta(days=self.start_day)
+
+    @property
+    def end_date(self):
+        """最后一天（含）"""
+        return self.start_date + datetime.timedelta(days=self.days - 1)
+
+    def _offset(self, target_date):
+        """日期对应记录的偏移量，不在范围内返回 None"""
+        index = (target_date - BASE_DATE).days - self.start_day
+        if 0 <= index < self.days:
+            return self.data_offset + index * self.record_size
+        return None
+
+    def covers(self, target_date):
+        return self._offset(target_date) is not None
+
+    def day_info(self, target_date):
+        """当日干支、五行、生肖和基础宜忌"""
+        offset = self._offset(target_date)
+        if offset is None:
+            return None
+        stem, branch, _, _ = DAY.unpack_from(self._map, offset)
+        ganzhi = self.analyzer.STEMS[stem] + self.analyzer.BRANCHES[branch]
+        return self.analyzer.day_info_from_ganzhi(target_date, ganzhi)
+
+    def zodiac_flags(self, target_date, zodiac):
+        """当日与某生肖的关系: (是否相冲, 是否三合)"""
+        offset = self._offset(target_date)
+        if offset is None:
+            return None
+        flags = self._map[offset + DAY.size + ZODIACS.index(zodiac)]
+        return bool(flags & FLAG_CLASH), bool(flags & FLAG_HARMONY)
+
+    def draw(self, target_date, star_sign):
+        """当日某星座的运势抽取结果，格式同 HoroscopeGenerator.draw"""
+        offset = self._offset(target_date)
+        sign = self.sign_index.get(star_sign)
+        if offset is None or sign is None:
+            return None
+        values = SIGN.unpack_from(self._map, offset + DAY.size + len(ZODIACS) + sign * SIGN.size)
+        level, text, color_roll, number = values[:4]
+        return (level, text, color_roll, number,
+                _unpad(values[4:8]), _unpad(values[8:12]), _unpad(values[12:15]))
+
+    def horoscope(self, target_date, profile):
+        """当日某用户的星座运势"""
+        draw = self.draw(target_date, profile["star_sign"])
+        if draw is None:
+            return None
+        return self.generator.expand(draw, target_date, profile["star_sign"], profile["favored_elements"])
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_calendar(path):
+    """打开运势日历，文件不存在、已过期、被截断或已损坏时返回 None（回退到实时计算）"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return FortuneCalendar(path)
+    except (ValueError, struct.error):
+        return None
+
+
+# 测试
+if __name__ == "__main__":
+    import tempfile
+    from config import USER_PROFILE
+
+    start = datetime.date.today() + datetime.timedelta(days=1)
+    path = os.path.join(tempfile.gettempdir(), "fortune_calendar.bin")
+    size = build_calendar(path, start, 366)
+    print(f"已生成 {path}: {size} 字节")
+
+    analyzer = MetaphysicsAnalyzer()
+    generator = HoroscopeGenerator()
+    with FortuneCalendar(path) as calendar:
+        mismatches = 0
+        for offset in range(366):
+            d = start + datetime.timedelta(days=offset)
+            if calendar.day_info(d) != analyzer.get_day_info(d):
+                mismatches += 1
+            if calendar.horoscope(d, USER_PROFILE) != generator.get_daily_fortune(d):
+                mismatches += 1
+        print(f"与实时计算不一致: {mismatches}")
@@ -1,67 +1,77 @@
 # -*- coding: utf-8 -*-
 """
-星座运势模块 - 金牛座
-基于星座特征生成每日运势
+星座运势模块
+各星座的特征、幸运色、幸运数字、宜忌和运势文案从 star_signs.json 读取，
+同一日期所有星座的抽取结果一次生成并缓存，每个用户只需一次查找
 """
 
 import datetime
+import json
+import os
 import random
+import threading
 from config import USER_PROFILE
 
 
+# 星座词库文件
+STAR_SIGNS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "star_signs.json")
+
+# 运势等级
+FORTUNE_LEVELS = ["excellent", "good", "normal", "challenging"]
+
+
+def load_star_signs(path=STAR_SIGNS_PATH):
+    """
+    读取并编译星座词库
+    各词库转为元组，未单独配置运势文案的星座使用 defaults 中的文案
+
+    Returns:
+        dict: 星座名 -> {"dates", "traits", "colors", "numbers", "yi", "ji", "fortune_templates"}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    default_templates = data.get("defaults", {}).get("fortune_templates", {})
+    signs = {}
+    for sign, raw in data["signs"].items():
+        templates = raw.get("fortune_templates") or default_templates
+        vocabulary = {
+            "dates": raw.get("dates", ""),
+            "traits": tuple(raw["traits"]),
+            "colors": tuple(raw["colors"]),
+            "numbers": tuple(raw["numbers"]),
+            "yi": tuple(raw["yi"]),
+            "ji": tuple(raw["ji"]),
+            "fortune_templates": {level: tuple(templates[level]) for level in FORTUNE_LEVELS}
+        }
+        if len(vocabulary["traits"]) < 3 or not vocabulary["colors"] or not vocabulary["numbers"]:
+            raise ValueError(f"星座词库不完整: {sign}")
+        signs[sign] = vocabulary
+    return signs
+
+
+SIGN_DATA = load_star_signs()
+
+
 class HoroscopeGenerator:
-    """金牛座运势生成器"""
-
-    # 金牛座特征
-    TAURUS_TRAITS = [
-        "稳重踏实", "注重品质", "有耐心", "忠诚可靠",
-        "爱好美食", "艺术气质", "固执", "占有欲强"
-    ]
-
-    # 金牛座幸运颜色库
-    TAURUS_COLORS = [
-        "绿色", "粉色", "橙色", "金色", "白色"
-    ]
-
-    # 金牛座幸运数字
-    TAURUS_NUMBERS = [6, 20, 27, 4, 15]
-
-    # 金牛座宜做事项库
-    TAURUS_YI = [
-        "整理家居", "品尝美食", "学习新技能", "理财规划",
-        "艺术创作", "健身运动", "社交活动", "静心冥想",
-        "购物消费", "听音乐", "园艺活动", "烹饪美食"
-    ]
-
-    # 金牛座不宜做事项库
-    TAURUS_JI = [
-        "冒险投资", "冲动消费", "激烈争论", "改变太大",
-        "熬夜加班", "轻率做决定", "逃避问题", "过度敏感"
-    ]
-
-    # 每日运势模板
-    FORTUNE_TEMPLATES = {
-        "excellent": [
-            "今日运势极佳！金牛的你思维清晰，财运亨通，适合把握机遇。",
-            "木星眷顾！今日做任何决定都如有神助，财运和感情运都有提升。",
-            "月亮在财帛宫，今天是收获的好日子！"
-        ],
-        "good": [
-            "整体运势良好，保持稳定节奏会遇到更好的机会。",
-            "今日适合脚踏实地做事，你的努力会被认可。",
-            "社交运不错，可能遇到志同道合的朋友。"
-        ],
-        "normal": [
-            "今日运势平稳，按部就班过好每一天即可。",
-            "保持平常心，不要急于求成，好运会在不经意间到来。",
-            "今日适合独处思考，给自己一些空间。"
-        ],
-        "challenging": [
-            "今日运势有些低迷，建议保持低调，避免冲突。",
-            "可能会遇到一些挑战，保持耐心会帮你度过难关。",
-            "注意控制情绪，不要被小事影响心情。"
-        ]
-    }
+    """星座运势生成器"""
+
+    # 星座词库
+    SIGNS = SIGN_DATA
+
+    # 支持的星座（词库中的全部星座）
+    STAR_SIGNS = list(SIGN_DATA)
+
+    # 词库中没有的星座按此星座处理
+    DEFAULT_SIGN = "金牛座"
+
+    # 金牛座词库（兼容旧代码）
+    TAURUS_TRAITS = list(SIGN_DATA["金牛座"]["traits"])
+    TAURUS_COLORS = list(SIGN_DATA["金牛座"]["colors"])
+    TAURUS_NUMBERS = list(SIGN_DATA["金牛座"]["numbers"])
+    TAURUS_YI = list(SIGN_DATA["金牛座"]["yi"])
+    TAURUS_JI = list(SIGN_DATA["金牛座"]["ji"])
+    FORTUNE_TEMPLATES = {level: list(texts) for level, texts in SIGN_DATA["金牛座"]["fortune_templates"].items()}
 
     # 颜色对应的元素
     COLOR_ELEMENTS = {
@@ -70,75 +80,181 @@ class HoroscopeGenerator:
         "蓝": "水", "黑": "水", "黄": "土"
     }
 
-    def __init__(self):
-        self.star_sign = USER_PROFILE["star_sign"]
-        self.favored_elements = USER_PROFILE["favored_elements"]
+    # 运势等级及其分布
+    FORTUNE_LEVELS = FORTUNE_LEVELS
+    LEVEL_WEIGHTS = [15, 35, 35, 15]
+
+    # 各运势等级对应的 (宜数量, 忌数量)
+    LEVEL_COUNTS = {
+        "excellent": (4, 2),
+        "good": (3, 2),
+        "normal": (3, 3),
+        "challenging": (2, 4)
+    }
+
+    # 幸运颜色抽取范围（取模后映射到候选颜色，使抽取结果与用户无关）
+    COLOR_ROLL_RANGE = 65536
+
+    # 按日期缓存的天数
+    DAY_CACHE_SIZE = 4
+
+    def __init__(self, profile=None):
+        profile = profile or USER_PROFILE
+        self.star_sign = profile["star_sign"]
+        self.favored_elements = profile["favored_elements"]
+        # 日期序号 -> {"draws": 各星座抽取结果, "fortunes": (星座, 喜用神) -> 运势}
+        self._days = {}
+        self._lock = threading.Lock()
+
+    def vocabulary(self, star_sign):
+        """星座词库，未知星座使用 DEFAULT_SIGN 的词库"""
+        return self.SIGNS.get(star_sign) or self.SIGNS[self.DEFAULT_SIGN]
+
+    def _day(self, target_date):
+        """当日缓存"""
+        key = target_date.toordinal()
+        day = self._days.get(key)
+        if day is None:
+            with self._lock:
+                day = self._days.setdefault(key, {"draws": {}, "fortunes": {}})
+                while len(self._days) > self.DAY_CACHE_SIZE:
+                    self._days.pop(next(iter(self._days)))
+        return day
+
+    def draw_all(self, target_date, signs=None):
+        """
+        抽取当日所有星座（或指定星座）的运势
+
+        Returns:
+            dict: 星座名 -> draw() 的抽取结果
+        """
+        return {sign: self.draw(target_date, sign) for sign in (signs or self.STAR_SIGNS)}
+
+    def get_all_fortunes(self, target_date=None, favored_elements=None):
+        """
+        一次获取当日所有星座的运势（结果按日期缓存）
 
-    def get_daily_fortune(self, target_date=None):
+        Returns:
+            dict: 星座名 -> 运势字典（缓存的副本，可修改）
+        """
+        if target_date is None:
+            target_date = datetime.date.today() + datetime.timedelta(days=1)
+        if favored_elements is None:
+            favored_elements = self.favored_elements
+
+        # 一次补齐当日所有星座的抽取结果
+        draws = self._day(target_date)["draws"]
+        missing = [sign for sign in self.STAR_SIGNS if sign not in draws]
+        if missing:
+            draws.update(self.draw_all(target_date, missing))
+        return {sign: self.copy_fortune(self._cached_fortune(target_date, sign, favored_elements))
+                for sign in self.STAR_SIGNS}
+
+    def _cached_fortune(self, target_date, star_sign, favored_elements):
+        day = self._day(target_date)
+        key = (star_sign, tuple(favored_elements))
+        fortune = day["fortunes"].get(key)
+        if fortune is None:
+            draw = day["draws"].get(star_sign)
+            if draw is None:
+                draw = day["draws"][star_sign] = self.draw(target_date, star_sign)
+            fortune = self.expand(draw, target_date, star_sign, favored_elements)
+            day["fortunes"][key] = fortune
+        return fortune
+
+    def get_daily_fortune(self, target_date=None, profile=None, user_key=None):
         """
         获取指定日期的星座运势
+        profile 为空时使用当前生成器的用户
+        user_key 不为空时为该用户单独生成一组运势，否则返回当日缓存的副本（可修改，不影响其他用户）
         """
         if target_date is None:
             target_date = datetime.date.today() + datetime.timedelta(days=1)
 
-        # 根据日期生成一个稳定的运势等级
-        # 使用日期作为随机种子，确保同一天结果一致
-        seed = target_date.year * 10000 + target_date.month * 100 + target_date.day
-        random.seed(seed)
+        if profile is None:
+            star_sign = self.star_sign
+            favored_elements = self.favored_elements
+        else:
+            star_sign = profile["star_sign"]
+            favored_elements = profile["favored_elements"]
+
+        if user_key is None:
+            return self.copy_fortune(self._cached_fortune(target_date, star_sign, favored_elements))
+
+        draw = self.draw(target_date, star_sign, user_key)
+        return self.expand(draw, target_date, star_sign, favored_elements)
+
+    def draw(self, target_date, star_sign, user_key=None):
+        """
+        抽取当日运势，只返回各词库中的索引，与用户的喜用神无关
+
+        Returns:
+            tuple: (等级, 描述, 颜色抽签值, 幸运数字, 宜索引元组, 忌索引元组, 特征索引元组)
+        """
+        # 使用独立的随机数生成器，确保同一输入结果一致且线程安全
+        rng = self.make_rng(target_date, star_sign, user_key)
+        vocabulary = self.vocabulary(star_sign)
 
         # 运势等级分布
-        fortune_level = random.choices(
-            ["excellent", "good", "normal", "challenging"],
-            weights=[15, 35, 35, 15]
-        )[0]
+        level = rng.choices(range(len(self.FORTUNE_LEVELS)), weights=self.LEVEL_WEIGHTS)[0]
+        fortune_level = self.FORTUNE_LEVELS[level]
 
         # 获取运势描述
-        fortune_text = random.choice(self.FORTUNE_TEMPLATES[fortune_level])
+        text = rng.choice(range(len(vocabulary["fortune_templates"][fortune_level])))
 
-        # 获取幸运颜色（优先选择与喜用神匹配的颜色）
-        lucky_colors = [c for c in self.TAURUS_COLORS
-                       if self.COLOR_ELEMENTS.get(c, "") in self.favored_elements]
+        color_roll = rng.randrange(self.COLOR_ROLL_RANGE)
+        number = rng.choice(range(len(vocabulary["numbers"])))
 
-        if not lucky_colors:
-            lucky_colors = self.TAURUS_COLORS
+        # 根据运势等级选择宜忌
+        yi_count, ji_count = self.LEVEL_COUNTS[fortune_level]
+        yi = rng.sample(range(len(vocabulary["yi"])), min(yi_count, len(vocabulary["yi"])))
+        ji = rng.sample(range(len(vocabulary["ji"])), min(ji_count, len(vocabulary["ji"])))
+        traits = rng.sample(range(len(vocabulary["traits"])), 3)
 
-        lucky_color = random.choice(lucky_colors)
-        lucky_number = random.choice(self.TAURUS_NUMBERS)
+        return level, text, color_roll, number, tuple(yi), tuple(ji), tuple(traits)
 
-        # 根据运势等级选择宜忌
-        if fortune_level == "excellent":
-            yi_count = 4
-            ji_count = 2
-        elif fortune_level == "good":
-            yi_count = 3
-            ji_count = 2
-        elif fortune_level == "normal":
-            yi_count = 3
-            ji_count = 3
-        else:
-            yi_count = 2
-            ji_count = 4
+    def expand(self, draw, target_date, star_sign, favored_elements):
+        """根据抽取结果和用户喜用神构建运势字典"""
+        level, text, color_roll, number, yi, ji, traits = draw
+        fortune_level = self.FORTUNE_LEVELS[level]
+        vocabulary = self.vocabulary(star_sign)
 
-        lucky_yi = random.sample(self.TAURUS_YI, min(yi_count, len(self.TAURUS_YI)))
-        lucky_ji = random.sample(self.TAURUS_JI, min(ji_count, len(self.TAURUS_JI)))
+        # 获取幸运颜色（优先选择与喜用神匹配的颜色）
+        lucky_colors = [c for c in vocabulary["colors"]
+                       if self.COLOR_ELEMENTS.get(c, "") in favored_elements]
+
+        if not lucky_colors:
+            lucky_colors = vocabulary["colors"]
 
         # 构建结果
-        result = {
+        return {
             "date": target_date.strftime("%Y-%m-%d"),
-            "star_sign": self.star_sign,
+            "star_sign": star_sign,
             "fortune_level": fortune_level,
-            "fortune_text": fortune_text,
-            "lucky_color": lucky_color,
-            "lucky_number": lucky_number,
-            "lucky_yi": lucky_yi,
-            "lucky_ji": lucky_ji,
-            "traits": random.sample(self.TAURUS_TRAITS, 3)
+            "fortune_text": vocabulary["fortune_templates"][fortune_level][text],
+            "lucky_color": lucky_colors[color_roll % len(lucky_colors)],
+            "lucky_number": vocabulary["numbers"][number],
+            "lucky_yi": [vocabulary["yi"][i] for i in yi],
+            "lucky_ji": [vocabulary["ji"][i] for i in ji],
+            "traits": [vocabulary["traits"][i] for i in traits]
         }
 
-        # 重置随机种子
-        random.seed()
+    @staticmethod
+    def copy_fortune(fortune):
+        """运势字典的副本（列表字段也复制），调用方修改副本不会影响缓存"""
+        return dict(fortune, lucky_yi=list(fortune["lucky_yi"]), lucky_ji=list(fortune["lucky_ji"]),
+                    traits=list(fortune["traits"]))
 
-        return result
+    @staticmethod
+    def make_rng(target_date, star_sign, user_key=None):
+        """
+        根据 日期 + 星座 + 可选用户键 生成局部随机数生成器
+        字符串种子经 SHA-512 处理，跨进程稳定，不依赖也不修改全局 random 状态
+        """
+        key = f"{target_date.strftime('%Y-%m-%d')}|{star_sign}"
+        if user_key is not None:
+            key += f"|{user_key}"
+        return random.Random(key)
 
     def get_fortune_score(self, fortune_level):
         """将运势等级转换为分数"""
@@ -164,3 +280,8 @@ if __name__ == "__main__":
     print(f"幸运数字: {result['lucky_number']}")
     print(f"宜: {result['lucky_yi']}")
     print(f"忌: {result['lucky_ji']}")
+
+    # 当日所有星座
+    for sign, fortune in generator.get_all_fortunes(favored_elements=[]).items():
+        print(f"{sign}: {fortune['fortune_level']:<12}{fortune['lucky_color']} {fortune['lucky_number']} "
+              f"宜 {'、'.join(fortune['lucky_yi'])}")
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+端到端压测模块
+启动本地 Server酱 模拟服务（可配置延迟和故障率），为 N 个合成用户执行与生产相同的推送路径：
+多进程流水线（与 batch 模式相同：ReportCache 合成渲染 → 发件箱 → ChannelRouter 推送），
+或 workers=0 时在本进程内两阶段推送（与定时任务相同：StagedDelivery 预计算 → 发件箱 → 投递），
+统计吞吐、送达延迟分位数和最后一条送达的时间，用于评估一晚的推送能否在推送窗口内完成
+"""
+
+import datetime
+import logging
+import os
+import tempfile
+import time
+
+from config import USER_PROFILE, PUSH_CONCURRENCY
+from channels import ChannelRouter, latency_stats
+from horoscope import HoroscopeGenerator
+from metaphysics import ZODIACS
+from metrics import STAGE_SECONDS
+from mock_server import MockServerChan
+from outbox import Outbox
+from pusher import ServerChanPusher
+
+
+logger = logging.getLogger(__name__)
+
+# 合成用户的喜用神组合（循环使用）
+FAVORED_ELEMENTS = (["木", "火"], ["土", "金"], ["金", "水"], ["水", "木"], ["火", "土"])
+
+
+def synthetic_profiles(count):
+    """
+    生成 count 个合成用户（生肖、出生年、星座、喜用神轮换，每个用户一个 SendKey）
+    """
+    signs = HoroscopeGenerator.STAR_SIGNS
+    for i in range(count):
+        favored = FAVORED_ELEMENTS[i % len(FAVORED_ELEMENTS)]
+        yield dict(
+            USER_PROFILE,
+            id=f"load{i}",
+            name=f"压测用户{i}",
+            zodiac=ZODIACS[i % 12],
+            birth_year=1950 + i % 60,
+            star_sign=signs[i % len(signs)],
+            favored_elements=favored,
+            sckey=f"LOAD{i:07d}"
+        )
+
+
+def _stage_totals():
+    """各阶段指标的累计 (耗时秒, 次数)，用于计算本次压测的增量"""
+    totals = {}
+    for stage in ("synthesize", "format"):
+        child = STAGE_SECONDS.labels(stage)
+        totals[stage] = (child.sum, child.count)
+    return totals
+
+
+class LoadTest:
+    """
+    端到端压测
+
+    Args:
+        subscribers: 合成用户数
+        latency_ms: 模拟服务每个请求的延迟（毫秒）
+        error_rate: 模拟服务故障注入概率 (0-1)
+        jitter_ms: 延迟随机波动范围（毫秒）
+        concurrency: Server酱 渠道的并发数，默认 PUSH_CONCURRENCY
+        target_date: 目标日期，默认明天
+        workers: 合成/渲染进程数（同 batch），0 表示在本进程内走定时任务的两阶段推送
+        chunk_size: 流水线每个分片的用户数（同 batch --chunk-size）
+        pusher_options: 传给 ServerChanPusher 的其他参数（如 rate_limit）
+    """
+
+    def __init__(self, subscribers, latency_ms=0, error_rate=0.0, jitter_ms=0,
+                 concurrency=None, target_date=None, seed=None, workers=None, chunk_size=None,
+                 **pusher_options):
+        self.subscribers = subscribers
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.jitter_ms = jitter_ms
+        self.concurrency = concurrency or PUSH_CONCURRENCY
+        self.target_date = target_date or datetime.date.today() + datetime.timedelta(days=1)
+        self.seed = seed
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.pusher_options = pusher_options
+
+    def _deliver(self, router, outbox, on_result):
+        """按生产路径合成、渲染、写入发件箱并推送"""
+        profiles = synthetic_profiles(self.subscribers)
+        if self.workers == 0:
+            from staging import StagedDelivery
+            staged = StagedDelivery(list(profiles), router, outbox=outbox)
+            staged.prepare(self.target_date)
+            staged.deliver(self.target_date, on_result=on_result)
+        else:
+            from pipeline import PipelineRunner
+            runner = PipelineRunner(router, workers=self.workers, chunk_size=self.chunk_size, outbox=outbox)
+            runner.run(profiles, self.target_date, on_result=on_result)
+
+    def run(self):
+        """
+        运行压测
+
+        Returns:
+            dict: 送达延迟统计（毫秒，从开始到每条消息送达）、吞吐、成功/失败/重试数、
+                  各阶段平均耗时、time_to_last_s（开始到最后一条送达的秒数）
+        """
+        mock = MockServerChan(latency_ms=self.latency_ms, jitter_ms=self.jitter_ms,
+                              error_rate=self.error_rate, seed=self.seed)
+        options = dict(self.pusher_options, concurrency=self.concurrency)
+        # 每条消息最后一次发送的结果（发件箱重试时同一消息会有多次结果）
+        outcomes = {}
+        results = []
+        before = _stage_totals()
+
+        with mock, tempfile.TemporaryDirectory() as directory:
+            channel = ServerChanPusher(api_url=mock.url, **options)
+            outbox = Outbox(os.path.join(directory, "outbox.db"))
+            started = None
+
+            def on_result(message, result):
+                now = time.perf_counter()
+                results.append(result)
+                outcomes[message["subscriber"]] = (result["success"], now - started)
+
+            try:
+                with ChannelRouter({"serverchan": channel}) as router:
+                    # 提前导入 requests 并创建会话，避免导入开销计入首个用户的延迟
+                    router.warm(["serverchan"])
+                    started = time.perf_counter()
+                    self._deliver(router, outbox, on_result)
+                    elapsed = time.perf_counter() - started
+            finally:
+                outbox.close()
+            requests = mock.requests
+
+        delivered = [latency for success, latency in outcomes.values() if success]
+        stats = latency_stats(delivered, elapsed)
+        stats["count"] = self.subscribers
+        stats["throughput"] = len(delivered) / elapsed if elapsed > 0 else 0.0
+        stats["success"] = len(delivered)
+        stats["failed"] = self.subscribers - len(delivered)
+        # 渠道内的重试，加上发件箱退避后的重新发送
+        stats["retries"] = sum(r["attempts"] - 1 for r in results) + len(results) - len(outcomes)
+        stats["requests"] = requests
+        stats["time_to_last_s"] = max(delivered) if delivered else None
+
+        after = _stage_totals()
+        for stage in ("synthesize", "format"):
+            seconds = after[stage][0] - before[stage][0]
+            stats[f"{stage}_mean_ms"] = seconds / self.subscribers * 1000 if self.subscribers else 0.0
+        stats["push_mean_ms"] = (sum(r["latency"] for r in results) / len(results) * 1000
+                                 if results else 0.0)
+        return stats
+
+
+def log_report(stats, window=None):
+    """
+    输出压测结果
+
+    Args:
+        window: 推送窗口（秒），设置时判断最后一条送达是否在窗口内
+
+    Returns:
+        bool: 是否在窗口内完成（未设置窗口时总为 True）
+    """
+    logger.info(f"用户 {stats['count']}，成功 {stats['success']}，失败 {stats['failed']}，"
+                f"重试 {stats['retries']}，服务端收到请求 {stats['requests']}")
+    logger.info(f"总耗时 {stats['elapsed_s']:.2f}s，吞吐 {stats['throughput']:.1f} 条/s")
+    logger.info(f"送达延迟（从开始计）: p50 {stats['p50_ms']:.1f}ms，p95 {stats['p95_ms']:.1f}ms，"
+                f"p99 {stats['p99_ms']:.1f}ms，最大 {stats['max_ms']:.1f}ms")
+    logger.info(f"每位用户平均: 合成 {stats['synthesize_mean_ms']:.2f}ms，渲染 {stats['format_mean_ms']:.2f}ms，"
+                f"单次推送请求 {stats['push_mean_ms']:.1f}ms")
+
+    last = stats["time_to_last_s"]
+    if last is None:
+        logger.error("❌ 没有送达任何消息")
+        return False
+    logger.info(f"最后一条送达: 开始后 {last:.2f}s")
+    if window is None:
+        return True
+    if last <= window:
+        logger.info(f"✅ 在 {window:.0f}s 推送窗口内完成")
+        return True
+    logger.error(f"❌ 超出 {window:.0f}s 推送窗口 {last - window:.2f}s")
+    return False
+
+
+# 测试
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    log_report(LoadTest(500, latency_ms=20, error_rate=0.02, seed=1).run(), window=60)
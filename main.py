@@ -4,15 +4,15 @@
 每天21:00自动推送第二天运势
 """
 
+import argparse
 import datetime
+import sys
 import time
 import logging
-from apscheduler.schedulers.blocking import BlockingScheduler
-from apscheduler.triggers.cron import CronTrigger
 
-from synthesizer import FortuneSynthesizer
-from pusher import ServerChanPusher
-from config import PUSH_HOUR, PUSH_MINUTE
+from config import PUSH_HOUR, PUSH_MINUTE, FORTUNE_CALENDAR_PATH, METRICS_TEXTFILE, METRICS_PORT
+
+# 各模式按需导入，避免单次执行时加载调度器等用不到的模块
 
 # 配置日志
 logging.basicConfig(
@@ -22,30 +22,96 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _in_progress(target_date):
+    """消息正由其他进程发送（租约未到期），本次不重复发送，也不算失败"""
+    logger.info(f"⏳ {target_date} 的消息正由其他进程发送，租约到期前不重复发送")
+    return {"success": True, "in_progress": True, "message": "正由其他进程发送"}
+
+
 def run_daily_fortune():
     """
     执行每日运势推送
+    启用发件箱时，消息先写入发件箱再发送；重跑时已生成的消息不再重新生成，已送达的不再发送
     """
+    from synthesizer import FortuneSynthesizer
+    from channels import ChannelRouter, route_fields
+    from fortune_calendar import open_calendar
+    from metrics import REGISTRY, STAGE_SECONDS, STAGE_ERRORS
+    from config import USER_PROFILE, OUTBOX_PATH, OUTBOX_ONCE_WORKER
+
     logger.info("=" * 50)
     logger.info("开始生成每日运势...")
 
+    target_date = datetime.date.today() + datetime.timedelta(days=1)
+    outbox = None
+    pusher = None
+    stage = "synthesize"
     try:
-        # 1. 生成运势报告
-        synthesizer = FortuneSynthesizer()
-        report = synthesizer.synthesize()
+        if OUTBOX_PATH:
+            from outbox import Outbox, subscriber_id
+            outbox = Outbox(OUTBOX_PATH)
+            # 单用户模式：未设置 id 和渠道地址时发往渠道的默认地址，标识与 config.SUBSCRIBERS 中的默认用户一致
+            subscriber = subscriber_id(USER_PROFILE) or "default"
+            if outbox.existing([subscriber], target_date):
+                # 上次运行在发送途中中断时，消息仍处于领取状态，直接放回队列而不是等租约过期
+                released = outbox.release(OUTBOX_ONCE_WORKER, target_date)
+                if released:
+                    logger.warning(f"上次运行中断，放回 {released} 条未确认的消息")
+                state = outbox.status(subscriber, target_date)
+                if state["status"] == "delivered":
+                    logger.info(f"✅ {target_date} 的运势已推送过，跳过")
+                    return {"success": True, "message": "已推送过"}
+                if state["status"] == "claimed":
+                    return _in_progress(target_date)
+                if state["status"] == "failed":
+                    outbox.requeue_failed(target_date)
+                logger.info(f"{target_date} 的消息已在发件箱中（{state['status']}），继续发送")
+                stage = "push"
+
+        pusher = ChannelRouter()
+        route = route_fields(USER_PROFILE)
+
+        if stage == "synthesize":
+            # 1. 生成运势报告（有预计算日历时直接查表）
+            with STAGE_SECONDS.labels(stage).time():
+                calendar = open_calendar(FORTUNE_CALENDAR_PATH)
+                try:
+                    if calendar is not None:
+                        logger.info(f"使用预计算运势日历: {calendar.start_date} ~ {calendar.end_date}")
+                    synthesizer = FortuneSynthesizer(calendar=calendar)
+                    report = synthesizer.synthesize(target_date)
+                finally:
+                    if calendar is not None:
+                        calendar.close()
+
+            logger.info(f"日期: {report['date']} {report['weekday']}")
+            logger.info(f"幸运颜色: {report['final']['lucky_color']['color']}")
+            logger.info(f"综合评分: {report['final']['score']}/100")
 
-        logger.info(f"日期: {report['date']} {report['weekday']}")
-        logger.info(f"幸运颜色: {report['final']['lucky_color']['color']}")
-        logger.info(f"综合评分: {report['final']['score']}/100")
+            # 2. 格式化消息
+            stage = "format"
+            with STAGE_SECONDS.labels(stage).time():
+                title, content, short = pusher.format_fortune_message(report)
 
-        # 2. 格式化消息
-        pusher = ServerChanPusher()
-        title, content, short = pusher.format_fortune_message(report)
+            logger.info("消息格式化完成")
 
-        logger.info("消息格式化完成")
+            if outbox is not None:
+                outbox.enqueue([{"subscriber": subscriber, "title": title, "content": content,
+                                 "short": short, "sckey": USER_PROFILE.get("sckey"), **route}], target_date)
 
         # 3. 发送推送
-        result = pusher.push(title, content, short)
+        stage = "push"
+        with STAGE_SECONDS.labels(stage).time():
+            if outbox is None:
+                result = pusher.push(title, content, short, **route)
+            else:
+                results = []
+                outbox.drain(pusher, worker_id=OUTBOX_ONCE_WORKER, target_date=target_date,
+                             on_result=lambda message, r: results.append((message, r)))
+                if not results and outbox.status(subscriber, target_date)["status"] == "claimed":
+                    return _in_progress(target_date)
+                title = results[-1][0]["title"] if results else ""
+                result = results[-1][1] if results else {"success": False, "message": "发件箱中没有可发送的消息"}
 
         if result["success"]:
             logger.info(f"✅ 推送成功！")
@@ -57,9 +123,18 @@ def run_daily_fortune():
         return result
 
     except Exception as e:
+        STAGE_ERRORS.labels(stage).inc()
         logger.error(f"❌ 生成运势时出错: {str(e)}")
         return {"success": False, "message": str(e)}
 
+    finally:
+        if pusher is not None:
+            pusher.close()
+        if outbox is not None:
+            outbox.close()
+        if METRICS_TEXTFILE:
+            REGISTRY.write_textfile(METRICS_TEXTFILE)
+
 
 def test_push():
     """
@@ -69,22 +144,85 @@ def test_push():
     return run_daily_fortune()
 
 
+def precompute(start_date, days, path=FORTUNE_CALENDAR_PATH):
+    """
+    预计算运势日历
+    """
+    from fortune_calendar import build_calendar
+
+    logger.info(f"开始预计算运势日历: {start_date} 起 {days} 天")
+    started = time.perf_counter()
+    size = build_calendar(path, start_date, days)
+    logger.info(f"✅ 已写入 {path} ({size} 字节, 耗时 {time.perf_counter() - started:.2f}s)")
+
+
 def main():
     """
     主函数 - 启动定时调度器
+    推送时间前 PRECOMPUTE_LEAD_MINUTES 分钟合成并渲染第二天的消息，推送时间只发送
     """
+    from apscheduler.schedulers.blocking import BlockingScheduler
+    from apscheduler.triggers.cron import CronTrigger
+    from metrics import REGISTRY, STAGE_ERRORS, start_http_server
+    from staging import StagedDelivery, precompute_time, delivery_target
+    from config import SUBSCRIBERS, OUTBOX_PATH
+
+    pre_hour, pre_minute = precompute_time()
+
     logger.info("🚀 每日运势推送系统启动")
-    logger.info(f"⏰ 推送时间: 每天 {PUSH_HOUR:02d}:{PUSH_MINUTE:02d}")
+    logger.info(f"⏰ 推送时间: 每天 {PUSH_HOUR:02d}:{PUSH_MINUTE:02d}（{pre_hour:02d}:{pre_minute:02d} 预计算）")
+
+    # 指标接口
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+        logger.info(f"📈 指标接口: http://0.0.0.0:{METRICS_PORT}/metrics")
+
+    outbox = None
+    if OUTBOX_PATH:
+        from outbox import Outbox
+        outbox = Outbox(OUTBOX_PATH)
+    staged = StagedDelivery(SUBSCRIBERS, outbox=outbox)
+
+    def precompute_job():
+        try:
+            staged.prepare(delivery_target())
+        except Exception as e:
+            STAGE_ERRORS.labels("synthesize").inc()
+            logger.error(f"❌ 预计算运势时出错: {str(e)}")
+
+    def deliver_job():
+        def on_result(message, result):
+            if not result["success"]:
+                logger.error(f"❌ {message.get('subscriber', '')} 推送失败: {result['message']}")
+
+        try:
+            staged.deliver(datetime.date.today() + datetime.timedelta(days=1), on_result=on_result)
+        except Exception as e:
+            STAGE_ERRORS.labels("push").inc()
+            logger.error(f"❌ 推送运势时出错: {str(e)}")
+        finally:
+            if METRICS_TEXTFILE:
+                REGISTRY.write_textfile(METRICS_TEXTFILE)
 
     # 创建调度器
     scheduler = BlockingScheduler()
 
-    # 添加定时任务 (每天21:00执行)
+    # 预计算阶段（默认每天20:50执行）
+    scheduler.add_job(
+        precompute_job,
+        CronTrigger(hour=pre_hour, minute=pre_minute),
+        id='daily_fortune_precompute',
+        name='每日运势预计算',
+        replace_existing=True
+    )
+
+    # 投递阶段 (每天21:00执行)
     scheduler.add_job(
-        run_daily_fortune,
+        deliver_job,
         CronTrigger(hour=PUSH_HOUR, minute=PUSH_MINUTE),
         id='daily_fortune',
         name='每日运势推送',
+        misfire_grace_time=60,
         replace_existing=True
     )
 
@@ -96,18 +234,331 @@ def main():
     except (KeyboardInterrupt, SystemExit):
         logger.info("系统已停止")
         scheduler.shutdown()
+    finally:
+        staged.pusher.close()
+        if outbox is not None:
+            outbox.close()
+
+
+def deliver_batch(profiles, target_date, cache, pusher):
+    """
+    批量生成并推送一批用户的运势（相同指纹的用户共享同一份报告和消息）
+    """
+    from metrics import STAGE_SECONDS
+    from channels import route_fields
+
+    entries = cache.build_many(profiles, target_date)
+    messages = [
+        {
+            "title": entry["title"],
+            "content": entry["content"],
+            "short": entry["short"],
+            "sckey": profile.get("sckey"),
+            **route_fields(profile)
+        }
+        for profile, entry in zip(profiles, entries)
+    ]
+
+    with STAGE_SECONDS.labels("push").time():
+        outcome = pusher.push_many(messages)
+
+    stats = outcome["stats"]
+    logger.info(f"✅ {target_date} 批次完成: 成功 {stats['success']}, 失败 {stats['failed']}, "
+                f"p95 {stats['p95_ms']:.0f}ms")
+    for profile, result in zip(profiles, outcome["results"]):
+        if not result["success"]:
+            logger.error(f"❌ {profile.get('name', '')} 推送失败: {result['message']}")
+    return outcome
+
+
+def serve():
+    """
+    按用户时区推送的调度器模式
+    每个用户在自己时区的推送时间收到第二天的运势，同一分钟的用户合并为一批
+    """
+    from wheel_scheduler import WheelScheduler
+    from cache import ReportCache
+    from channels import ChannelRouter
+    from metrics import start_http_server
+    from config import SUBSCRIBERS
+
+    logger.info(f"🚀 每日运势推送系统启动（按用户时区，{len(SUBSCRIBERS)} 位用户）")
+
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+        logger.info(f"📈 指标接口: http://0.0.0.0:{METRICS_PORT}/metrics")
+
+    cache = ReportCache()
+    pusher = ChannelRouter()
+    scheduler = WheelScheduler(
+        SUBSCRIBERS,
+        lambda profiles, target_date: deliver_batch(profiles, target_date, cache, pusher)
+    )
+
+    try:
+        scheduler.run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("系统已停止")
+        scheduler.stop()
+    finally:
+        pusher.close()
+
+
+def run_batch(target_date, workers=None, chunk_size=None, source=None, fmt=None):
+    """
+    多进程流水线批量推送所有订阅用户的运势
+    source 为订阅用户文件（"-" 表示标准输入）时逐行流式读取，不一次性载入内存
+    """
+    from pipeline import PipelineRunner, log_stats
+    from channels import ChannelRouter
+    from config import SUBSCRIBERS, SUBSCRIBERS_FILE, OUTBOX_PATH
+
+    source = source or SUBSCRIBERS_FILE
+    if source:
+        from subscribers import iter_subscribers
+        profiles = iter_subscribers(source, fmt)
+        logger.info(f"开始批量推送 {target_date} 的运势（订阅用户来自 {source}）")
+    else:
+        profiles = SUBSCRIBERS
+        logger.info(f"开始批量推送 {target_date} 的运势（{len(SUBSCRIBERS)} 位用户）")
+
+    def on_result(message, result):
+        if not result["success"]:
+            logger.error(f"❌ {message['subscriber']} 推送失败: {result['message']}")
+
+    outbox = None
+    if OUTBOX_PATH:
+        from outbox import Outbox
+        outbox = Outbox(OUTBOX_PATH)
+
+    try:
+        with ChannelRouter() as pusher:
+            runner = PipelineRunner(pusher, workers=workers, chunk_size=chunk_size, outbox=outbox)
+            stats = runner.run(profiles, target_date, on_result=on_result)
+        log_stats(stats)
+        if outbox is not None:
+            logger.info(f"发件箱 {target_date}: {outbox.stats(target_date)}")
+    finally:
+        # 同时关闭推送线程打开的连接
+        if outbox is not None:
+            outbox.close()
+        if METRICS_TEXTFILE:
+            from metrics import REGISTRY
+            REGISTRY.write_textfile(METRICS_TEXTFILE)
+    return stats
+
+
+def drain_outbox(target_date=None, worker_id=None):
+    """
+    发送发件箱中未送达的消息（可在多个进程中同时运行）
+    """
+    from outbox import Outbox
+    from channels import ChannelRouter
+    from config import OUTBOX_PATH
+
+    def on_result(message, result):
+        if not result["success"]:
+            logger.error(f"❌ {message['subscriber']} {message['date']} 推送失败: {result['message']}")
+
+    with Outbox(OUTBOX_PATH) as outbox, ChannelRouter() as pusher:
+        totals = outbox.drain(pusher, worker_id=worker_id, target_date=target_date, on_result=on_result)
+        logger.info(f"✅ 发件箱处理完成: 送达 {totals['delivered']}, 失败 {totals['failed']}, "
+                    f"重试 {totals['retried']} 次")
+        logger.info(f"发件箱状态: {outbox.stats(target_date)}")
+    return totals
+
+
+def run_loadtest(subscribers, latency_ms=0, error_rate=0.0, jitter_ms=0, concurrency=None,
+                 rate_limit=None, window=None, workers=None, chunk_size=None):
+    """
+    端到端压测：本地模拟 Server酱，对合成用户执行与 batch 相同的 合成 → 渲染 → 发件箱 → 推送 路径
+    workers 为 0 时在本进程内执行定时任务的两阶段推送
+
+    Returns:
+        bool: 最后一条送达是否在推送窗口内
+    """
+    from loadtest import LoadTest, log_report
+
+    path = "本进程两阶段推送" if workers == 0 else "多进程流水线"
+    logger.info(f"开始压测（{path}）: {subscribers} 位用户，模拟延迟 {latency_ms}ms，故障率 {error_rate:.1%}")
+    test = LoadTest(subscribers, latency_ms=latency_ms, error_rate=error_rate, jitter_ms=jitter_ms,
+                    concurrency=concurrency, workers=workers, chunk_size=chunk_size, rate_limit=rate_limit)
+    return log_report(test.run(), window)
+
+
+def run_export(start_date, end_date, output="-", fmt="jsonl", source=None, profiles_fmt=None,
+               compress=None, workers=None, chunk_records=None):
+    """
+    并行导出日期范围内所有用户的运势报告，按日期顺序流式写出
+    """
+    from export import Exporter, open_output
+    from config import SUBSCRIBERS
+
+    if source:
+        from subscribers import iter_subscribers
+        profiles = list(iter_subscribers(source, profiles_fmt))
+    else:
+        profiles = SUBSCRIBERS
+
+    days = (end_date - start_date).days + 1
+    logger.info(f"开始导出 {start_date} ~ {end_date}（{days} 天 × {len(profiles)} 位用户）→ {output}")
+    f = open_output(output, compress)
+    try:
+        stats = Exporter(profiles, workers=workers, chunk_records=chunk_records).run(
+            start_date, end_date, f, fmt
+        )
+    finally:
+        if f is sys.stdout:
+            f.flush()
+        else:
+            f.close()
+    logger.info(f"✅ 导出完成: {stats['records']} 条，{stats['chunks']} 个分片，"
+                f"耗时 {stats['elapsed_seconds']:.2f}s，{stats['throughput']:.0f} 条/s")
+    return stats
+
+
+def profiled(directory, func, *args, **kwargs):
+    """
+    在分阶段 CPU 性能分析下运行 func，写出各阶段的 pstats / 折叠栈并打印热点函数
+    """
+    from profiler import StageProfiler, print_summary
+
+    with StageProfiler() as profiler:
+        result = func(*args, **kwargs)
+    paths = profiler.write(directory)
+    print_summary(profiler.summary())
+    logger.info(f"📊 性能分析结果已写入 {directory}（{len(paths)} 个文件，*.collapsed 可直接用于 flamegraph.pl）")
+    return result
+
+
+def parse_date(value):
+    """解析 YYYY-MM-DD 格式的日期参数"""
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期格式应为 YYYY-MM-DD: {value}")
+
+
+def parse_args(argv=None):
+    """
+    解析命令行参数，不带子命令时启动调度器
+    """
+    from config import PROFILE_DIR
+
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+
+    parser = argparse.ArgumentParser(description="每日运势推送系统")
+    parser.add_argument("--startup-profile", nargs="?", const="once",
+                        choices=["once", "precompute", "scheduler", "serve", "batch", "drain", "loadtest",
+                                 "export"],
+                        help="分析指定模式（默认 once）的启动导入耗时")
+    subparsers = parser.add_subparsers(dest="mode")
+
+    subparsers.add_parser("test", help="测试推送")
+    once_parser = subparsers.add_parser("once", help="单次执行推送")
+    once_parser.add_argument("--profile", nargs="?", const=PROFILE_DIR, default=None, metavar="DIR",
+                             help=f"分阶段 CPU 性能分析，结果写入 DIR（默认 {PROFILE_DIR}）")
+    subparsers.add_parser("serve", help="按每个用户的时区和推送时间调度推送")
+
+    batch_parser = subparsers.add_parser("batch", help="多进程流水线批量推送所有订阅用户")
+    batch_parser.add_argument("--date", type=parse_date, default=tomorrow, help="目标日期 YYYY-MM-DD，默认明天")
+    batch_parser.add_argument("--workers", type=int, default=None, help="合成/渲染进程数，默认 CPU 核数")
+    batch_parser.add_argument("--chunk-size", type=int, default=None, help="每个分片的用户数")
+    batch_parser.add_argument("--subscribers", default=None,
+                              help="订阅用户文件（JSONL / CSV，可为 .gz），- 表示标准输入")
+    batch_parser.add_argument("--format", dest="fmt", choices=["jsonl", "csv"], default=None,
+                              help="订阅用户文件格式，默认按扩展名判断")
+
+    drain_parser = subparsers.add_parser("drain", help="发送发件箱中未送达的消息（可多进程同时运行）")
+    drain_parser.add_argument("--date", type=parse_date, default=None, help="只处理该日期的消息，默认全部")
+    drain_parser.add_argument("--worker-id", default=None, help="消费者标识，默认 主机名:进程号")
+
+    loadtest_parser = subparsers.add_parser("loadtest", help="端到端压测（本地模拟 Server酱）")
+    loadtest_parser.add_argument("--subscribers", type=int, default=1000, help="合成用户数，默认 1000")
+    loadtest_parser.add_argument("--latency-ms", type=float, default=50, help="模拟服务延迟（毫秒），默认 50")
+    loadtest_parser.add_argument("--jitter-ms", type=float, default=0, help="模拟服务延迟波动（毫秒）")
+    loadtest_parser.add_argument("--error-rate", type=float, default=0.0, help="模拟服务故障率 (0-1)")
+    loadtest_parser.add_argument("--concurrency", type=int, default=None, help="并发数，默认 PUSH_CONCURRENCY")
+    loadtest_parser.add_argument("--rate-limit", type=float, default=None,
+                                 help="每个 SendKey 每秒最多请求数，默认 PUSH_RATE_LIMIT")
+    loadtest_parser.add_argument("--window", type=float, default=None,
+                                 help="推送窗口（秒），最后一条送达超出窗口时返回非零")
+    loadtest_parser.add_argument("--workers", type=int, default=None,
+                                 help="合成/渲染进程数（同 batch），默认 CPU 核数；0 表示在本进程内走定时任务的两阶段推送")
+    loadtest_parser.add_argument("--chunk-size", type=int, default=None, help="每个分片的用户数（同 batch）")
+    loadtest_parser.add_argument("--profile", nargs="?", const=PROFILE_DIR, default=None, metavar="DIR",
+                                 help=f"分阶段 CPU 性能分析，结果写入 DIR（默认 {PROFILE_DIR}；"
+                                      f"工作进程无法采集，分析时使用 --workers 0）")
+
+    export_parser = subparsers.add_parser("export", help="并行导出日期范围内的运势报告（JSONL / CSV）")
+    export_parser.add_argument("--from", dest="start", type=parse_date, required=True, help="起始日期 YYYY-MM-DD")
+    export_parser.add_argument("--to", dest="end", type=parse_date, required=True, help="结束日期 YYYY-MM-DD（含）")
+    export_parser.add_argument("--profiles", default=None,
+                               help="用户文件（JSONL / CSV，可为 .gz），- 表示标准输入，默认 config.SUBSCRIBERS")
+    export_parser.add_argument("--profiles-format", choices=["jsonl", "csv"], default=None,
+                               help="用户文件格式，默认按扩展名判断")
+    export_parser.add_argument("--format", dest="fmt", choices=["jsonl", "csv", "scores"], default="jsonl",
+                               help="输出格式，默认 jsonl；scores 只导出评分（向量化计算，需要 NumPy）")
+    export_parser.add_argument("--output", default="-", help="输出文件，- 表示标准输出（默认）；.gz 结尾时压缩")
+    export_parser.add_argument("--gzip", dest="compress", action="store_true", default=None, help="gzip 压缩输出")
+    export_parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    export_parser.add_argument("--chunk-records", type=int, default=None, help="每个分片的记录数")
+
+    precompute_parser = subparsers.add_parser("precompute", help="预计算运势日历")
+    precompute_parser.add_argument("--from", dest="start", type=parse_date, default=tomorrow,
+                                   help="起始日期 YYYY-MM-DD，默认明天")
+    precompute_parser.add_argument("--days", type=int, default=366, help="天数，默认 366")
+    precompute_parser.add_argument("--output", default=FORTUNE_CALENDAR_PATH, help="输出文件")
+
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
-    # 如果直接运行，则执行测试推送
-    import sys
+    args = parse_args()
 
-    if len(sys.argv) > 1 and sys.argv[1] == "test":
+    if args.startup_profile:
+        # 启动耗时分析
+        from startup_profile import print_startup_profile
+        print_startup_profile(args.startup_profile)
+    elif args.mode == "test":
         # 测试模式
         test_push()
-    elif len(sys.argv) > 1 and sys.argv[1] == "once":
+    elif args.mode == "once":
         # 单次执行模式
-        run_daily_fortune()
+        if args.profile:
+            profiled(args.profile, run_daily_fortune)
+        else:
+            run_daily_fortune()
+    elif args.mode == "serve":
+        # 按用户时区调度模式
+        serve()
+    elif args.mode == "batch":
+        # 多进程批量推送模式
+        run_batch(args.date, args.workers, args.chunk_size, args.subscribers, args.fmt)
+    elif args.mode == "drain":
+        # 发件箱补发模式
+        drain_outbox(args.date, args.worker_id)
+    elif args.mode == "loadtest":
+        # 压测模式
+        workers = args.workers
+        if args.profile and workers != 0:
+            # 合成和渲染在工作进程中执行时采集不到，分析时改在本进程内执行
+            logger.warning("性能分析只能采集本进程，改用 --workers 0（本进程两阶段推送）")
+            workers = 0
+        loadtest_args = (args.subscribers, args.latency_ms, args.error_rate, args.jitter_ms,
+                         args.concurrency, args.rate_limit, args.window, workers, args.chunk_size)
+        if args.profile:
+            ok = profiled(args.profile, run_loadtest, *loadtest_args)
+        else:
+            ok = run_loadtest(*loadtest_args)
+        sys.exit(0 if ok else 1)
+    elif args.mode == "export":
+        # 批量导出模式
+        run_export(args.start, args.end, args.output, args.fmt, args.profiles, args.profiles_format,
+                   args.compress, args.workers, args.chunk_records)
+    elif args.mode == "precompute":
+        # 预计算模式
+        precompute(args.start, args.days, args.output)
     else:
         # 调度器模式
         main()
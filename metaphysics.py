@@ -5,6 +5,7 @@
 """
 
 import datetime
+from functools import lru_cache
 from config import USER_PROFILE, ZODIAC_CLASH, ZODIAC_HARMONY
 
 
@@ -25,27 +26,35 @@ class MetaphysicsAnalyzer:
         "壬": "水", "癸": "水"
     }
 
-    # 每日吉凶宜忌 (简化版黄历)
+    # 天干、地支循环（基于1900-01-01为庚子日）
+    STEMS = ["庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁", "戊", "己"]
+    BRANCHES = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
+
+    # 每日吉凶宜忌 (简化版黄历，按当日地支)
     DAILY_Advice = {
-        "子日": {"宜": ["祭祀", "沐浴", "扫舍", "整手足甲"], "忌": ["动土", "破土", "安葬"]},
-        "丑日": {"宜": ["祭祀", "祈福", "求嗣", "开光"], "忌": ["开市", "交易", "立券"]},
-        "寅日": {"宜": ["纳财", "开仓", "出货财", "入学"], "忌": ["栽种", "牧养"]},
-        "卯日": {"宜": ["嫁娶", "纳采", "订盟", "会亲友"], "忌": ["祈福", "求嗣"]},
-        "辰日": {"宜": ["订盟", "纳采", "冠笄", "竖柱"], "忌": ["开市", "交易"]},
-        "巳日": {"宜": ["塑绘", "会友", "习艺", "入学"], "忌": ["造屋", "起基"]},
-        "午日": {"宜": ["祭祀", "祈福", "求嗣", "斋醮"], "忌": ["开市", "立券", "交易"]},
-        "未日": {"宜": ["嫁娶", "纳采", "订盟", "会亲友"], "忌": ["动土", "破土"]},
-        "申日": {"宜": ["纳财", "开仓", "出货财", "赴任"], "忌": ["词讼", "安门"]},
-        "酉日": {"宜": ["祭祀", "祈福", "求嗣", "开光"], "忌": ["出行", "移徙"]},
-        "戌日": {"宜": ["会亲友", "订盟", "纳采", "竖柱"], "忌": ["开市", "交易"]},
-        "亥日": {"宜": ["沐浴", "剃头", "整手足甲", "扫舍"], "忌": ["开市", "交易", "立券"]}
+        "子": {"宜": ["祭祀", "沐浴", "扫舍", "整手足甲"], "忌": ["动土", "破土", "安葬"]},
+        "丑": {"宜": ["祭祀", "祈福", "求嗣", "开光"], "忌": ["开市", "交易", "立券"]},
+        "寅": {"宜": ["纳财", "开仓", "出货财", "入学"], "忌": ["栽种", "牧养"]},
+        "卯": {"宜": ["嫁娶", "纳采", "订盟", "会亲友"], "忌": ["祈福", "求嗣"]},
+        "辰": {"宜": ["订盟", "纳采", "冠笄", "竖柱"], "忌": ["开市", "交易"]},
+        "巳": {"宜": ["塑绘", "会友", "习艺", "入学"], "忌": ["造屋", "起基"]},
+        "午": {"宜": ["祭祀", "祈福", "求嗣", "斋醮"], "忌": ["开市", "立券", "交易"]},
+        "未": {"宜": ["嫁娶", "纳采", "订盟", "会亲友"], "忌": ["动土", "破土"]},
+        "申": {"宜": ["纳财", "开仓", "出货财", "赴任"], "忌": ["词讼", "安门"]},
+        "酉": {"宜": ["祭祀", "祈福", "求嗣", "开光"], "忌": ["出行", "移徙"]},
+        "戌": {"宜": ["会亲友", "订盟", "纳采", "竖柱"], "忌": ["开市", "交易"]},
+        "亥": {"宜": ["沐浴", "剃头", "整手足甲", "扫舍"], "忌": ["开市", "交易", "立券"]}
     }
 
-    def __init__(self):
-        self.user_zodiac = USER_PROFILE["zodiac"]
-        self.user_element = USER_PROFILE["element"]
-        self.favored_elements = USER_PROFILE["favored_elements"]
-        self.忌用元素 = USER_PROFILE["忌用元素"]
+    # 未匹配到当日宜忌时的默认值
+    DEFAULT_ADVICE = {"宜": ["祭祀", "祈福"], "忌": ["动土", "破土"]}
+
+    def __init__(self, profile=None):
+        self.profile = profile or USER_PROFILE
+        self.user_zodiac = self.profile["zodiac"]
+        self.user_element = self.profile["element"]
+        self.favored_elements = self.profile["favored_elements"]
+        self.忌用元素 = self.profile["忌用元素"]
 
     def get_daily_ganzhi(self, target_date=None):
         """
@@ -60,12 +69,10 @@ class MetaphysicsAnalyzer:
         days_diff = (target_date - base_date).days
 
         # 天干循环 (0-9)
-        stems = ["庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁", "戊", "己"]
-        stem = stems[days_diff % 10]
+        stem = self.STEMS[days_diff % 10]
 
         # 地支循环 (0-11)
-        branches = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
-        branch = branches[days_diff % 12]
+        branch = self.BRANCHES[days_diff % 12]
 
         return stem + branch
 
@@ -78,15 +85,18 @@ class MetaphysicsAnalyzer:
         }
         return zodiac_map.get(branch, "")
 
-    def analyze_day(self, target_date=None):
+    def get_day_info(self, target_date=None):
         """
-        分析指定日期的运势
-        返回分析结果字典
+        获取指定日期与用户无关的部分（干支、五行、生肖、基础宜忌）
+        批量分析时每个日期只需计算一次
         """
         if target_date is None:
             target_date = datetime.date.today() + datetime.timedelta(days=1)
 
-        ganzhi = self.get_daily_ganzhi(target_date)
+        return self.day_info_from_ganzhi(target_date, self.get_daily_ganzhi(target_date))
+
+    def day_info_from_ganzhi(self, target_date, ganzhi):
+        """根据已知干支构建日期信息（供预计算日历使用）"""
         stem = ganzhi[0]
         branch = ganzhi[1]
 
@@ -95,40 +105,88 @@ class MetaphysicsAnalyzer:
         branch_element = self.ZODIAC_ELEMENTS.get(branch, "土")
         day_element = stem_element  # 以天干五行作为当日主导五行
 
-        # 获取当日生肖
-        day_zodiac = self.get_zodiac_from_branch(branch)
+        # 获取基础宜忌
+        base_advice = self.DAILY_Advice.get(branch, self.DEFAULT_ADVICE)
 
-        # 分析结果
-        result = {
+        return {
             "date": target_date.strftime("%Y-%m-%d"),
             "ganzhi": ganzhi,
             "day_element": day_element,
+            "day_zodiac": self.get_zodiac_from_branch(branch),
+            "advice": base_advice
+        }
+
+    def analyze_day(self, target_date=None):
+        """
+        分析指定日期的运势
+        返回分析结果字典
+        """
+        return self.apply_profile(self.get_day_info(target_date))
+
+    def apply_profile(self, day_info, profile=None):
+        """
+        在日期信息上叠加用户相关的分析（冲煞、三合、五行喜忌）
+        profile 为空时使用当前分析器的用户
+
+        结果只取决于当日干支和用户的生肖、喜忌五行，直接查 60 甲子 × 12 生肖的预计算表，
+        表外的干支或生肖按逐项计算处理
+        """
+        if profile is None:
+            user_zodiac = self.user_zodiac
+            favored_elements = self.favored_elements
+            忌用元素 = self.忌用元素
+        else:
+            user_zodiac = profile["zodiac"]
+            favored_elements = profile["favored_elements"]
+            忌用元素 = profile["忌用元素"]
+
+        jiazi = JIAZI_INDEX.get(day_info["ganzhi"])
+        zodiac = ZODIAC_INDEX.get(user_zodiac)
+        if jiazi is None or zodiac is None:
+            return self.analyze_profile(day_info, user_zodiac, favored_elements, 忌用元素)
+
+        result = dict(profile_table(tuple(favored_elements), tuple(忌用元素))[jiazi * 12 + zodiac])
+        result["date"] = day_info["date"]
+        return result
+
+    def analyze_profile(self, day_info, user_zodiac, favored_elements, 忌用元素):
+        """
+        逐项计算用户相关的分析（预计算表的生成和校验也使用此方法）
+        """
+        day_element = day_info["day_element"]
+        day_zodiac = day_info["day_zodiac"]
+
+        # 分析结果
+        result = {
+            "date": day_info["date"],
+            "ganzhi": day_info["ganzhi"],
+            "day_element": day_element,
             "day_zodiac": day_zodiac,
             "is_clash": False,
             "is_harmony": False,
             "clash_warning": "",
             "harmony_good": "",
             "element_analysis": "",
-            "advice": {"宜": [], "忌": []},
+            "advice": day_info["advice"],
             "lucky_color_suggestion": "",
             "overall_mood": ""
         }
 
         # 1. 检查冲煞
-        if day_zodiac in ZODIAC_CLASH.get(self.user_zodiac, []):
+        if day_zodiac in ZODIAC_CLASH.get(user_zodiac, []):
             result["is_clash"] = True
-            result["clash_warning"] = f"⚠️ 今日{day_zodiac}日，与您的{self.user_zodiac}相冲！建议保持低调，避免重大决策"
+            result["clash_warning"] = f"⚠️ 今日{day_zodiac}日，与您的{user_zodiac}相冲！建议保持低调，避免重大决策"
 
         # 2. 检查三合
-        if day_zodiac in ZODIAC_HARMONY.get(self.user_zodiac, []):
+        if day_zodiac in ZODIAC_HARMONY.get(user_zodiac, []):
             result["is_harmony"] = True
-            result["harmony_good"] = f"✨ 今日{day_zodiac}日，与您{self.user_zodiac}三合，运势顺畅！"
+            result["harmony_good"] = f"✨ 今日{day_zodiac}日，与您{user_zodiac}三合，运势顺畅！"
 
         # 3. 五行分析
         element_notes = []
-        if day_element in self.favored_elements:
+        if day_element in favored_elements:
             element_notes.append(f"今日五行{day_element}，与您的喜用神相生，非常有利！")
-        elif day_element in self.忌用元素:
+        elif day_element in 忌用元素:
             if day_element == "水":
                 element_notes.append("⚠️ 今日五行水克火，需注意保持平和心态")
             elif day_element == "土":
@@ -138,11 +196,7 @@ class MetaphysicsAnalyzer:
 
         result["element_analysis"] = "".join(element_notes)
 
-        # 4. 获取基础宜忌
-        base_advice = self.DAILY_Advice.get(branch, {"宜": ["祭祀", "祈福"], "忌": ["动土", "破土"]})
-        result["advice"] = base_advice
-
-        # 5. 幸运颜色建议
+        # 4. 幸运颜色建议
         if day_element == "木":
             result["lucky_color_suggestion"] = "绿色系（增强木气）"
         elif day_element == "火":
@@ -154,12 +208,12 @@ class MetaphysicsAnalyzer:
         elif day_element == "水":
             result["lucky_color_suggestion"] = "蓝色系（但需防火）"
 
-        # 6. 整体运势判断
+        # 5. 整体运势判断
         if result["is_harmony"]:
             result["overall_mood"] = "⭐⭐⭐⭐⭐ 运势大吉"
         elif result["is_clash"]:
             result["overall_mood"] = "⭐⭐ 运势欠佳"
-        elif day_element in self.favored_elements:
+        elif day_element in favored_elements:
             result["overall_mood"] = "⭐⭐⭐⭐ 运势良好"
         else:
             result["overall_mood"] = "⭐⭐⭐ 运势平稳"
@@ -167,8 +221,66 @@ class MetaphysicsAnalyzer:
         return result
 
 
+# 六十甲子（与 get_daily_ganzhi 的循环顺序一致，1900-01-01 为第 0 个）
+JIAZI = [MetaphysicsAnalyzer.STEMS[i % 10] + MetaphysicsAnalyzer.BRANCHES[i % 12] for i in range(60)]
+JIAZI_INDEX = {ganzhi: i for i, ganzhi in enumerate(JIAZI)}
+
+# 生肖顺序与地支一致
+ZODIACS = [MetaphysicsAnalyzer().get_zodiac_from_branch(branch) for branch in MetaphysicsAnalyzer.BRANCHES]
+ZODIAC_INDEX = {zodiac: i for i, zodiac in enumerate(ZODIACS)}
+
+# 预计算表的占位日期（查表后替换为实际日期）
+_TABLE_DATE = datetime.date(1900, 1, 1)
+
+
+@lru_cache(maxsize=64)
+def profile_table(favored_elements, 忌用元素):
+    """
+    某组喜忌五行下 60 甲子 × 12 生肖的分析结果表
+    下标为 甲子序号 * 12 + 生肖序号；首次用到某组喜忌五行时生成，之后直接复用
+
+    Args:
+        favored_elements: 喜用神元组
+        忌用元素: 忌用元素元组
+    """
+    analyzer = MetaphysicsAnalyzer()
+    table = []
+    for ganzhi in JIAZI:
+        day_info = analyzer.day_info_from_ganzhi(_TABLE_DATE, ganzhi)
+        for zodiac in ZODIACS:
+            table.append(analyzer.analyze_profile(day_info, zodiac, list(favored_elements), list(忌用元素)))
+    return table
+
+
+def check_profile_table(profile=None):
+    """
+    校验预计算表与逐项计算的结果一致
+
+    Returns:
+        list: 不一致的 (干支, 生肖) 列表，为空表示一致
+    """
+    profile = profile or USER_PROFILE
+    analyzer = MetaphysicsAnalyzer(profile)
+    mismatches = []
+    for ganzhi in JIAZI:
+        day_info = analyzer.day_info_from_ganzhi(_TABLE_DATE, ganzhi)
+        for zodiac in ZODIACS:
+            user = dict(profile, zodiac=zodiac)
+            expected = analyzer.analyze_profile(day_info, zodiac, user["favored_elements"], user["忌用元素"])
+            if analyzer.apply_profile(day_info, user) != expected:
+                mismatches.append((ganzhi, zodiac))
+    return mismatches
+
+
+# 预先生成默认用户的表
+profile_table(tuple(USER_PROFILE["favored_elements"]), tuple(USER_PROFILE["忌用元素"]))
+
+
 # 测试
 if __name__ == "__main__":
+    mismatches = check_profile_table()
+    print(f"预计算表校验: {'一致' if not mismatches else f'{len(mismatches)} 处不一致: {mismatches[:5]}'}")
+
     analyzer = MetaphysicsAnalyzer()
     result = analyzer.analyze_day()
     print(f"日期: {result['date']}")
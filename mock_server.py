@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+本地 Server酱 模拟服务
+模拟 sctapi.ftqq.com 的 /{sckey}.send 接口，可注入延迟和故障，用于测试和压测
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """模拟接口请求处理器"""
+
+    protocol_version = "HTTP/1.1"
+    # 头部和正文分两次写出，需关闭 Nagle 算法避免 40ms 延迟确认
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server.mock
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        fields = parse_qs(body)
+
+        fault = server.next_fault()
+        delay = server.next_latency()
+        if delay:
+            time.sleep(delay)
+
+        if fault == "timeout":
+            # 超过客户端超时时间后再返回
+            time.sleep(server.timeout_delay)
+            self._reply(504, {"code": 504, "message": "gateway timeout"})
+        elif fault == "rate_limit":
+            self._reply(429, {"code": 429, "message": "too many requests"}, {"Retry-After": "1"})
+        elif fault == "server_error":
+            self._reply(503, {"code": 503, "message": "service unavailable"})
+        elif fault == "bad_key":
+            self._reply(200, {"code": 40001, "message": "bad pushkey", "msg": "bad pushkey"})
+        else:
+            server.record(self.path, fields)
+            self._reply(200, {
+                "code": 0,
+                "message": "",
+                "data": {"pushid": str(server.delivered), "readkey": "mock", "error": "SUCCESS"}
+            })
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    """允许较多排队连接的线程化 HTTP 服务"""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class MockServerChan:
+    """
+    Server酱模拟服务
+
+    Args:
+        latency_ms: 每个请求的基础延迟（毫秒）
+        jitter_ms: 延迟随机波动范围（毫秒）
+        error_rate: 故障注入概率 (0-1)
+        faults: 故障类型列表，从 rate_limit / server_error / timeout / bad_key 中随机选择
+    """
+
+    FAULTS = ["rate_limit", "server_error"]
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, faults=None, seed=None):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.faults = faults or self.FAULTS
+        self.timeout_delay = 15
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.delivered = 0
+        self.messages = []
+        self.keep_messages = False
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """可直接传给 ServerChanPusher(api_url=...) 的地址模板"""
+        return f"http://{self.host}:{self.port}/{{sckey}}.send"
+
+    def next_fault(self):
+        """决定本次请求是否注入故障"""
+        with self.lock:
+            self.requests += 1
+            if self.error_rate and self.rng.random() < self.error_rate:
+                return self.rng.choice(self.faults)
+        return None
+
+    def next_latency(self):
+        """本次请求的延迟（秒）"""
+        if not self.latency_ms and not self.jitter_ms:
+            return 0
+        with self.lock:
+            jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(0, self.latency_ms + jitter) / 1000
+
+    def record(self, path, fields):
+        """记录一条成功送达的消息"""
+        with self.lock:
+            self.delivered += 1
+            if self.keep_messages:
+                self.messages.append({
+                    "sckey": path.strip("/").rsplit(".send", 1)[0],
+                    "title": fields.get("title", [""])[0],
+                    "short": fields.get("short", [""])[0]
+                })
+
+    def start(self):
+        """在后台线程启动服务"""
+        self._server = _Server((self.host, self.port), _Handler)
+        self._server.mock = self
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# 测试
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地 Server酱 模拟服务")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    mock = MockServerChan(port=args.port, latency_ms=args.latency_ms,
+                          jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+    mock.start()
+    print(f"模拟服务已启动: {mock.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        mock.stop()
@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+"""
+推送发件箱模块
+渲染好的消息先写入本地 SQLite（WAL 模式）发件箱，以 (订阅用户, 日期, 内容哈希) 去重，
+推送进程领取（claim）一批消息、发送后确认（ack），崩溃或重跑时从未完成处继续，
+已送达的消息不会再次生成或发送；多个进程可同时消费同一个发件箱
+
+投递语义为至少一次：消息发出后、确认前进程崩溃，租约到期后会被重新领取；
+发送失败的消息按指数退避推迟到 next_attempt_at 之后才能再次领取
+"""
+
+import datetime
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from config import (
+    OUTBOX_PATH, OUTBOX_LEASE_SECONDS, OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_DELAY, OUTBOX_RETRY_MAX_DELAY
+)
+from channels import route_fields
+from ratelimit import RetryPolicy
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    subscriber TEXT NOT NULL,
+    date TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    sckey TEXT,
+    channel TEXT,
+    address TEXT,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    short TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    lease_until REAL,
+    next_attempt_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    delivered_at REAL,
+    UNIQUE (subscriber, date, content_hash)
+);
+CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, lease_until);
+CREATE INDEX IF NOT EXISTS outbox_subscriber_date ON outbox (subscriber, date);
+"""
+
+# 旧版本发件箱缺少的列（打开时自动补齐）
+MIGRATIONS = (
+    ("channel", "ALTER TABLE outbox ADD COLUMN channel TEXT"),
+    ("address", "ALTER TABLE outbox ADD COLUMN address TEXT"),
+    ("next_attempt_at", "ALTER TABLE outbox ADD COLUMN next_attempt_at REAL"),
+)
+
+# 等待退避中的消息到期时，单次休眠的上限（秒）
+DRAIN_POLL_SECONDS = 5
+
+# 消息状态
+PENDING = "pending"
+CLAIMED = "claimed"
+DELIVERED = "delivered"
+FAILED = "failed"
+
+
+def subscriber_id(profile):
+    """
+    订阅用户标识：优先 id，其次渠道地址（Server酱 为 SendKey，其他渠道为 渠道名:地址）
+    用户名不唯一，不作为标识；既没有 id 也没有渠道地址时返回 None
+
+    Returns:
+        str 或 None
+    """
+    if profile.get("id"):
+        return str(profile["id"])
+    route = route_fields(profile)
+    if not route["address"]:
+        return None
+    if route["channel"] == "serverchan":
+        return str(route["address"])
+    return f"{route['channel']}:{route['address']}"
+
+
+def identified(profiles, skipped=None):
+    """
+    过滤掉没有唯一标识的用户并记录警告（惰性），skipped 为列表时追加被过滤的用户
+
+    Yields:
+        dict: 有唯一标识的用户信息
+    """
+    for profile in profiles:
+        if subscriber_id(profile) is None:
+            logger.warning(f"用户 {profile.get('name', '')} 没有 id 或渠道地址，无法与其他用户区分，跳过")
+            if skipped is not None:
+                skipped.append(profile)
+            continue
+        yield profile
+
+
+def content_hash(title, content, short=None):
+    digest = hashlib.sha1()
+    for part in (title, content, short or ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _date_str(target_date):
+    if isinstance(target_date, datetime.date):
+        return target_date.strftime("%Y-%m-%d")
+    return target_date
+
+
+class Outbox:
+    """
+    SQLite 发件箱（每个线程一个连接，close() 时全部关闭）
+
+    Args:
+        path: 数据库文件路径
+        lease_seconds: 领取后的租约时长，超时未确认的消息可被其他进程重新领取
+        max_attempts: 最大发送次数，超过后标记为 failed
+        retry_policy: 发送失败后重新领取前的退避策略，默认按 OUTBOX_RETRY_DELAY / OUTBOX_RETRY_MAX_DELAY
+    """
+
+    def __init__(self, path=None, lease_seconds=None, max_attempts=None, retry_policy=None):
+        self.path = path or OUTBOX_PATH
+        self.lease_seconds = lease_seconds or OUTBOX_LEASE_SECONDS
+        self.max_attempts = max_attempts or OUTBOX_MAX_ATTEMPTS
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_retries=self.max_attempts - 1,
+            base_delay=OUTBOX_RETRY_DELAY,
+            max_delay=OUTBOX_RETRY_MAX_DELAY
+        )
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}
+        for column, statement in MIGRATIONS:
+            if column not in columns:
+                conn.execute(statement)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # 连接只在创建它的线程中使用，关闭时可能在其他线程，因此不检查线程
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """关闭所有线程打开的连接（在其他线程不再使用发件箱后调用）"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def existing(self, subscribers, target_date):
+        """已写入发件箱（无论是否送达）的订阅用户集合，这些用户不需要再生成消息"""
+        date = _date_str(target_date)
+        subscribers = list(subscribers)
+        found = set()
+        conn = self._connect()
+        # SQLite 单条语句的参数个数有限，分批查询
+        for start in range(0, len(subscribers), 500):
+            batch = subscribers[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT DISTINCT subscriber FROM outbox WHERE date = ? AND subscriber IN ({placeholders})",
+                [date] + batch
+            )
+            found.update(row[0] for row in rows)
+        return found
+
+    def enqueue(self, messages, target_date):
+        """
+        写入消息，(订阅用户, 日期, 内容哈希) 已存在时忽略
+
+        Args:
+            messages: [{"subscriber", "title", "content", "short", "sckey", "channel", "address"}]
+
+        Returns:
+            int: 新写入的条数
+        """
+        date = _date_str(target_date)
+        now = time.time()
+        rows = [
+            (m["subscriber"], date, content_hash(m["title"], m["content"], m.get("short")),
+             m.get("sckey"), m.get("channel"), m.get("address"), m["title"], m["content"], m.get("short"), now)
+            for m in messages
+        ]
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO outbox (subscriber, date, content_hash, sckey, channel, address, "
+                "title, content, short, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            inserted = conn.total_changes - before
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return inserted
+
+    def claim(self, worker_id, limit=50, target_date=None):
+        """
+        领取待发送消息（未领取且已到重试时间的，或租约已过期的）
+
+        Returns:
+            list: [{"id", "subscriber", "date", "sckey", "channel", "address", "title", "content", "short", "attempts"}]
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            query = ("SELECT id FROM outbox WHERE ((status = ? AND (next_attempt_at IS NULL OR next_attempt_at <= ?)) "
+                     "OR (status = ? AND lease_until < ?))")
+            params = [PENDING, now, CLAIMED, now]
+            if target_date is not None:
+                query += " AND date = ?"
+                params.append(_date_str(target_date))
+            query += " ORDER BY id LIMIT ?"
+            params.append(limit)
+            ids = [row[0] for row in conn.execute(query, params)]
+            if not ids:
+                conn.execute("COMMIT")
+                return []
+
+            placeholders = ",".join("?" * len(ids))
+            conn.execute(
+                f"UPDATE outbox SET status = ?, claimed_by = ?, lease_until = ?, attempts = attempts + 1 "
+                f"WHERE id IN ({placeholders})",
+                [CLAIMED, worker_id, now + self.lease_seconds] + ids
+            )
+            rows = conn.execute(
+                f"SELECT id, subscriber, date, sckey, channel, address, title, content, short, attempts FROM outbox "
+                f"WHERE id IN ({placeholders}) ORDER BY id",
+                ids
+            ).fetchall()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        keys = ("id", "subscriber", "date", "sckey", "channel", "address", "title", "content", "short", "attempts")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def ack(self, worker_id, ids):
+        """确认送达（只确认仍由本进程持有的消息）"""
+        if not ids:
+            return 0
+        conn = self._connect()
+        placeholders = ",".join("?" * len(ids))
+        cursor = conn.execute(
+            f"UPDATE outbox SET status = ?, delivered_at = ?, lease_until = NULL, last_error = NULL "
+            f"WHERE claimed_by = ? AND status = ? AND id IN ({placeholders})",
+            [DELIVERED, time.time(), worker_id, CLAIMED] + list(ids)
+        )
+        return cursor.rowcount
+
+    def nack(self, worker_id, message_id, error, retryable=True, attempts=1, retry_after=None):
+        """
+        发送失败：可重试且未超过最大次数时放回队列，按退避推迟到 next_attempt_at 后才能再次领取，
+        否则标记为 failed
+
+        Args:
+            attempts: 该消息已发送的次数（领取结果中的 attempts）
+            retry_after: 服务端要求的等待时间（秒），优先于退避时间
+        """
+        delay = self.retry_policy.backoff(max(0, attempts - 1), retry_after)
+        conn = self._connect()
+        conn.execute(
+            "UPDATE outbox SET status = CASE WHEN ? AND attempts < ? THEN ? ELSE ? END, "
+            "lease_until = NULL, next_attempt_at = ?, last_error = ? WHERE id = ? AND claimed_by = ? AND status = ?",
+            (int(retryable), self.max_attempts, PENDING, FAILED, time.time() + delay, error,
+             message_id, worker_id, CLAIMED)
+        )
+
+    def release(self, worker_id, target_date=None):
+        """
+        将本消费者领取后未确认的消息放回队列（进程中断后重跑时使用，不必等租约过期）
+        已发送次数保留，中断前可能已经发出
+
+        Returns:
+            int: 放回的条数
+        """
+        query = ("UPDATE outbox SET status = ?, lease_until = NULL, next_attempt_at = NULL "
+                 "WHERE status = ? AND claimed_by = ?")
+        params = [PENDING, CLAIMED, worker_id]
+        if target_date is not None:
+            query += " AND date = ?"
+            params.append(_date_str(target_date))
+        return self._connect().execute(query, params).rowcount
+
+    def next_attempt(self, target_date=None):
+        """退避中（待发送但尚未到重试时间）的消息中最早的重试时间，没有时返回 None"""
+        query = "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ? AND next_attempt_at > ?"
+        params = [PENDING, time.time()]
+        if target_date is not None:
+            query += " AND date = ?"
+            params.append(_date_str(target_date))
+        return self._connect().execute(query, params).fetchone()[0]
+
+    def requeue_failed(self, target_date=None):
+        """将已失败的消息放回队列并清零发送次数（手动重跑时使用）"""
+        query = "UPDATE outbox SET status = ?, attempts = 0, next_attempt_at = NULL WHERE status = ?"
+        params = [PENDING, FAILED]
+        if target_date is not None:
+            query += " AND date = ?"
+            params.append(_date_str(target_date))
+        return self._connect().execute(query, params).rowcount
+
+    def status(self, subscriber, target_date):
+        """某订阅用户某日消息的状态，不存在时返回 None"""
+        row = self._connect().execute(
+            "SELECT status, last_error FROM outbox WHERE subscriber = ? AND date = ? ORDER BY id DESC LIMIT 1",
+            (subscriber, _date_str(target_date))
+        ).fetchone()
+        return None if row is None else {"status": row[0], "last_error": row[1]}
+
+    def stats(self, target_date=None):
+        """按状态统计条数"""
+        query = "SELECT status, COUNT(*) FROM outbox"
+        params = []
+        if target_date is not None:
+            query += " WHERE date = ?"
+            params.append(_date_str(target_date))
+        counts = {PENDING: 0, CLAIMED: 0, DELIVERED: 0, FAILED: 0}
+        for status, count in self._connect().execute(query + " GROUP BY status", params):
+            counts[status] = count
+        return counts
+
+    def drain(self, pusher, worker_id=None, batch_size=50, target_date=None, on_result=None, wait=True):
+        """
+        持续领取并发送消息，直到没有待发送的消息
+
+        Args:
+            pusher: 推送器（需提供 push_many，如 ChannelRouter 或单个渠道）
+            worker_id: 消费者标识，默认 主机名:进程号
+            batch_size: 每次领取的条数（也是崩溃时可能重复发送的最大条数）
+            on_result: 每条消息发送后的回调 on_result(message, result)
+            wait: 是否等待退避中的消息到期后继续发送；为 False 时没有可立即领取的消息就返回
+
+        Returns:
+            dict: {"delivered", "failed", "retried"}
+        """
+        worker_id = worker_id or f"{os.uname().nodename}:{os.getpid()}"
+        totals = {"delivered": 0, "failed": 0, "retried": 0}
+        while True:
+            claimed = self.claim(worker_id, batch_size, target_date)
+            if not claimed:
+                due = self.next_attempt(target_date) if wait else None
+                if due is None:
+                    return totals
+                time.sleep(min(DRAIN_POLL_SECONDS, max(0.0, due - time.time())))
+                continue
+
+            outcome = pusher.push_many(claimed)
+            delivered = []
+            for message, result in zip(claimed, outcome["results"]):
+                if result["success"]:
+                    delivered.append(message["id"])
+                else:
+                    retryable = pusher.retry_policy.is_retryable(result) if hasattr(pusher, "retry_policy") else True
+                    self.nack(worker_id, message["id"], result["message"], retryable,
+                              message["attempts"], result.get("retry_after"))
+                    if retryable and message["attempts"] < self.max_attempts:
+                        totals["retried"] += 1
+                    else:
+                        totals["failed"] += 1
+                if on_result is not None:
+                    on_result(message, result)
+            totals["delivered"] += self.ack(worker_id, delivered)
+
+
+# 测试
+if __name__ == "__main__":
+    import tempfile
+    from multiprocessing import Process
+    from mock_server import MockServerChan
+    from pusher import ServerChanPusher
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    path = os.path.join(tempfile.mkdtemp(), "outbox.db")
+    target = datetime.date.today() + datetime.timedelta(days=1)
+
+    def worker(url):
+        with ServerChanPusher(api_url=url, rate_limit=0) as pusher:
+            totals = Outbox(path).drain(pusher, batch_size=20)
+        print(f"进程 {os.getpid()}: {totals}")
+
+    with MockServerChan(latency_ms=5) as mock:
+        outbox = Outbox(path)
+        messages = [{"subscriber": f"user{i}", "title": "标题", "content": f"正文{i}", "short": "摘要", "sckey": "KEY"}
+                    for i in range(500)]
+        print(f"写入: {outbox.enqueue(messages, target)}，重复写入: {outbox.enqueue(messages, target)}")
+
+        workers = [Process(target=worker, args=(mock.url,)) for _ in range(4)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+
+        print(f"发件箱: {outbox.stats(target)}，服务端收到: {mock.requests}")
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+多进程流水线推送模块
+合成与渲染（CPU 密集）按分片分发到进程池，结果经有界队列流入推送（I/O）阶段，
+队列满时暂停提交新分片，形成背压
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from config import PIPELINE_WORKERS, PIPELINE_CHUNK_SIZE, PIPELINE_QUEUE_SIZE
+from metrics import STAGE_SECONDS
+from outbox import subscriber_id, identified
+from channels import route_fields
+
+
+logger = logging.getLogger(__name__)
+
+# 推送队列已满时检查推送阶段是否异常退出的间隔（秒）
+PUT_POLL_SECONDS = 0.1
+
+# 工作进程内复用的缓存（相同指纹的用户只合成、渲染一次）
+_worker_cache = None
+
+
+def _init_worker():
+    global _worker_cache
+    from cache import ReportCache
+    _worker_cache = ReportCache()
+
+
+def render_chunk(profiles, target_date):
+    """
+    工作进程：合成并渲染一个分片
+    工作进程中的指标不会回到主进程，各阶段耗时随结果返回，由主进程记录
+
+    Returns:
+        tuple: (消息列表, 耗时秒, 各阶段耗时 {"synthesize": 秒, "format": 秒})
+    """
+    started = time.perf_counter()
+    timings = {}
+    entries = _worker_cache.build_many(profiles, target_date, timings=timings)
+    messages = [
+        {
+            "title": entry["title"],
+            "content": entry["content"],
+            "short": entry["short"],
+            "sckey": profile.get("sckey"),
+            "subscriber": subscriber_id(profile),
+            "name": profile.get("name", ""),
+            **route_fields(profile)
+        }
+        for profile, entry in zip(profiles, entries)
+    ]
+    return messages, time.perf_counter() - started, timings
+
+
+def iter_chunks(items, size):
+    """将可迭代对象按 size 切分为列表（惰性）"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class PipelineRunner:
+    """
+    合成 → 渲染 → 推送 流水线
+
+    Args:
+        pusher: 推送器（需提供 push_many），默认按用户渠道分发的 ChannelRouter()
+        workers: 合成/渲染进程数，默认 CPU 核数
+        chunk_size: 每个分片的用户数
+        queue_size: 渲染结果队列容量（分片数），同时也限制在途分片数
+        outbox: 发件箱（Outbox），设置后已在发件箱中的用户不再生成，消息先写入发件箱再发送，
+                重跑时只补发未送达的消息
+    """
+
+    def __init__(self, pusher=None, workers=None, chunk_size=None, queue_size=None, outbox=None):
+        if pusher is None:
+            from channels import ChannelRouter
+            pusher = ChannelRouter()
+        self.pusher = pusher
+        self.workers = workers or PIPELINE_WORKERS or os.cpu_count() or 1
+        self.chunk_size = chunk_size or PIPELINE_CHUNK_SIZE
+        self.queue_size = queue_size or PIPELINE_QUEUE_SIZE
+        self.outbox = outbox
+
+    def _push_stage(self, chunks, stats, target_date, on_result, failure):
+        """推送阶段：从队列取出渲染好的分片并批量推送，异常记录到 failure 后退出"""
+        try:
+            self._push_chunks(chunks, stats, target_date, on_result)
+        except Exception as e:
+            failure["error"] = e
+            logger.error(f"推送阶段异常退出: {e}")
+
+    def _push_chunks(self, chunks, stats, target_date, on_result):
+        while True:
+            messages = chunks.get()
+            if messages is None:
+                break
+            started = time.perf_counter()
+            if self.outbox is None:
+                outcome = self.pusher.push_many(messages)
+                stats["success"] += outcome["stats"]["success"]
+                stats["failed"] += outcome["stats"]["failed"]
+                if on_result is not None:
+                    for message, result in zip(messages, outcome["results"]):
+                        on_result(message, result)
+            else:
+                self.outbox.enqueue(messages, target_date)
+                # 退避中的消息留到最后统一等待，不阻塞后续分片
+                self._drain(stats, target_date, on_result, wait=False)
+            seconds = time.perf_counter() - started
+            STAGE_SECONDS.labels("push").observe(seconds)
+            stats["push_seconds"] += seconds
+            stats["pushed"] += len(messages)
+
+        # 补发之前运行中断时留下的消息，以及退避中的消息
+        if self.outbox is not None:
+            started = time.perf_counter()
+            self._drain(stats, target_date, on_result)
+            stats["push_seconds"] += time.perf_counter() - started
+
+    def _drain(self, stats, target_date, on_result, wait=True):
+        totals = self.outbox.drain(self.pusher, batch_size=self.chunk_size,
+                                   target_date=target_date, on_result=on_result, wait=wait)
+        stats["success"] += totals["delivered"]
+        stats["failed"] += totals["failed"]
+
+    def run(self, profiles, target_date, on_result=None):
+        """
+        运行流水线
+
+        Args:
+            profiles: 用户信息的可迭代对象（可以是惰性生成器）
+            target_date: 目标日期
+            on_result: 每条消息推送完成后的回调 on_result(message, result)
+
+        Returns:
+            dict: 各阶段吞吐统计
+        """
+        stats = {
+            "subscribers": 0, "skipped": 0, "rejected": 0, "chunks": 0,
+            "render_seconds": 0.0, "push_seconds": 0.0,
+            "pushed": 0, "success": 0, "failed": 0
+        }
+        chunks = queue.Queue(maxsize=self.queue_size)
+        failure = {}
+        rejected = []
+        pusher_thread = threading.Thread(
+            target=self._push_stage, args=(chunks, stats, target_date, on_result, failure), daemon=True
+        )
+
+        def put(item):
+            """放入推送队列，推送阶段已异常退出时不再等待，抛出其异常"""
+            while "error" not in failure:
+                try:
+                    chunks.put(item, timeout=PUT_POLL_SECONDS)
+                    return
+                except queue.Full:
+                    continue
+            raise failure["error"]
+
+        started = time.perf_counter()
+        pusher_thread.start()
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+                pending = set()
+
+                def drain():
+                    nonlocal pending
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        messages, seconds, timings = future.result()
+                        stats["render_seconds"] += seconds
+                        for stage, stage_seconds in timings.items():
+                            STAGE_SECONDS.labels(stage).observe(stage_seconds)
+                        # 推送阶段落后时在这里阻塞（背压）
+                        put(messages)
+
+                # 没有唯一标识的用户无法去重和确认送达，不推送
+                for chunk in iter_chunks(identified(profiles, rejected), self.chunk_size):
+                    stats["subscribers"] += len(chunk)
+                    if self.outbox is not None:
+                        # 已在发件箱中的用户不再生成
+                        existing = self.outbox.existing([subscriber_id(p) for p in chunk], target_date)
+                        if existing:
+                            size = len(chunk)
+                            chunk = [p for p in chunk if subscriber_id(p) not in existing]
+                            stats["skipped"] += size - len(chunk)
+                        if not chunk:
+                            continue
+                    pending.add(pool.submit(render_chunk, chunk, target_date))
+                    stats["chunks"] += 1
+                    # 在途分片数受限，避免一次性把所有用户读入内存
+                    while len(pending) >= self.workers + self.queue_size:
+                        drain()
+
+                while pending:
+                    drain()
+        finally:
+            if "error" not in failure:
+                put(None)
+            pusher_thread.join()
+        if "error" in failure:
+            raise failure["error"]
+
+        elapsed = time.perf_counter() - started
+        stats["rejected"] = len(rejected)
+        stats["subscribers"] += stats["rejected"]
+        stats["elapsed_seconds"] = elapsed
+        stats["throughput"] = stats["pushed"] / elapsed if elapsed > 0 else 0.0
+        rendered = stats["subscribers"] - stats["skipped"] - stats["rejected"]
+        stats["render_rate"] = rendered / stats["render_seconds"] if stats["render_seconds"] > 0 else 0.0
+        stats["push_rate"] = (stats["pushed"] / stats["push_seconds"]
+                              if stats["push_seconds"] > 0 else 0.0)
+        return stats
+
+
+def log_stats(stats):
+    """输出流水线统计"""
+    logger.info(f"用户 {stats['subscribers']}（已在发件箱中跳过 {stats['skipped']}，缺少标识跳过 {stats['rejected']}），"
+                f"分片 {stats['chunks']}，"
+                f"总耗时 {stats['elapsed_seconds']:.2f}s，整体吞吐 {stats['throughput']:.0f} 条/s")
+    logger.info(f"合成+渲染: 累计进程耗时 {stats['render_seconds']:.2f}s，单进程 {stats['render_rate']:.0f} 条/s")
+    logger.info(f"推送: 耗时 {stats['push_seconds']:.2f}s，{stats['push_rate']:.0f} 条/s，"
+                f"成功 {stats['success']}，失败 {stats['failed']}")
+
+
+# 测试
+if __name__ == "__main__":
+    import datetime
+    from config import USER_PROFILE
+    from mock_server import MockServerChan
+    from pusher import ServerChanPusher
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    zodiacs = ["鼠", "牛", "虎", "兔", "龙", "蛇", "马", "羊", "猴", "鸡", "狗", "猪"]
+    profiles = (dict(USER_PROFILE, id=f"user{i}", name=f"用户{i}", zodiac=zodiacs[i % 12], birth_year=1950 + i % 60)
+                for i in range(5000))
+
+    with MockServerChan(latency_ms=5) as mock:
+        runner = PipelineRunner(ServerChanPusher(api_url=mock.url, rate_limit=0, concurrency=32))
+        stats = runner.run(profiles, datetime.date.today() + datetime.timedelta(days=1))
+        log_stats(stats)
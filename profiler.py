@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+分阶段 CPU 性能分析
+运行期间替换各阶段的入口方法，每次调用在 cProfile 下执行（每个线程一个 Profile，结束时合并），
+输出每个阶段的 pstats 文件、可直接交给 flamegraph.pl / speedscope 的折叠栈文本，以及热点函数汇总
+
+Python 3.12 起 cProfile 基于 sys.monitoring：整个进程同一时刻只能启用一个 Profile，且启用后会记录所有线程的调用，
+因此采集期间各线程的 CPU 阶段调用串行执行（计时仍只含阶段本身）；推送阶段主要在等待网络，
+串行化会拖慢并发推送，3.12 起只计时不采集（TIMED_STAGES）；3.11 及以前各线程并行采集所有阶段
+
+折叠栈由 cProfile 的调用关系推算：被多个调用方调用的函数，其耗时按各调用方的累计耗时比例分摊
+"""
+
+import contextlib
+import cProfile
+import functools
+import importlib
+import os
+import pstats
+import sys
+import threading
+import time
+
+
+# 各阶段的入口方法 (模块, 类, 方法)，同一线程中阶段嵌套时只记录最外层
+STAGES = {
+    "analyze_day": [
+        ("metaphysics", "MetaphysicsAnalyzer", "analyze_day"),
+        ("synthesizer", "FortuneSynthesizer", "_get_day_info"),
+        ("metaphysics", "MetaphysicsAnalyzer", "apply_profile"),
+    ],
+    "get_daily_fortune": [
+        ("synthesizer", "FortuneSynthesizer", "_get_horoscope"),
+        ("horoscope", "HoroscopeGenerator", "get_daily_fortune"),
+    ],
+    "_combine_analysis": [
+        ("synthesizer", "FortuneSynthesizer", "_combine_analysis"),
+    ],
+    "format_fortune_message": [
+        ("pusher", "ServerChanPusher", "format_fortune_message"),
+        ("channels", "ChannelRouter", "format_fortune_message"),
+        ("templates", "FortuneTemplate", "render"),
+    ],
+    "push": [
+        ("channels", "ChannelRouter", "push"),
+        ("pusher", "ServerChanPusher", "push"),
+        ("channels", "Channel", "push"),
+    ],
+}
+
+# 折叠栈最大深度
+MAX_DEPTH = 64
+
+# 采集器自身的调用，不计入结果
+_PROFILER_FUNCS = {("~", 0, "<method 'disable' of '_lsprof.Profiler' objects>")}
+
+# 启用 Profile 前需持有的锁：3.12 起进程内所有采集串行进行，之前的版本各线程互不影响
+_PROFILE_GUARD = threading.Lock() if sys.version_info >= (3, 12) else contextlib.nullcontext()
+
+# 只计时、不采集调用的阶段：3.12 起采集需持锁，网络等待为主的阶段不能串行执行
+TIMED_STAGES = frozenset({"push"}) if sys.version_info >= (3, 12) else frozenset()
+
+
+def code_key(func):
+    """Python 函数 → pstats 函数键"""
+    code = func.__code__
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def prune_stats(stats, roots):
+    """
+    只保留从 roots 可达的函数（就地修改 pstats.Stats）
+    3.12 起采集期间其他线程执行的函数也会被记录，它们不在阶段入口之下，在这里去掉
+    """
+    children = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller in callers:
+            children.setdefault(caller, []).append(func)
+
+    keep = set()
+    pending = [func for func in roots if func in stats.stats]
+    while pending:
+        func = pending.pop()
+        if func not in keep:
+            keep.add(func)
+            pending.extend(children.get(func, ()))
+
+    stats.stats = {
+        func: (cc, nc, tt, ct, {caller: edge for caller, edge in callers.items() if caller in keep})
+        for func, (cc, nc, tt, ct, callers) in stats.stats.items() if func in keep
+    }
+    stats.total_calls = stats.prim_calls = 0
+    stats.total_tt = 0.0
+    stats.top_level = set()
+    stats.fcn_list = 0
+    stats.get_top_level_stats()
+    return stats
+
+
+def func_label(func):
+    """pstats 函数键 (文件, 行号, 函数名) → 折叠栈中的帧名"""
+    filename, line, name = func
+    if filename == "~":
+        # 内置函数
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed_stacks(stats, root=None):
+    """
+    由 pstats.Stats 推算折叠栈
+
+    Args:
+        stats: pstats.Stats
+        root: 加在每条栈最前面的帧名（如阶段名）
+
+    Returns:
+        dict: {"帧1;帧2;...": 自身耗时（微秒，整数）}
+    """
+    entries = {func: entry for func, entry in stats.stats.items() if func not in _PROFILER_FUNCS}
+    children = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge[3]))
+
+    stacks = {}
+
+    def visit(func, path, funcs, ratio):
+        _, _, tt, ct, _ = entries[func]
+        path = path + (func_label(func),)
+        funcs = funcs | {func}
+        weight = int(round(tt * ratio * 1e6))
+        if weight > 0:
+            key = ";".join(path)
+            stacks[key] = stacks.get(key, 0) + weight
+        if len(path) >= MAX_DEPTH:
+            return
+        for callee, edge_ct in children.get(func, ()):
+            callee_ct = entries[callee][3]
+            # 递归调用和可忽略的分支不再展开
+            if callee in funcs or callee_ct <= 0 or edge_ct * ratio < 1e-6:
+                continue
+            visit(callee, path, funcs, ratio * min(1.0, edge_ct / callee_ct))
+
+    prefix = (root,) if root else ()
+    for func, (_, _, _, _, callers) in entries.items():
+        if not any(caller in entries for caller in callers):
+            visit(func, prefix, frozenset(), 1.0)
+    return stacks
+
+
+def write_collapsed(stacks, path):
+    """按折叠栈格式写出（每行: 帧1;帧2;... 权重）"""
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, weight in sorted(stacks.items()):
+            f.write(f"{stack} {weight}\n")
+
+
+class StageProfiler:
+    """
+    分阶段 cProfile 采集
+
+    用法:
+        with StageProfiler() as profiler:
+            run_daily_fortune()
+        profiler.write("profile")
+        print_summary(profiler.summary())
+
+    Args:
+        stages: {阶段名: [(模块, 类, 方法)]}，默认 STAGES
+        timed: 只计时、不采集调用的阶段名，默认 TIMED_STAGES
+    """
+
+    def __init__(self, stages=None, timed=None):
+        self.stages = stages or STAGES
+        self.timed = TIMED_STAGES if timed is None else frozenset(timed)
+        self._profiles = {}
+        self._entries = {}
+        self._calls = {}
+        self._seconds = {}
+        self._patched = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _profile(self, stage):
+        """当前线程在该阶段的 Profile（cProfile 只采集启用它的线程）"""
+        key = (stage, threading.get_ident())
+        profile = self._profiles.get(key)
+        if profile is None:
+            with self._lock:
+                profile = self._profiles.setdefault(key, cProfile.Profile())
+        return profile
+
+    def _record(self, stage, seconds):
+        with self._lock:
+            self._calls[stage] = self._calls.get(stage, 0) + 1
+            self._seconds[stage] = self._seconds.get(stage, 0.0) + seconds
+
+    def _wrap(self, stage, func):
+        profiler = self
+
+        if stage in self.timed:
+            @functools.wraps(func)
+            def timed(*args, **kwargs):
+                if getattr(profiler._local, "stage", None) is not None:
+                    return func(*args, **kwargs)
+                profiler._local.stage = stage
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profiler._record(stage, time.perf_counter() - started)
+                    profiler._local.stage = None
+
+            return timed
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(profiler._local, "stage", None) is not None:
+                return func(*args, **kwargs)
+            profile = profiler._profile(stage)
+            profiler._local.stage = stage
+            try:
+                with _PROFILE_GUARD:
+                    started = time.perf_counter()
+                    profile.enable()
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        profile.disable()
+                        profiler._record(stage, time.perf_counter() - started)
+            finally:
+                profiler._local.stage = None
+
+        return wrapper
+
+    def start(self):
+        """替换各阶段入口方法，开始采集"""
+        for stage, targets in self.stages.items():
+            for module_name, class_name, method in targets:
+                owner = getattr(importlib.import_module(module_name), class_name)
+                original = owner.__dict__[method]
+                setattr(owner, method, self._wrap(stage, original))
+                self._entries.setdefault(stage, set()).add(code_key(original))
+                self._patched.append((owner, method, original))
+        return self
+
+    def stop(self):
+        """恢复原方法"""
+        while self._patched:
+            owner, method, original = self._patched.pop()
+            setattr(owner, method, original)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self, stage):
+        """合并各线程的采集结果（只保留阶段入口之下的调用），阶段未被调用时返回 None"""
+        profiles = [p for (name, _), p in self._profiles.items() if name == stage]
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return prune_stats(stats, self._entries.get(stage, ()))
+
+    def write(self, directory):
+        """
+        写出每个阶段的 <阶段>.pstats、<阶段>.collapsed，以及合并所有阶段的 all.collapsed
+
+        Returns:
+            list: 写出的文件路径
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        combined = {}
+        for stage in self.stages:
+            stats = self.stats(stage)
+            if stats is None:
+                continue
+            path = os.path.join(directory, f"{stage}.pstats")
+            stats.dump_stats(path)
+            paths.append(path)
+
+            stacks = collapsed_stacks(stats, root=stage)
+            path = os.path.join(directory, f"{stage}.collapsed")
+            write_collapsed(stacks, path)
+            paths.append(path)
+            combined.update(stacks)
+
+        path = os.path.join(directory, "all.collapsed")
+        write_collapsed(combined, path)
+        paths.append(path)
+        return paths
+
+    def summary(self, top=10):
+        """
+        各阶段调用次数、累计耗时和自身耗时最高的函数
+
+        Returns:
+            dict: {阶段名: {"calls", "seconds", "top": [(函数, 调用次数, 自身耗时秒, 累计耗时秒)]}}，
+                  只计时的阶段另有 "timed": True，top 为空
+        """
+        result = {}
+        for stage in self.stages:
+            if stage in self.timed:
+                if stage in self._calls:
+                    result[stage] = {"calls": self._calls[stage], "seconds": self._seconds[stage],
+                                     "top": [], "timed": True}
+                continue
+            stats = self.stats(stage)
+            if stats is None:
+                continue
+            entries = [item for item in stats.stats.items() if item[0] not in _PROFILER_FUNCS]
+            hot = sorted(entries, key=lambda item: item[1][2], reverse=True)[:top]
+            result[stage] = {
+                "calls": self._calls.get(stage, 0),
+                "seconds": self._seconds.get(stage, 0.0),
+                "top": [(func_label(func), nc, tt, ct) for func, (_, nc, tt, ct, _) in hot]
+            }
+        return result
+
+
+def print_summary(summary):
+    """打印各阶段热点函数"""
+    for stage, info in summary.items():
+        calls = info["calls"]
+        per_call = info["seconds"] / calls * 1e6 if calls else 0.0
+        if info.get("timed"):
+            print(f"\n[{stage}] 调用 {calls} 次，累计 {info['seconds'] * 1000:.1f} ms，平均 {per_call:.1f} us"
+                  f"（只计时，未采集调用）")
+            continue
+        print(f"\n[{stage}] 调用 {calls} 次，累计 {info['seconds'] * 1000:.1f} ms，平均 {per_call:.1f} us（含采集开销）")
+        print(f"{'函数':<60}{'调用次数':>10}{'自身(ms)':>12}{'累计(ms)':>12}")
+        for label, ncalls, tottime, cumtime in info["top"]:
+            print(f"{label[:60]:<60}{ncalls:>10}{tottime * 1000:>12.2f}{cumtime * 1000:>12.2f}")
+
+
+# 测试
+if __name__ == "__main__":
+    import datetime
+    import sys
+    from synthesizer import FortuneSynthesizer
+    from pusher import ServerChanPusher
+
+    with StageProfiler() as profiler:
+        synthesizer = FortuneSynthesizer()
+        pusher = ServerChanPusher()
+        start = datetime.date(2026, 1, 1)
+        for i in range(366):
+            pusher.format_fortune_message(synthesizer.synthesize(start + datetime.timedelta(days=i)))
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else "profile"
+    for path in profiler.write(directory):
+        print(f"已写入 {path}")
+    print_summary(profiler.summary())
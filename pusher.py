@@ -3,162 +3,102 @@
 Server酱微信推送模块
 """
 
-import requests
-from config import SERVERCHAN_KEY, COLOR_MAPPING
+from config import SERVERCHAN_KEY
+from channels import HttpChannel
+from templates import default_template
 
 
-class ServerChanPusher:
+class ServerChanPusher(HttpChannel):
     """Server酱微信推送器"""
 
+    NAME = "serverchan"
+
     API_URL = "https://sctapi.ftqq.com/{sckey}.send"
 
-    def __init__(self, sckey=None):
+    # 摘要最大长度（Server酱 short 字段限制）
+    SHORT_LIMIT = 50
+
+    def __init__(self, sckey=None, api_url=None, timeout=None, concurrency=None,
+                 rate_limit=None, burst=None, retry_policy=None, template=None):
+        super().__init__(timeout=timeout, concurrency=concurrency, rate_limit=rate_limit,
+                         burst=burst, retry_policy=retry_policy)
         self.sckey = sckey or SERVERCHAN_KEY
+        self.template = template or default_template()
+        self.api_url = api_url or self.API_URL
 
-    def push(self, title, content, short_content=None):
+    def push(self, title, content, short_content=None, sckey=None):
         """
         发送微信推送
+        按 SendKey 限速，可重试的失败（超时、限流、服务端错误）按指数退避重试
 
         Args:
             title: 推送标题
             content: 推送内容（Markdown格式）
             short_content: 简短内容摘要
+            sckey: 指定 SendKey，默认使用推送器的 SendKey
 
         Returns:
-            dict: 推送结果
+            dict: 推送结果（attempts 为实际请求次数）
         """
-        url = self.API_URL.format(sckey=self.sckey)
+        return super().push(title, content, short_content, sckey)
+
+    def _endpoint(self, sckey):
+        return self.api_url.format(sckey=sckey or self.sckey)
 
+    def _payload(self, title, content, short_content):
         data = {
             "title": title,
             "desp": content,
         }
 
         if short_content:
-            data["short"] = short_content[:50]
+            data["short"] = short_content[:self.SHORT_LIMIT]
+        return data
 
+    def _send(self, url, data):
+        """发送一次请求并解析 Server酱 返回结果"""
+        status = None
         try:
-            response = requests.post(url, data=data, timeout=10)
+            response = self.session.post(url, data=data, timeout=self.timeout)
+            status = response.status_code
             result = response.json()
 
             if result.get("code") == 0:
                 return {
                     "success": True,
                     "message": "推送成功",
+                    "status": status,
                     "data": result
                 }
             else:
-                return {
+                failure = {
                     "success": False,
-                    "message": f"推送失败: {result.get('msg', '未知错误')}",
+                    "message": f"推送失败: {result.get('msg') or result.get('message') or '未知错误'}",
+                    "status": status,
                     "data": result
                 }
+                retry_after = self._retry_after(response)
+                if retry_after is not None:
+                    failure["retry_after"] = retry_after
+                return failure
         except Exception as e:
             return {
                 "success": False,
                 "message": f"推送异常: {str(e)}",
+                # 返回非 JSON 的响应仍保留状态码（4xx 不重试，5xx 重试），网络异常为 None
+                "status": status,
                 "data": None
             }
 
     def format_fortune_message(self, report):
         """
         格式化运势报告为Markdown消息
-        """
-        date = report["date"]
-        weekday = report["weekday"]
-        meta = report["metaphysics"]
-        horo = report["horoscope"]
-        final = report["final"]
-
-        # 获取颜色信息
-        color_name = final["lucky_color"]["color"]
-        color_info = COLOR_MAPPING.get(color_name, {"color": "#FFFFFF", "rgb": "255,255,255"})
-
-        # 运势等级
-        level_emoji = {
-            "excellent": "🌟🌟🌟🌟🌟",
-            "good": "🌟🌟🌟🌟",
-            "normal": "🌟🌟🌟",
-            "challenging": "🌟🌟"
-        }
-        level_text = {
-            "excellent": "大吉",
-            "good": "吉",
-            "normal": "平",
-            "challenging": "欠佳"
-        }
-
-        emoji = level_emoji.get(horo["fortune_level"], "🌟🌟🌟")
-        level = level_text.get(horo["fortune_level"], "平")
-
-        # 构建消息
-        newline = "\n"
-        message = f"""# 🔮 每日运势提醒
-
-**📅 {date} {weekday}**
-
----
-
-## 👤 您的基本信息
-
-- **生肖**: {report['user_info']['zodiac']}
-- **星座**: {report['user_info']['star_sign']}
-- **五行**: {report['user_info']['element']}
-
----
-
-## 📊 今日运势
-
-**综合评分**: {final['score']}/100 {emoji}
-
-### 干支信息
-- **干支**: {meta['ganzhi']}
-- **当日五行**: {meta['day_element']}
-- **当日生肖**: {meta['day_zodiac']}
-
-{f"### ⚠️ 冲煞提醒\n{meta['clash_warning']}\n" if meta.get("clash_warning") else ""}
-{f"### ✨ 运势提示\n{meta['harmony_good']}\n" if meta.get("harmony_good") else ""}
-
----
-
-## 👗 穿衣指南
+        使用预编译模板，日期相关段落按日期缓存
 
-### 🎨 幸运颜色: **{color_name}**
-
-> {final['lucky_color']['reason']}
-
-{final['wearing_advice']}
-
----
-
-## ✅ 宜做事项
-
-{newline.join(['- ' + item for item in final['do_list']])}
-
----
-
-## ❌ 不宜做事项
-
-{newline.join(['- ' + item for item in final['dont_list']])}
-
----
-
-## 💡 运势总结
-
-{final['summary']}
-
----
-
-*🐰 火兔每日运势 | 每日21:00自动推送*
-"""
-
-        # 标题
-        title = f"📅 {date} 运势提醒 | {level}"
-
-        # 简短摘要
-        short = f"幸运色{color_name} | 评分{final['score']}/100 | {level}"
-
-        return title, message, short
+        Returns:
+            tuple: (标题, 正文, 简短摘要)
+        """
+        return self.template.render(report)
 
 
 # 测试
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+推送限流与重试模块
+令牌桶限速、带抖动的指数退避重试、AIMD 自适应并发
+"""
+
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """令牌桶限速器（线程安全）"""
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量，默认等于 rate
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        """获取令牌，不足时阻塞等待，返回等待时间（秒）"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def penalize(self, seconds):
+        """上游要求放缓（如 429 Retry-After）时清空令牌并推迟补充"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class RetryPolicy:
+    """带抖动的指数退避重试策略"""
+
+    # 可重试的 HTTP 状态码
+    RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+    def __init__(self, max_retries=3, base_delay=0.5, max_delay=30.0, jitter=True):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def is_retryable(self, result):
+        """
+        判断一次推送失败是否值得重试
+        网络异常、超时、限流和服务端错误可重试；SendKey 错误等业务错误不重试；
+        渠道已判定的（结果中带 retryable）以渠道的判定为准
+        """
+        if result["success"]:
+            return False
+        if "retryable" in result:
+            return result["retryable"]
+        status = result.get("status")
+        if status is None:
+            return True
+        return status in self.RETRYABLE_STATUS
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        第 attempt 次重试前的等待时间（秒）
+        使用 full jitter：在 [0, base * 2^attempt] 内均匀随机
+        """
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+
+class AimdLimiter:
+    """
+    AIMD 自适应并发限制器
+    成功且延迟正常时并发 +1，限流、服务端错误或延迟过高时并发减半
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, latency_target=2.0, decrease=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    @property
+    def current(self):
+        """当前并发上限"""
+        return int(self.limit)
+
+    def acquire(self):
+        """占用一个并发名额，超过当前上限时阻塞"""
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        """释放并发名额"""
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def feedback(self, success, latency, overloaded=False):
+        """
+        根据一次请求的结果调整并发上限
+
+        Args:
+            success: 请求是否成功
+            latency: 请求耗时（秒）
+            overloaded: 是否为上游过载信号（429 / 5xx / 超时）
+        """
+        with self.condition:
+            if overloaded or latency > self.latency_target:
+                # 同一批在途请求的失败只减半一次
+                now = time.monotonic()
+                if now - self.last_decrease >= latency:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self.last_decrease = now
+            elif success:
+                # 加性增长：每个成功请求增加 1/limit，约每轮并发增加 1
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self.condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
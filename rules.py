@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+综合分析规则模块
+幸运颜色、综合评分、穿着建议和提醒事项的规则以数据形式声明，
+加载时编译为查找表：每组喜忌五行一张表，按 (星座运势等级, 当日五行, 冲煞/三合, 星座幸运色) 直接取值。
+修改规则只需改动本文件上半部分的数据，不涉及计算代码
+"""
+
+from functools import lru_cache
+
+from horoscope import HoroscopeGenerator
+
+
+# ==================== 规则数据 ====================
+
+# 颜色对应的元素
+COLOR_ELEMENTS = {
+    "绿": "木", "粉": "火", "橙": "火", "红": "火",
+    "金": "金", "白": "金", "黄": "土", "蓝": "水", "黑": "水"
+}
+
+# 五行对应的推荐颜色（按优先顺序）
+ELEMENT_COLORS = {
+    "木": ["绿", "青"],
+    "火": ["红", "粉", "橙"],
+    "土": ["黄", "棕"],
+    "金": ["白", "金"],
+    "水": ["蓝", "黑"]
+}
+
+# 幸运颜色理由
+COLOR_REASONS = {
+    "horoscope": "星座幸运色，与您的喜用神{element}相生",
+    "day": "今日五行{element}，颜色助运",
+    "default": "今日幸运色，建议搭配{element}色配饰增强运势",
+}
+
+# 当日与用户的关系，按顺序取第一个成立的
+RELATIONS = ["harmony", "clash", "favored", "avoided", "neutral"]
+
+# 星座运势等级分数（未知等级按 normal 计）
+LEVEL_SCORES = {
+    "excellent": 90,
+    "good": 75,
+    "normal": 60,
+    "challenging": 45
+}
+
+# 生肖五行调整分
+RELATION_BONUS = {
+    "harmony": 15,
+    "clash": -15,
+    "favored": 10,
+    "avoided": -10,
+    "neutral": 0
+}
+
+# 综合评分 = 星座分 × 权重 + (基础分 + 调整分) × 权重，限制在 0-100
+BASE_SCORE = 60
+SCORE_WEIGHTS = (0.6, 0.4)
+
+# 穿着建议：五行旺衰说明（只看当日五行是否喜用/忌用）
+WEARING_NOTES = {
+    "favored": "今日五行{element}旺你，{color}让你更幸运",
+    "avoided": "注意调节，{color}为主，配件可平衡",
+}
+
+# 穿着建议：配饰
+ACCESSORIES = [
+    (("绿", "青"), "配饰建议：木质手表或绿色包包"),
+    (("红", "粉", "橙"), "配饰建议：金属首饰或红色围巾"),
+    (("蓝", "黑"), "配饰建议：白色或金色配件提亮"),
+]
+
+# 提醒事项
+CLASH_WARNINGS = [
+    "⚠️ 今日{zodiac}日与您相冲，请注意",
+    "❌ 避免在今天做重大决定",
+    "❌ 尽量不要与属{zodiac}的人发生冲突",
+]
+ELEMENT_WARNINGS = {
+    "水": ["⚠️ 今日水气较重，注意保暖防寒"],
+    "火": ["⚠️ 今日火气旺盛，注意降火"],
+}
+
+ELEMENTS = ["木", "火", "土", "金", "水"]
+ZODIACS = ["鼠", "牛", "虎", "兔", "龙", "蛇", "马", "羊", "猴", "鸡", "狗", "猪"]
+
+
+# ==================== 规则求值（仅在编译时调用） ====================
+
+def _element_relation(day_element, favored, avoided):
+    """当日五行与喜忌的关系（不含冲煞三合）"""
+    if day_element in favored:
+        return "favored"
+    if day_element in avoided:
+        return "avoided"
+    return "neutral"
+
+
+def _relation(day_element, is_clash, is_harmony, favored, avoided):
+    if is_harmony:
+        return "harmony"
+    if is_clash:
+        return "clash"
+    return _element_relation(day_element, favored, avoided)
+
+
+def _score(level, relation):
+    horo_score = LEVEL_SCORES.get(level, LEVEL_SCORES["normal"])
+    score = int(horo_score * SCORE_WEIGHTS[0] + (BASE_SCORE + RELATION_BONUS[relation]) * SCORE_WEIGHTS[1])
+    return max(0, min(100, score))
+
+
+def _color(horo_color, day_element, favored):
+    """幸运颜色：优先星座色与喜用神匹配，其次当日五行喜用时的推荐色，否则用星座色"""
+    horo_element = COLOR_ELEMENTS.get(horo_color, "")
+    if horo_element in favored:
+        return {"color": horo_color, "reason": COLOR_REASONS["horoscope"].format(element=horo_element)}
+
+    if day_element in favored:
+        for color in ELEMENT_COLORS.get(day_element, ["白"]):
+            if COLOR_ELEMENTS.get(color, "") in favored:
+                return {"color": color, "reason": COLOR_REASONS["day"].format(element=day_element)}
+
+    return {
+        "color": horo_color,
+        "reason": COLOR_REASONS["default"].format(element=favored[0]) if favored else ""
+    }
+
+
+def _wearing(color, day_element, favored, avoided):
+    parts = [f"主推颜色：{color}"]
+    note = WEARING_NOTES.get(_element_relation(day_element, favored, avoided))
+    if note:
+        parts.append(note.format(element=day_element, color=color))
+    for colors, text in ACCESSORIES:
+        if color in colors:
+            parts.append(text)
+            break
+    return " | ".join(parts)
+
+
+def _warnings(day_zodiac, day_element, is_clash):
+    warnings = []
+    if is_clash:
+        warnings.extend(text.format(zodiac=day_zodiac) for text in CLASH_WARNINGS)
+    warnings.extend(ELEMENT_WARNINGS.get(day_element, []))
+    return tuple(warnings)
+
+
+# ==================== 编译后的查找表 ====================
+
+# 评分表: SCORE_TABLE[等级序号][关系序号]，与用户无关
+SCORE_TABLE = [[_score(level, relation) for relation in RELATIONS]
+               for level in HoroscopeGenerator.FORTUNE_LEVELS]
+
+_LEVEL_INDEX = {level: i for i, level in enumerate(HoroscopeGenerator.FORTUNE_LEVELS)}
+_RELATION_INDEX = {relation: i for i, relation in enumerate(RELATIONS)}
+
+# 提醒表: (当日生肖或 None, 当日五行) -> 提醒元组
+WARNING_TABLE = {
+    (zodiac if clash else None, element): _warnings(zodiac, element, clash)
+    for zodiac in ZODIACS for element in ELEMENTS for clash in (False, True)
+}
+
+# 编译时已知的星座幸运色
+_HORO_COLORS = sorted({color for vocabulary in HoroscopeGenerator.SIGNS.values()
+                       for color in vocabulary["colors"]} | set(COLOR_ELEMENTS))
+
+
+class RuleTable:
+    """
+    某组喜忌五行下编译好的规则表
+
+    Args:
+        favored: 喜用神元组
+        avoided: 忌用元素元组
+    """
+
+    def __init__(self, favored, avoided):
+        self.favored = list(favored)
+        self.avoided = list(avoided)
+
+        # 当日五行 -> 关系序号（未冲煞三合时）
+        self.element_relation = {
+            element: _RELATION_INDEX[_element_relation(element, self.favored, self.avoided)]
+            for element in ELEMENTS
+        }
+        # (星座幸运色, 当日五行) -> 幸运颜色
+        self.colors = {
+            (color, element): _color(color, element, self.favored)
+            for color in _HORO_COLORS for element in ELEMENTS
+        }
+        # (幸运颜色, 当日五行) -> 穿着建议
+        final_colors = {c["color"] for c in self.colors.values()}
+        self.wearing = {
+            (color, element): _wearing(color, element, self.favored, self.avoided)
+            for color in final_colors for element in ELEMENTS
+        }
+
+    def relation(self, day_element, is_clash, is_harmony):
+        """关系序号（RELATIONS 中的下标）"""
+        if is_harmony:
+            return 0
+        if is_clash:
+            return 1
+        relation = self.element_relation.get(day_element)
+        if relation is None:
+            relation = _RELATION_INDEX[_element_relation(day_element, self.favored, self.avoided)]
+        return relation
+
+    def color(self, horo_color, day_element):
+        """幸运颜色（新字典，可修改）"""
+        color = self.colors.get((horo_color, day_element))
+        if color is None:
+            color = self.colors[(horo_color, day_element)] = _color(horo_color, day_element, self.favored)
+        return dict(color)
+
+    def score(self, fortune_level, day_element, is_clash, is_harmony):
+        level = _LEVEL_INDEX.get(fortune_level, _LEVEL_INDEX["normal"])
+        return SCORE_TABLE[level][self.relation(day_element, is_clash, is_harmony)]
+
+    def wearing_advice(self, color, day_element):
+        advice = self.wearing.get((color, day_element))
+        if advice is None:
+            advice = self.wearing[(color, day_element)] = _wearing(color, day_element, self.favored, self.avoided)
+        return advice
+
+    def evaluate(self, meta, horo):
+        """
+        对一组 (黄历分析, 星座运势) 求值
+
+        Returns:
+            tuple: (幸运颜色, 综合评分, 穿着建议, 提醒列表)
+        """
+        day_element = meta["day_element"]
+        color = self.color(horo["lucky_color"], day_element)
+        score = self.score(horo["fortune_level"], day_element, meta.get("is_clash"), meta.get("is_harmony"))
+        return color, score, self.wearing_advice(color["color"], day_element), warnings_for(meta)
+
+    def evaluate_many(self, pairs):
+        """批量求值，pairs 为 (黄历分析, 星座运势) 的可迭代对象"""
+        return [self.evaluate(meta, horo) for meta, horo in pairs]
+
+
+def warnings_for(meta):
+    """提醒事项列表"""
+    clash = bool(meta.get("is_clash"))
+    warnings = WARNING_TABLE.get((meta["day_zodiac"] if clash else None, meta["day_element"]))
+    if warnings is None:
+        warnings = _warnings(meta["day_zodiac"], meta["day_element"], clash)
+    return list(warnings)
+
+
+@lru_cache(maxsize=256)
+def rule_table(favored, avoided):
+    """获取某组喜忌五行的规则表（首次使用时编译）"""
+    return RuleTable(favored, avoided)
+
+
+def rules_for(profile):
+    """用户对应的规则表"""
+    return rule_table(tuple(profile["favored_elements"]), tuple(profile["忌用元素"]))
+
+
+# 测试
+if __name__ == "__main__":
+    from config import USER_PROFILE
+
+    table = rules_for(USER_PROFILE)
+    print(f"评分表: {SCORE_TABLE}")
+    print(f"颜色表条目: {len(table.colors)}，穿着建议条目: {len(table.wearing)}，提醒表条目: {len(WARNING_TABLE)}")
+    meta = {"day_element": "火", "day_zodiac": "鸡", "is_clash": True, "is_harmony": False}
+    horo = {"lucky_color": "绿色", "fortune_level": "good"}
+    print(table.evaluate(meta, horo))
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+两阶段推送模块
+推送时间前的预计算阶段合成并渲染第二天的消息，放入待发集合（发件箱或内存），
+推送时间到达时的投递阶段只负责发送，合成和渲染的耗时不再推迟送达
+"""
+
+import datetime
+import logging
+import threading
+import time
+
+from config import PUSH_HOUR, PUSH_MINUTE, PRECOMPUTE_LEAD_MINUTES
+from channels import route_fields
+from metrics import STAGE_SECONDS
+from outbox import subscriber_id, identified
+
+
+logger = logging.getLogger(__name__)
+
+
+def precompute_time(hour=PUSH_HOUR, minute=PUSH_MINUTE, lead_minutes=PRECOMPUTE_LEAD_MINUTES):
+    """
+    预计算阶段的触发时间（推送时间提前 lead_minutes 分钟，可跨过午夜）
+
+    Returns:
+        tuple: (时, 分)
+    """
+    total = (hour * 60 + minute - lead_minutes) % (24 * 60)
+    return total // 60, total % 60
+
+
+def delivery_target(now=None, hour=PUSH_HOUR, minute=PUSH_MINUTE):
+    """
+    下一次推送对应的目标日期（推送当天的第二天）
+    预计算阶段在推送时间之前运行，推送时间在午夜之后时也能得到正确的日期
+    """
+    now = now or datetime.datetime.now()
+    push_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if push_at < now - datetime.timedelta(minutes=1):
+        push_at += datetime.timedelta(days=1)
+    return push_at.date() + datetime.timedelta(days=1)
+
+
+class StagedDelivery:
+    """
+    预计算 + 投递 两阶段推送
+
+    Args:
+        profiles: 订阅用户列表
+        pusher: 推送器（需提供 push_many），默认 ChannelRouter()
+        outbox: 发件箱（Outbox），设置后待发消息写入发件箱，进程重启后仍可投递；否则保存在内存中
+        cache: 报告缓存（ReportCache），相同指纹的用户只合成、渲染一次
+    """
+
+    def __init__(self, profiles, pusher=None, outbox=None, cache=None):
+        if pusher is None:
+            from channels import ChannelRouter
+            pusher = ChannelRouter()
+        if cache is None:
+            from cache import ReportCache
+            cache = ReportCache()
+        self.profiles = profiles
+        self.pusher = pusher
+        self.outbox = outbox
+        self.cache = cache
+        self._staged = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, target_date):
+        """
+        预计算阶段：合成并渲染 target_date 的消息放入待发集合，并提前创建各渠道的连接池
+
+        Returns:
+            int: 新放入待发集合的消息数
+        """
+        started = time.perf_counter()
+        # 没有唯一标识的用户无法去重和确认送达，不推送
+        profiles = list(identified(self.profiles))
+        if self.outbox is not None:
+            # 已在发件箱中的用户（之前预计算过或已送达）不再生成
+            existing = self.outbox.existing([subscriber_id(p) for p in profiles], target_date)
+            profiles = [p for p in profiles if subscriber_id(p) not in existing]
+
+        entries = self.cache.build_many(profiles, target_date) if profiles else []
+        messages = [
+            {
+                "subscriber": subscriber_id(profile),
+                "title": entry["title"],
+                "content": entry["content"],
+                "short": entry["short"],
+                "sckey": profile.get("sckey"),
+                **route_fields(profile)
+            }
+            for profile, entry in zip(profiles, entries)
+        ]
+
+        if self.outbox is not None:
+            staged = self.outbox.enqueue(messages, target_date)
+        else:
+            with self._lock:
+                # 只保留最近一次推送的待发消息
+                self._staged = {target_date: messages}
+            staged = len(messages)
+
+        if hasattr(self.pusher, "warm"):
+            self.pusher.warm({m["channel"] for m in messages})
+
+        logger.info(f"📦 {target_date} 预计算完成: 待发 {staged} 条，耗时 {time.perf_counter() - started:.2f}s")
+        return staged
+
+    def is_prepared(self, target_date):
+        """target_date 的消息是否已预计算"""
+        if self.outbox is not None:
+            return sum(self.outbox.stats(target_date).values()) > 0
+        return target_date in self._staged
+
+    def deliver(self, target_date, on_result=None):
+        """
+        投递阶段：只发送待发集合中的消息，未预计算时（如进程在预计算后重启且未启用发件箱）先补做预计算
+
+        Returns:
+            dict: {"delivered", "failed", "elapsed_s"}（elapsed_s 为首条开始发送到最后一条完成的时长）
+        """
+        if not self.is_prepared(target_date):
+            logger.warning(f"{target_date} 的消息未预计算，投递前先生成")
+            self.prepare(target_date)
+
+        started = time.perf_counter()
+        with STAGE_SECONDS.labels("push").time():
+            if self.outbox is not None:
+                if self.outbox.stats(target_date)["failed"]:
+                    self.outbox.requeue_failed(target_date)
+                totals = self.outbox.drain(self.pusher, target_date=target_date, on_result=on_result)
+                delivered, failed = totals["delivered"], totals["failed"]
+            else:
+                with self._lock:
+                    messages = self._staged.pop(target_date, [])
+                outcome = self.pusher.push_many(messages)
+                delivered, failed = outcome["stats"]["success"], outcome["stats"]["failed"]
+                if on_result is not None:
+                    for message, result in zip(messages, outcome["results"]):
+                        on_result(message, result)
+        elapsed = time.perf_counter() - started
+
+        logger.info(f"✅ {target_date} 投递完成: 送达 {delivered}，失败 {failed}，"
+                    f"首条到末条 {elapsed:.2f}s")
+        return {"delivered": delivered, "failed": failed, "elapsed_s": elapsed}
+
+
+# 测试
+if __name__ == "__main__":
+    from config import USER_PROFILE
+    from mock_server import MockServerChan
+    from pusher import ServerChanPusher
+    from channels import ChannelRouter
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    print(f"推送时间 {PUSH_HOUR:02d}:{PUSH_MINUTE:02d}，预计算时间 {'%02d:%02d' % precompute_time()}，"
+          f"目标日期 {delivery_target()}")
+
+    zodiacs = ["鼠", "牛", "虎", "兔", "龙", "蛇", "马", "羊", "猴", "鸡", "狗", "猪"]
+    profiles = [dict(USER_PROFILE, id=f"user{i}", zodiac=zodiacs[i % 12], birth_year=1950 + i % 60,
+                     sckey=f"KEY{i}") for i in range(2000)]
+    target = delivery_target()
+
+    with MockServerChan(latency_ms=5) as mock:
+        router = ChannelRouter({"serverchan": ServerChanPusher(api_url=mock.url, rate_limit=0, concurrency=32)})
+        staged = StagedDelivery(profiles, router)
+        staged.prepare(target)
+        staged.deliver(target)
+        router.close()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时分析
+在子进程中以 python -X importtime 导入指定模式需要的模块，汇总各模块导入耗时
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+
+# 各运行模式需要导入的模块（与 main.py 中各模式的按需导入保持一致）
+MODE_MODULES = {
+    "once": ["main", "synthesizer", "channels", "pusher", "fortune_calendar", "metrics", "outbox", "requests"],
+    "precompute": ["main", "fortune_calendar"],
+    "scheduler": ["main", "staging", "cache", "outbox", "channels", "pusher", "metrics", "requests",
+                  "apscheduler.schedulers.blocking", "apscheduler.triggers.cron"],
+    "serve": ["main", "wheel_scheduler", "cache", "channels", "pusher", "metrics", "requests"],
+    "batch": ["main", "pipeline", "subscribers", "cache", "outbox", "channels", "pusher", "metrics", "requests"],
+    "drain": ["main", "outbox", "channels", "pusher", "requests"],
+    "export": ["main", "export", "subscribers", "outbox", "channels"],
+    "loadtest": ["main", "loadtest", "mock_server", "pipeline", "staging", "cache", "outbox", "channels", "pusher",
+                 "metrics", "requests"],
+}
+
+
+def _run(code, importtime=False):
+    """在新解释器中执行代码，返回 (耗时秒, stderr)"""
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", code]
+    started = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    return time.perf_counter() - started, completed.stderr
+
+
+def parse_importtime(output):
+    """
+    解析 -X importtime 输出
+
+    Returns:
+        list: [(模块名, 自身耗时us, 累计耗时us, 嵌套层级)]
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def startup_profile(mode="once"):
+    """
+    分析指定模式的启动耗时
+
+    Returns:
+        dict: 解释器基础耗时、模式总耗时、顶层导入与自身耗时最高的模块
+    """
+    if mode not in MODE_MODULES:
+        raise ValueError(f"未知模式: {mode}，可选: {', '.join(MODE_MODULES)}")
+
+    code = "; ".join(f"import {name}" for name in MODE_MODULES[mode])
+    baseline, _ = _run("pass")
+    total, _ = _run(code)
+    _, importtime_output = _run(code, importtime=True)
+
+    rows = parse_importtime(importtime_output)
+    top_level = sorted((r for r in rows if r[3] == 0), key=lambda r: r[2], reverse=True)
+    by_self = sorted(rows, key=lambda r: r[1], reverse=True)
+    return {
+        "mode": mode,
+        "interpreter_s": baseline,
+        "total_s": total,
+        "imports_us": sum(r[2] for r in rows if r[3] == 0),
+        "top_level": top_level,
+        "by_self": by_self
+    }
+
+
+def print_startup_profile(mode="once", limit=15):
+    """打印启动耗时报告"""
+    report = startup_profile(mode)
+
+    print(f"模式: {report['mode']}")
+    print(f"解释器空启动: {report['interpreter_s'] * 1000:.1f} ms")
+    print(f"模式冷启动:   {report['total_s'] * 1000:.1f} ms")
+    print(f"模块导入合计: {report['imports_us'] / 1000:.1f} ms")
+
+    print(f"\n顶层导入（按累计耗时）:")
+    print(f"{'模块':<40}{'累计(ms)':>10}{'自身(ms)':>10}")
+    for name, self_us, cumulative_us, _ in report["top_level"][:limit]:
+        print(f"{name:<40}{cumulative_us / 1000:>10.1f}{self_us / 1000:>10.1f}")
+
+    print(f"\n自身耗时最高的模块:")
+    print(f"{'模块':<40}{'自身(ms)':>10}{'累计(ms)':>10}")
+    for name, self_us, cumulative_us, _ in report["by_self"][:limit]:
+        print(f"{name:<40}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+
+
+# 测试
+if __name__ == "__main__":
+    print_startup_profile(sys.argv[1] if len(sys.argv) > 1 else "once")
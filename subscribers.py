@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+订阅用户读取模块
+从 JSONL / CSV 文件（可为 .gz）或标准输入逐行读取用户信息，返回惰性的用户流，
+百万级用户也只占用一行的内存
+"""
+
+import csv
+import gzip
+import json
+import logging
+import sys
+
+from config import USER_PROFILE
+
+
+logger = logging.getLogger(__name__)
+
+# CSV 中的整数字段
+INT_FIELDS = ("birth_year", "birth_month", "birth_day", "push_hour", "push_minute")
+
+# CSV 中的列表字段，多个值用 | 或 、 分隔
+LIST_FIELDS = ("favored_elements", "忌用元素")
+
+
+def _split_list(value):
+    return [item.strip() for item in value.replace("、", "|").split("|") if item.strip()]
+
+
+def normalize_profile(row):
+    """
+    规范化一条用户记录：转换字段类型，缺省字段取 USER_PROFILE 中的值
+
+    Args:
+        row: 从文件读出的字典（CSV 中所有值都是字符串）
+
+    Returns:
+        dict: 用户信息，字段同 config.USER_PROFILE
+    """
+    profile = {}
+    for key, value in row.items():
+        if key is None or value is None or value == "":
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if key in INT_FIELDS:
+                value = int(value)
+            elif key in LIST_FIELDS:
+                value = _split_list(value)
+        profile[key] = value
+    return dict(USER_PROFILE, **profile)
+
+
+def _detect_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".csv"):
+        return "csv"
+    return "jsonl"
+
+
+def _open_text(path):
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+    return open(path, "r", encoding="utf-8-sig", newline="")
+
+
+def _iter_jsonl(f):
+    for line_no, line in enumerate(f, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError("每行应为一个 JSON 对象")
+            yield normalize_profile(row)
+        except ValueError as e:
+            logger.warning(f"跳过第 {line_no} 行: {str(e)}")
+
+
+def _iter_csv(f):
+    reader = csv.DictReader(f)
+    for row in reader:
+        try:
+            yield normalize_profile(row)
+        except ValueError as e:
+            logger.warning(f"跳过第 {reader.line_num} 行: {str(e)}")
+
+
+def iter_subscribers(path, fmt=None):
+    """
+    逐个读取订阅用户（生成器）
+
+    Args:
+        path: 文件路径，"-" 表示标准输入；.gz 结尾时自动解压
+        fmt: "jsonl" 或 "csv"，默认按扩展名判断（标准输入默认 jsonl）
+
+    Yields:
+        dict: 用户信息，字段同 config.USER_PROFILE
+    """
+    fmt = fmt or _detect_format(path)
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError(f"不支持的格式: {fmt}，可选: jsonl, csv")
+
+    f = _open_text(path)
+    try:
+        if fmt == "csv":
+            yield from _iter_csv(f)
+        else:
+            yield from _iter_jsonl(f)
+    finally:
+        if path != "-":
+            f.close()
+
+
+# 测试
+if __name__ == "__main__":
+    import datetime
+    import tracemalloc
+    from synthesizer import FortuneSynthesizer
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if len(sys.argv) > 1:
+        source = sys.argv[1]
+    else:
+        # 生成示例文件
+        import tempfile
+        zodiacs = ["鼠", "牛", "虎", "兔", "龙", "蛇", "马", "羊", "猴", "鸡", "狗", "猪"]
+        source = tempfile.mktemp(suffix=".jsonl.gz")
+        with gzip.open(source, "wt", encoding="utf-8") as out:
+            for i in range(100000):
+                out.write(json.dumps({"name": f"用户{i}", "zodiac": zodiacs[i % 12],
+                                      "birth_year": 1950 + i % 60}, ensure_ascii=False) + "\n")
+
+    tracemalloc.start()
+    synthesizer = FortuneSynthesizer()
+    count = 0
+    for report in synthesizer.iter_reports(iter_subscribers(source), datetime.date.today()):
+        count += 1
+    _, peak = tracemalloc.get_traced_memory()
+    print(f"用户数: {count}，峰值内存: {peak / 1024:.0f} KB")
@@ -8,15 +8,23 @@ import datetime
 from config import USER_PROFILE, COLOR_MAPPING
 from metaphysics import MetaphysicsAnalyzer
 from horoscope import HoroscopeGenerator
+from activities import CATALOG, CLASH_EXTRAS
+from rules import rules_for, warnings_for
 
 
 class FortuneSynthesizer:
     """运势综合分析器"""
 
-    def __init__(self):
-        self.user = USER_PROFILE
-        self.metaphysics = MetaphysicsAnalyzer()
-        self.horoscope = HoroscopeGenerator()
+    def __init__(self, profile=None, calendar=None):
+        """
+        Args:
+            profile: 用户信息，默认 USER_PROFILE
+            calendar: 预计算运势日历（FortuneCalendar），范围内的日期直接查表
+        """
+        self.user = profile or USER_PROFILE
+        self.metaphysics = MetaphysicsAnalyzer(self.user)
+        self.horoscope = HoroscopeGenerator(self.user)
+        self.calendar = calendar
 
     def synthesize(self, target_date=None):
         """
@@ -26,41 +34,117 @@ class FortuneSynthesizer:
             target_date = datetime.date.today() + datetime.timedelta(days=1)
 
         # 获取各方运势数据
-        meta_result = self.metaphysics.analyze_day(target_date)
-        horo_result = self.horoscope.get_daily_fortune(target_date)
+        meta_result = self.metaphysics.apply_profile(self._get_day_info(target_date))
+        horo_result = self._get_horoscope(target_date, self.user)
 
         # 综合分析
         report = {
             "date": target_date.strftime("%Y-%m-%d"),
             "weekday": self._get_weekday(target_date),
-            "user_info": self._get_user_summary(),
+            "user_info": self._get_user_summary(self.user),
             "metaphysics": meta_result,
             "horoscope": horo_result,
-            "final": self._combine_analysis(meta_result, horo_result)
+            "final": self._combine_analysis(meta_result, horo_result, self.user)
         }
 
         return report
 
+    def synthesize_many(self, profiles, target_date=None):
+        """
+        批量生成多个用户的运势报告
+        日期相关部分（干支、五行、当日生肖、星座运势）每天只计算一次，
+        每个用户只叠加冲煞三合、喜忌五行、颜色和评分
+
+        Args:
+            profiles: 用户信息列表，字段同 config.USER_PROFILE
+            target_date: 目标日期，默认明天
+
+        Returns:
+            list: 与 profiles 顺序一致的报告列表
+        """
+        return list(self.iter_reports(profiles, target_date))
+
+    def iter_reports(self, profiles, target_date=None):
+        """
+        逐个生成用户的运势报告（生成器）
+        profiles 可以是惰性的用户流，报告生成后即交给调用方，内存占用不随用户数增长
+
+        Args:
+            profiles: 用户信息的可迭代对象，字段同 config.USER_PROFILE
+            target_date: 目标日期，默认明天
+
+        Yields:
+            dict: 与 profiles 顺序一致的报告
+        """
+        if target_date is None:
+            target_date = datetime.date.today() + datetime.timedelta(days=1)
+
+        # 日期层面的数据只算一次
+        date_str = target_date.strftime("%Y-%m-%d")
+        weekday = self._get_weekday(target_date)
+        day_info = self._get_day_info(target_date)
+
+        # 星座运势按 (星座, 喜用神) 缓存，键的取值有限，不随用户数增长
+        horo_cache = {}
+
+        for profile in profiles:
+            horo_key = (profile["star_sign"], tuple(profile["favored_elements"]))
+            horo_result = horo_cache.get(horo_key)
+            if horo_result is None:
+                horo_result = self._get_horoscope(target_date, profile)
+                horo_cache[horo_key] = horo_result
+
+            meta_result = self.metaphysics.apply_profile(day_info, profile)
+
+            yield {
+                "date": date_str,
+                "weekday": weekday,
+                "user_info": self._get_user_summary(profile),
+                "metaphysics": meta_result,
+                # 每份报告一个副本，修改某个用户的报告不影响其他用户
+                "horoscope": HoroscopeGenerator.copy_fortune(horo_result),
+                "final": self._combine_analysis(meta_result, horo_result, profile)
+            }
+
+    def _get_day_info(self, target_date):
+        """获取日期信息，优先查预计算日历"""
+        if self.calendar is not None:
+            day_info = self.calendar.day_info(target_date)
+            if day_info is not None:
+                return day_info
+        return self.metaphysics.get_day_info(target_date)
+
+    def _get_horoscope(self, target_date, profile):
+        """获取星座运势，优先查预计算日历"""
+        if self.calendar is not None:
+            horo_result = self.calendar.horoscope(target_date, profile)
+            if horo_result is not None:
+                return horo_result
+        return self.horoscope.get_daily_fortune(target_date, profile)
+
     def _get_weekday(self, date):
         """获取星期几"""
         weekdays = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
         return weekdays[date.weekday()]
 
-    def _get_user_summary(self):
+    def _get_user_summary(self, user):
         """获取用户基本信息摘要"""
         return {
-            "birth_year": self.user["birth_year"],
-            "zodiac": self.user["zodiac"],
-            "element": self.user["element_detail"],
-            "star_sign": self.user["star_sign"]
+            "birth_year": user["birth_year"],
+            "zodiac": user["zodiac"],
+            "element": user["element_detail"],
+            "star_sign": user["star_sign"]
         }
 
-    def _combine_analysis(self, meta, horo):
+    def _combine_analysis(self, meta, horo, user):
         """
         综合分析，生成最终结论
         """
+        # 颜色、评分、穿着建议和提醒查编译好的规则表
+        rules = rules_for(user)
+
         # 1. 确定幸运颜色
-        final_color = self._decide_color(meta, horo)
+        final_color = rules.color(horo["lucky_color"], meta["day_element"])
 
         # 2. 确定宜做事项（综合黄历和星座）
         final_yi = self._combine_yi(meta["advice"]["宜"], horo["lucky_yi"])
@@ -72,10 +156,10 @@ class FortuneSynthesizer:
         summary = self._generate_summary(meta, horo)
 
         # 5. 计算综合运势评分
-        score = self._calculate_score(meta, horo)
+        score = rules.score(horo["fortune_level"], meta["day_element"], meta.get("is_clash"), meta.get("is_harmony"))
 
         # 6. 穿着建议
-        wearing_advice = self._generate_wearing_advice(final_color, meta, horo)
+        wearing_advice = rules.wearing_advice(final_color["color"], meta["day_element"])
 
         return {
             "lucky_color": final_color,
@@ -85,80 +169,23 @@ class FortuneSynthesizer:
             "summary": summary,
             "score": score,
             "wearing_advice": wearing_advice,
-            "warnings": self._get_warnings(meta)
-        }
-
-    def _decide_color(self, meta, horo):
-        """
-        确定最终幸运颜色
-        原则：优先考虑喜用神，然后是星座运势
-        """
-        horo_color = horo["lucky_color"]
-        day_element = meta["day_element"]
-        favored = self.user["favored_elements"]
-
-        # 颜色对应的元素
-        color_elements = {
-            "绿": "木", "粉": "火", "橙": "火", "红": "火",
-            "金": "金", "白": "金", "黄": "土", "蓝": "水", "黑": "水"
-        }
-
-        # 获取星座颜色的元素
-        horo_color_element = color_elements.get(horo_color, "")
-
-        # 如果星座幸运色与喜用神匹配，直接使用
-        if horo_color_element in favored:
-            return {
-                "color": horo_color,
-                "reason": f"星座幸运色，与您的喜用神{horo_color_element}相生"
-            }
-
-        # 如果当日五行与喜用神匹配，选择匹配的颜色
-        if day_element in favored:
-            # 根据当日五行推荐颜色
-            element_colors = {
-                "木": ["绿", "青"],
-                "火": ["红", "粉", "橙"],
-                "土": ["黄", "棕"],
-                "金": ["白", "金"],
-                "水": ["蓝", "黑"]
-            }
-            suggested = element_colors.get(day_element, ["白"])
-            # 选择一个与喜用神匹配的颜色
-            for c in suggested:
-                if color_elements.get(c, "") in favored:
-                    return {
-                        "color": c,
-                        "reason": f"今日五行{day_element}，颜色助运"
-                    }
-
-        # 默认返回星座幸运色，但添加建议
-        return {
-            "color": horo_color,
-            "reason": f"今日幸运色，建议搭配{favored[0]}色配饰增强运势" if favored else ""
+            "warnings": warnings_for(meta)
         }
 
     def _combine_yi(self, meta_yi, horo_yi):
         """
         综合黄历宜和星座宜
+        合并去重，黄历宜在前、星座宜在后，按原顺序保留6条
         """
-        # 合并去重，保留6条
-        combined = list(set(meta_yi + horo_yi))
-        # 优先保留黄历宜
-        combined = meta_yi + [y for y in combined if y not in meta_yi]
-        return combined[:6]
+        return CATALOG.merge(meta_yi, horo_yi, limit=6)
 
     def _combine_ji(self, meta_ji, horo_ji, meta):
         """
         综合黄历忌和星座忌
         """
-        combined = list(set(meta_ji + horo_ji))
-
-        # 如果有冲煞，添加提醒
-        if meta.get("is_clash"):
-            combined.append("避免重大决策")
-
-        return combined[:6]
+        # 如果有冲煞，添加提醒（排在最后，超出6条时不保留）
+        extras = CLASH_EXTRAS if meta.get("is_clash") else ()
+        return CATALOG.merge(meta_ji, horo_ji, extras, limit=6)
 
     def _generate_summary(self, meta, horo):
         """
@@ -187,78 +214,6 @@ class FortuneSynthesizer:
 
         return "。".join(parts)
 
-    def _calculate_score(self, meta, horo):
-        """
-        计算综合运势评分
-        """
-        # 基础分数
-        base_score = 60
-
-        # 星座运势分数
-        horo_score = self.horoscope.get_fortune_score(horo["fortune_level"])
-
-        # 生肖五行调整
-        if meta.get("is_harmony"):
-            meta_bonus = 15
-        elif meta.get("is_clash"):
-            meta_bonus = -15
-        elif meta["day_element"] in self.user["favored_elements"]:
-            meta_bonus = 10
-        elif meta["day_element"] in self.user["忌用元素"]:
-            meta_bonus = -10
-        else:
-            meta_bonus = 0
-
-        # 计算最终分数
-        final_score = int((horo_score * 0.6) + (60 + meta_bonus) * 0.4)
-        final_score = max(0, min(100, final_score))  # 限制在0-100
-
-        return final_score
-
-    def _generate_wearing_advice(self, color, meta, horo):
-        """
-        生成穿着建议
-        """
-        color_name = color["color"]
-        advice_parts = []
-
-        advice_parts.append(f"主推颜色：{color_name}")
-
-        # 根据五行提供建议
-        if meta["day_element"] in self.user["favored_elements"]:
-            advice_parts.append(f"今日五行{meta['day_element']}旺你，{color_name}让你更幸运")
-        elif meta["day_element"] in self.user["忌用元素"]:
-            advice_parts.append("注意调节，{color_name}为主，配件可平衡")
-
-        # 添加配饰建议
-        if color_name in ["绿", "青"]:
-            advice_parts.append("配饰建议：木质手表或绿色包包")
-        elif color_name in ["红", "粉", "橙"]:
-            advice_parts.append("配饰建议：金属首饰或红色围巾")
-        elif color_name in ["蓝", "黑"]:
-            advice_parts.append("配饰建议：白色或金色配件提亮")
-
-        return " | ".join(advice_parts)
-
-    def _get_warnings(self, meta):
-        """
-        获取需要提醒的事项
-        """
-        warnings = []
-
-        if meta.get("is_clash"):
-            warnings.append(f"⚠️ 今日{meta['day_zodiac']}日与您相冲，请注意")
-            warnings.append("❌ 避免在今天做重大决定")
-            warnings.append("❌ 尽量不要与属鸡的人发生冲突")
-
-        if meta["day_element"] == "水":
-            warnings.append("⚠️ 今日水气较重，注意保暖防寒")
-
-        if meta["day_element"] == "火":
-            warnings.append("⚠️ 今日火气旺盛，注意降火")
-
-        return warnings
-
 
 # 测试
 if __name__ == "__main__":
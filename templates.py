@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+运势消息模板模块
+模板只编译一次：拆分为静态片段和变量槽位，日期相关的段落按日期缓存，
+每条消息只填充用户相关的槽位；可以直接写入可复用的缓冲区，不拼接整条消息
+"""
+
+from string import Formatter
+
+
+# 推送正文模板
+MESSAGE_TEMPLATE = """# 🔮 每日运势提醒
+
+**📅 {date} {weekday}**
+
+---
+
+## 👤 您的基本信息
+
+- **生肖**: {zodiac}
+- **星座**: {star_sign}
+- **五行**: {element}
+
+---
+
+## 📊 今日运势
+
+**综合评分**: {score}/100 {emoji}
+
+### 干支信息
+- **干支**: {ganzhi}
+- **当日五行**: {day_element}
+- **当日生肖**: {day_zodiac}
+
+{clash_section}
+{harmony_section}
+
+---
+
+## 👗 穿衣指南
+
+### 🎨 幸运颜色: **{color_name}**
+
+> {color_reason}
+
+{wearing_advice}
+
+---
+
+## ✅ 宜做事项
+
+{do_list}
+
+---
+
+## ❌ 不宜做事项
+
+{dont_list}
+
+---
+
+## 💡 运势总结
+
+{summary}
+
+---
+
+*🐰 火兔每日运势 | 每日21:00自动推送*
+"""
+
+def _bullets(items):
+    """将事项列表渲染为 Markdown 列表"""
+    return "\n".join(["- " + item for item in items])
+
+
+def _section(heading, text):
+    """有内容时渲染带标题的小节，否则为空"""
+    return f"{heading}\n{text}\n" if text else ""
+
+
+LEVEL_EMOJI = {
+    "excellent": "🌟🌟🌟🌟🌟",
+    "good": "🌟🌟🌟🌟",
+    "normal": "🌟🌟🌟",
+    "challenging": "🌟🌟"
+}
+LEVEL_TEXT = {
+    "excellent": "大吉",
+    "good": "吉",
+    "normal": "平",
+    "challenging": "欠佳"
+}
+
+
+class FortuneTemplate:
+    """
+    预编译的运势消息模板
+    模板编译为一个 Python 函数：日期段落作为缓存的参数传入，用户槽位直接内联取值
+    """
+
+    # 各槽位的取值表达式（r 为运势报告），DATE_SLOTS 中的槽位只与日期有关
+    SLOTS = {
+        "date": "r['date']",
+        "weekday": "r['weekday']",
+        "ganzhi": "r['metaphysics']['ganzhi']",
+        "day_element": "r['metaphysics']['day_element']",
+        "day_zodiac": "r['metaphysics']['day_zodiac']",
+        "zodiac": "r['user_info']['zodiac']",
+        "star_sign": "r['user_info']['star_sign']",
+        "element": "r['user_info']['element']",
+        "score": "r['final']['score']",
+        "emoji": "LEVEL_EMOJI.get(r['horoscope']['fortune_level'], '🌟🌟🌟')",
+        "clash_section": "_section('### ⚠️ 冲煞提醒', r['metaphysics'].get('clash_warning'))",
+        "harmony_section": "_section('### ✨ 运势提示', r['metaphysics'].get('harmony_good'))",
+        "color_name": "r['final']['lucky_color']['color']",
+        "color_reason": "r['final']['lucky_color']['reason']",
+        "wearing_advice": "r['final']['wearing_advice']",
+        "do_list": "_bullets(r['final']['do_list'])",
+        "dont_list": "_bullets(r['final']['dont_list'])",
+        "summary": "r['final']['summary']"
+    }
+    DATE_SLOTS = ("date", "weekday", "ganzhi", "day_element", "day_zodiac")
+
+    # 编译后的函数可以访问的名字
+    NAMESPACE = {"LEVEL_EMOJI": LEVEL_EMOJI, "_bullets": _bullets, "_section": _section}
+
+    # 日期段落缓存的最大日期数
+    CACHE_SIZE = 64
+
+    def __init__(self, template=MESSAGE_TEMPLATE):
+        self.segments = self._compile(template)
+        self._render_user = self._build_renderer()
+        self._write_user = self._build_writer()
+        self._date_slots = {
+            slot: eval(f"lambda r: {self.SLOTS[slot]}", dict(self.NAMESPACE))
+            for slot in self.DATE_SLOTS
+        }
+        self._date_cache = {}
+
+    def _compile(self, template):
+        """
+        拆分模板
+        连续的静态文本和日期槽位合并为一个日期段，用户槽位单独成段
+
+        Returns:
+            list: [(is_date_segment, 日期段的片段元组 或 用户槽位名)]
+        """
+        segments = []
+        current = []
+        for literal, field, _, _ in Formatter().parse(template):
+            if literal:
+                current.append(("literal", literal))
+            if field is None:
+                continue
+            if field not in self.SLOTS:
+                raise KeyError(f"未知的模板槽位: {field}")
+            if field in self.DATE_SLOTS:
+                current.append(("slot", field))
+            else:
+                if current:
+                    segments.append((True, tuple(current)))
+                    current = []
+                segments.append((False, field))
+        if current:
+            segments.append((True, tuple(current)))
+        return segments
+
+    def _build_renderer(self):
+        """
+        生成渲染函数 render(r, d)：d 为当日已渲染的日期段落元组
+        函数体是单个 f-string，不含任何静态文本
+        """
+        fields = []
+        index = 0
+        for is_date, value in self.segments:
+            if is_date:
+                fields.append("{d[%d]}" % index)
+                index += 1
+            else:
+                fields.append("{%s}" % self.SLOTS[value])
+        source = 'def render(r, d):\n    return f"' + "".join(fields) + '"\n'
+        namespace = dict(self.NAMESPACE)
+        exec(compile(source, "<fortune-template>", "exec"), namespace)
+        return namespace["render"]
+
+    def _build_writer(self):
+        """
+        生成写入函数 write_into(r, d, write)：按段依次写出缓存的日期段落和用户槽位，
+        不构建整条消息字符串
+        """
+        lines = ["def write_into(r, d, write):"]
+        index = 0
+        for is_date, value in self.segments:
+            if is_date:
+                lines.append("    write(d[%d])" % index)
+                index += 1
+            else:
+                lines.append('    write(f"{%s}")' % self.SLOTS[value])
+        source = "\n".join(lines) + "\n"
+        namespace = dict(self.NAMESPACE)
+        exec(compile(source, "<fortune-template>", "exec"), namespace)
+        return namespace["write_into"]
+
+    def _date_sections(self, report):
+        """获取当日的日期段落（从缓存读取或渲染）"""
+        meta = report["metaphysics"]
+        key = (report["date"], report["weekday"], meta["ganzhi"], meta["day_element"], meta["day_zodiac"])
+        sections = self._date_cache.get(key)
+        if sections is None:
+            sections = tuple(
+                "".join(
+                    value if kind == "literal" else str(self._date_slots[value](report))
+                    for kind, value in parts
+                )
+                for is_date, parts in self.segments if is_date
+            )
+            if len(self._date_cache) >= self.CACHE_SIZE:
+                self._date_cache.clear()
+            self._date_cache[key] = sections
+        return sections
+
+    def render_content(self, report):
+        """渲染正文"""
+        return self._render_user(report, self._date_sections(report))
+
+    def render_into(self, report, buffer):
+        """
+        将正文逐段写入可复用的缓冲区（任何带 write 方法的对象，如 io.StringIO 或文件）
+        日期段落直接写出缓存的字符串，只有用户槽位需要格式化
+        """
+        self._write_user(report, self._date_sections(report), buffer.write)
+
+    def render(self, report):
+        """
+        渲染完整消息
+
+        Returns:
+            tuple: (标题, 正文, 简短摘要)
+        """
+        final = report["final"]
+        level = LEVEL_TEXT.get(report["horoscope"]["fortune_level"], "平")
+        color_name = final["lucky_color"]["color"]
+
+        title = f"📅 {report['date']} 运势提醒 | {level}"
+        short = f"幸运色{color_name} | 评分{final['score']}/100 | {level}"
+        return title, self.render_content(report), short
+
+
+_default_template = None
+
+
+def default_template():
+    """默认模板实例（首次使用时编译）"""
+    global _default_template
+    if _default_template is None:
+        _default_template = FortuneTemplate()
+    return _default_template
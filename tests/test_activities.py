@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""宜忌合并：按首次出现顺序去重，截断只丢弃靠后的事项"""
+
+import datetime
+
+from activities import CATALOG, CLASH_EXTRAS, ActivityCatalog
+from config import USER_PROFILE
+from horoscope import HoroscopeGenerator
+from synthesizer import FortuneSynthesizer
+
+
+def _first_seen(*groups, limit=6):
+    merged = []
+    for names in groups:
+        for name in names:
+            if name not in merged:
+                merged.append(name)
+    return merged[:limit]
+
+
+def test_merge_keeps_first_seen_order():
+    assert CATALOG.merge(["整理家居", "祭祀", "沐浴"], ["祭祀", "理财规划"]) == ["整理家居", "祭祀", "沐浴", "理财规划"]
+    # 注册顺序靠后的事项在前面出现时仍排在前面
+    assert CATALOG.merge(CLASH_EXTRAS, ["祭祀"]) == CLASH_EXTRAS + ["祭祀"]
+
+
+def test_merge_truncates_later_items():
+    first = ["祭祀", "沐浴", "整理家居", "理财规划", "出行"]
+    merged = CATALOG.merge(first, ["学习", "祭祀", "交友"], CLASH_EXTRAS, limit=6)
+    assert merged == first + ["学习"]
+
+
+def test_merge_registers_unknown_items():
+    catalog = ActivityCatalog([["祭祀"]])
+    assert catalog.merge(["未登记的事项甲"], ["祭祀", "未登记的事项甲", "未登记的事项乙"]) == \
+        ["未登记的事项甲", "祭祀", "未登记的事项乙"]
+    assert len(catalog) == 3
+
+
+def test_final_lists_follow_almanac_then_horoscope_order():
+    start = datetime.date(2026, 1, 1)
+    for sign in HoroscopeGenerator.STAR_SIGNS:
+        synthesizer = FortuneSynthesizer(dict(USER_PROFILE, star_sign=sign))
+        for i in range(0, 120, 11):
+            report = synthesizer.synthesize(start + datetime.timedelta(days=i))
+            meta, horo, final = report["metaphysics"], report["horoscope"], report["final"]
+            assert final["do_list"] == _first_seen(meta["advice"]["宜"], horo["lucky_yi"])
+            extras = CLASH_EXTRAS if meta["is_clash"] else []
+            assert final["dont_list"] == _first_seen(meta["advice"]["忌"], horo["lucky_ji"], extras)
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""报告缓存磁盘层：损坏或写入不完整的文件视为未命中，删除后重新生成"""
+
+import datetime
+import os
+
+import pytest
+
+from cache import ReportCache
+from config import USER_PROFILE
+
+TARGET = datetime.date(2026, 5, 1)
+
+
+@pytest.mark.parametrize("damage", [
+    lambda blob: blob[:len(blob) // 2],   # 写入不完整
+    lambda blob: b"",                     # 空文件
+    lambda blob: b"not a pickle" + blob,  # 内容损坏
+])
+def test_corrupt_disk_entry_is_rebuilt(tmp_path, damage):
+    expected = ReportCache(disk_dir=str(tmp_path)).build_many([USER_PROFILE], TARGET)[0]
+
+    cache = ReportCache(disk_dir=str(tmp_path))
+    path = cache._disk_path(cache.key(TARGET, USER_PROFILE))
+    with open(path, "rb") as f:
+        blob = f.read()
+    with open(path, "wb") as f:
+        f.write(damage(blob))
+
+    assert cache.get(cache.key(TARGET, USER_PROFILE)) is None
+    assert not os.path.exists(path)
+    assert cache.build_many([USER_PROFILE], TARGET)[0] == expected
+    assert os.path.exists(path)
+    assert ReportCache(disk_dir=str(tmp_path)).get(cache.key(TARGET, USER_PROFILE)) == expected
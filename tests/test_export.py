@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""导出：scores 格式（向量化引擎）与逐个合成的 CSV 导出一致"""
+
+import csv
+import datetime
+import io
+
+import pytest
+
+from config import USER_PROFILE
+from export import Exporter
+
+ZODIACS = ["鼠", "牛", "虎", "兔", "龙", "蛇", "马", "羊", "猴", "鸡", "狗", "猪"]
+SIGNS = ["白羊座", "金牛座", "双子座", "天秤座", "双鱼座"]
+
+
+def _export(profiles, fmt):
+    output = io.StringIO()
+    stats = Exporter(profiles, workers=1, chunk_records=7).run(
+        datetime.date(2026, 1, 30), datetime.date(2026, 2, 8), output, fmt
+    )
+    output.seek(0)
+    return stats, list(csv.DictReader(output))
+
+
+def test_scores_format_matches_csv_export():
+    pytest.importorskip("numpy")
+    profiles = [dict(USER_PROFILE, id=f"user{i}", zodiac=ZODIACS[i % 12], star_sign=SIGNS[i % len(SIGNS)])
+                for i in range(5)]
+    score_stats, scores = _export(profiles, "scores")
+    csv_stats, rows = _export(profiles, "csv")
+
+    assert score_stats["records"] == csv_stats["records"] == 50
+    fields = ("date", "subscriber", "ganzhi", "fortune_level", "score")
+    assert [tuple(row[f] for f in fields) for row in scores] == [tuple(row[f] for f in fields) for row in rows]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""运势日历：被截断或损坏的文件回退到实时计算"""
+
+import datetime
+
+import pytest
+
+from config import USER_PROFILE
+from fortune_calendar import build_calendar, open_calendar
+from synthesizer import FortuneSynthesizer
+
+START = datetime.date(2026, 5, 1)
+
+
+@pytest.fixture
+def calendar_path(tmp_path):
+    path = str(tmp_path / "fortune_calendar.bin")
+    build_calendar(path, START, 30)
+    return path
+
+
+def _truncate(path, size):
+    with open(path, "r+b") as f:
+        f.truncate(size)
+
+
+def test_valid_calendar_opens(calendar_path):
+    calendar = open_calendar(calendar_path)
+    try:
+        assert calendar.covers(START + datetime.timedelta(days=29))
+    finally:
+        calendar.close()
+
+
+@pytest.mark.parametrize("size", [0, 10, 40, 1000])
+def test_truncated_calendar_falls_back(calendar_path, size):
+    _truncate(calendar_path, size)
+    assert open_calendar(calendar_path) is None
+
+
+def test_synthesize_without_calendar_matches(calendar_path):
+    expected = FortuneSynthesizer(USER_PROFILE).synthesize(START)
+    _truncate(calendar_path, 40)
+    assert FortuneSynthesizer(USER_PROFILE, calendar=open_calendar(calendar_path)).synthesize(START) == expected
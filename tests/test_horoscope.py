@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""星座运势缓存：返回给调用方的结果可以修改，不影响缓存和其他用户"""
+
+import copy
+import datetime
+
+from config import USER_PROFILE
+from horoscope import HoroscopeGenerator
+from synthesizer import FortuneSynthesizer
+
+TARGET = datetime.date(2026, 5, 1)
+
+
+def _scribble(fortune):
+    fortune["lucky_yi"].append("篡改")
+    fortune["lucky_ji"].clear()
+    fortune["traits"][0] = "篡改"
+    fortune["fortune_level"] = "篡改"
+
+
+def test_daily_fortune_mutation_does_not_leak():
+    generator = HoroscopeGenerator()
+    expected = copy.deepcopy(generator.get_daily_fortune(TARGET))
+    _scribble(generator.get_daily_fortune(TARGET))
+    assert generator.get_daily_fortune(TARGET) == expected
+
+
+def test_all_fortunes_mutation_does_not_leak():
+    generator = HoroscopeGenerator()
+    expected = copy.deepcopy(generator.get_all_fortunes(TARGET))
+    for fortune in generator.get_all_fortunes(TARGET).values():
+        _scribble(fortune)
+    assert generator.get_all_fortunes(TARGET) == expected
+    assert generator.get_daily_fortune(TARGET) == expected[USER_PROFILE["star_sign"]]
+
+
+def test_report_mutation_does_not_leak_to_other_subscribers():
+    synthesizer = FortuneSynthesizer()
+    profiles = [dict(USER_PROFILE, id=f"user{i}") for i in range(3)]
+    first, second, third = synthesizer.synthesize_many(profiles, TARGET)
+    expected = copy.deepcopy(second["horoscope"])
+    _scribble(first["horoscope"])
+    assert second["horoscope"] == third["horoscope"] == expected
+    assert synthesizer.synthesize(TARGET)["horoscope"] == expected
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""压测：经由生产推送路径（报告缓存 → 发件箱 → ChannelRouter）把消息送到模拟服务"""
+
+import pytest
+
+from loadtest import LoadTest
+from metrics import STAGE_SECONDS
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_loadtest_delivers_through_production_path(workers):
+    synthesized = STAGE_SECONDS.labels("synthesize").count
+    stats = LoadTest(30, workers=workers, chunk_size=8, seed=1, rate_limit=0).run()
+    assert stats["count"] == stats["success"] == 30
+    assert stats["failed"] == 0
+    assert stats["requests"] == 30
+    assert stats["time_to_last_s"] is not None
+    # 合成经由 ReportCache（流水线时由工作进程带回耗时）
+    assert STAGE_SECONDS.labels("synthesize").count > synthesized
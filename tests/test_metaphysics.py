@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""预计算的 60 甲子 × 12 生肖分析表与逐项计算一致"""
+
+import pytest
+
+from config import USER_PROFILE
+from metaphysics import check_profile_table
+
+
+@pytest.mark.parametrize("profile", [
+    None,
+    dict(USER_PROFILE, zodiac="龙", favored_elements=["金", "水"], **{"忌用元素": ["火"]}),
+    dict(USER_PROFILE, zodiac="猪", favored_elements=["土"], **{"忌用元素": ["木", "金"]}),
+    dict(USER_PROFILE, zodiac="鼠", favored_elements=[], **{"忌用元素": []}),
+])
+def test_profile_table_matches_direct_analysis(profile):
+    assert check_profile_table(profile) == []
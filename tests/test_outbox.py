@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""发件箱：订阅用户标识、去重"""
+
+import datetime
+import threading
+import time
+
+import pytest
+
+from config import USER_PROFILE
+from outbox import Outbox, subscriber_id, identified
+from pipeline import PipelineRunner
+from ratelimit import RetryPolicy
+from staging import StagedDelivery
+
+TARGET = datetime.date(2026, 5, 1)
+
+
+class _FlakyPusher:
+    """前 failures 次发送返回可重试的失败"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.sent_at = []
+
+    def push_many(self, messages):
+        results = []
+        for _ in messages:
+            self.sent_at.append(time.monotonic())
+            if len(self.sent_at) <= self.failures:
+                results.append({"success": False, "message": "推送异常: timeout", "status": None})
+            else:
+                results.append({"success": True})
+        return {"results": results}
+
+
+class _RecordingPusher:
+    def __init__(self):
+        self.messages = []
+
+    def push_many(self, messages):
+        self.messages.extend(messages)
+        return {"results": [{"success": True} for _ in messages],
+                "stats": {"success": len(messages), "failed": 0}}
+
+
+def _webhook_users(count):
+    # 文件中读入的用户都继承 USER_PROFILE 的 name，只有地址不同
+    return [dict(USER_PROFILE, channel="webhook", webhook_url=f"https://hooks.example.com/{i}", birth_year=1960 + i)
+            for i in range(count)]
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    with Outbox(str(tmp_path / "outbox.db")) as box:
+        yield box
+
+
+def test_subscriber_id_prefers_id_then_address():
+    assert subscriber_id({"id": 42, "sckey": "SCT1"}) == "42"
+    assert subscriber_id({"name": "用户", "sckey": "SCT1"}) == "SCT1"
+    assert subscriber_id({"name": "用户", "channel": "webhook", "webhook_url": "https://a"}) == "webhook:https://a"
+    assert subscriber_id({"name": "用户", "channel": "email", "email": "a@example.com"}) == "email:a@example.com"
+
+
+def test_subscriber_id_never_falls_back_to_name():
+    assert subscriber_id({"name": "用户"}) is None
+    assert subscriber_id(dict(USER_PROFILE, channel="webhook")) is None
+    skipped = []
+    kept = list(identified([{"name": "用户"}, {"name": "用户", "sckey": "SCT1"}], skipped))
+    assert kept == [{"name": "用户", "sckey": "SCT1"}]
+    assert skipped == [{"name": "用户"}]
+
+
+def test_pipeline_delivers_every_nameless_webhook_subscriber(outbox):
+    pusher = _RecordingPusher()
+    runner = PipelineRunner(pusher, workers=1, chunk_size=2, outbox=outbox)
+    stats = runner.run(_webhook_users(3) + [dict(USER_PROFILE)], TARGET)
+    assert stats["success"] == 3
+    assert stats["rejected"] == 1
+    assert sorted(m["address"] for m in pusher.messages) == [f"https://hooks.example.com/{i}" for i in range(3)]
+    assert outbox.stats(TARGET)["delivered"] == 3
+
+    # 重跑：已送达的用户不再生成和发送
+    rerun = PipelineRunner(pusher, workers=1, chunk_size=2, outbox=outbox).run(_webhook_users(3), TARGET)
+    assert rerun["skipped"] == 3
+    assert len(pusher.messages) == 3
+
+
+def test_staged_delivery_keeps_nameless_subscribers_apart(outbox):
+    pusher = _RecordingPusher()
+    staged = StagedDelivery(_webhook_users(3), pusher, outbox=outbox)
+    assert staged.prepare(TARGET) == 3
+    assert staged.deliver(TARGET)["delivered"] == 3
+    assert len({m["subscriber"] for m in pusher.messages}) == 3
+
+
+def test_enqueue_dedupes_same_subscriber_and_content(outbox):
+    message = {"subscriber": "SCT1", "title": "标题", "content": "正文", "short": "摘要", "sckey": "SCT1"}
+    assert outbox.enqueue([message], TARGET) == 1
+    assert outbox.enqueue([message], TARGET) == 0
+    assert outbox.enqueue([dict(message, subscriber="SCT2")], TARGET) == 1
+    assert outbox.existing(["SCT1", "SCT2", "SCT3"], TARGET) == {"SCT1", "SCT2"}
+
+
+MESSAGE = {"subscriber": "SCT1", "title": "标题", "content": "正文", "short": "摘要", "sckey": "SCT1"}
+
+
+def _outbox(tmp_path, delay):
+    return Outbox(str(tmp_path / "outbox.db"),
+                  retry_policy=RetryPolicy(base_delay=delay, max_delay=delay, jitter=False))
+
+
+def test_nacked_message_is_not_reclaimed_before_due(tmp_path):
+    with _outbox(tmp_path, 0.3) as box:
+        box.enqueue([MESSAGE], TARGET)
+        [message] = box.claim("w1", target_date=TARGET)
+        box.nack("w1", message["id"], "timeout", attempts=message["attempts"])
+
+        assert box.claim("w1", target_date=TARGET) == []
+        assert box.next_attempt(TARGET) is not None
+        time.sleep(0.35)
+        [again] = box.claim("w1", target_date=TARGET)
+        assert again["id"] == message["id"]
+        assert again["attempts"] == 2
+
+
+def test_retry_after_overrides_backoff(tmp_path):
+    policy = RetryPolicy(base_delay=0, max_delay=120, jitter=False)
+    with Outbox(str(tmp_path / "outbox.db"), retry_policy=policy) as box:
+        box.enqueue([MESSAGE], TARGET)
+        [message] = box.claim("w1")
+        box.nack("w1", message["id"], "429", attempts=1, retry_after=60)
+        assert box.claim("w1") == []
+        assert box.next_attempt() - time.time() > 55
+
+
+def test_drain_waits_for_backoff_then_delivers(tmp_path):
+    with _outbox(tmp_path, 0.2) as box:
+        box.enqueue([MESSAGE], TARGET)
+        pusher = _FlakyPusher(failures=2)
+        totals = box.drain(pusher, worker_id="w1", target_date=TARGET)
+        assert totals == {"delivered": 1, "failed": 0, "retried": 2}
+        gaps = [b - a for a, b in zip(pusher.sent_at, pusher.sent_at[1:])]
+        assert all(gap >= 0.19 for gap in gaps)
+
+
+def test_drain_without_wait_leaves_backed_off_messages_pending(tmp_path):
+    with _outbox(tmp_path, 60) as box:
+        box.enqueue([MESSAGE], TARGET)
+        totals = box.drain(_FlakyPusher(failures=1), worker_id="w1", target_date=TARGET, wait=False)
+        assert totals == {"delivered": 0, "failed": 0, "retried": 1}
+        assert box.stats(TARGET)["pending"] == 1
+        assert box.requeue_failed(TARGET) == 0
+
+
+def test_close_closes_connections_of_all_threads(tmp_path):
+    box = Outbox(str(tmp_path / "outbox.db"))
+    thread = threading.Thread(target=lambda: box.enqueue([MESSAGE], TARGET))
+    thread.start()
+    thread.join()
+    connections = list(box._connections)
+    assert len(connections) == 2
+
+    box.close()
+    for conn in connections:
+        with pytest.raises(Exception, match="closed"):
+            conn.execute("SELECT 1")
+    # 关闭后再次使用会重新连接
+    assert box.stats(TARGET)["pending"] == 1
+    box.close()
+
+
+class _Router(_RecordingPusher):
+    """代替 ChannelRouter（单用户模式只用到 push_many 和 close）"""
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def once_env(tmp_path, monkeypatch):
+    import channels
+    import config
+    path = str(tmp_path / "outbox.db")
+    routers = []
+
+    def router():
+        routers.append(_Router())
+        return routers[-1]
+
+    monkeypatch.setattr(config, "OUTBOX_PATH", path)
+    monkeypatch.setattr(channels, "ChannelRouter", router)
+    target = datetime.date.today() + datetime.timedelta(days=1)
+    box = Outbox(path)
+    box.enqueue([{"subscriber": subscriber_id(USER_PROFILE) or "default", "title": "标题", "content": "正文",
+                  "short": "摘要", "sckey": None}], target)
+    yield box, routers, target
+    box.close()
+
+
+def test_once_rerun_releases_its_own_interrupted_claim(once_env):
+    import main
+    from config import OUTBOX_ONCE_WORKER
+    box, routers, target = once_env
+    # 上次运行领取后在发送途中中断，租约尚未过期
+    assert len(box.claim(OUTBOX_ONCE_WORKER, target_date=target)) == 1
+
+    result = main.run_daily_fortune()
+    assert result["success"] and not result.get("in_progress")
+    assert len(routers[-1].messages) == 1
+    assert box.stats(target)["delivered"] == 1
+
+
+def test_once_rerun_treats_other_workers_lease_as_in_progress(once_env):
+    import main
+    box, routers, target = once_env
+    assert len(box.claim("drain:1234", target_date=target)) == 1
+
+    result = main.run_daily_fortune()
+    assert result["success"] and result["in_progress"]
+    assert all(not router.messages for router in routers)
+    assert box.stats(target)["claimed"] == 1
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""多进程流水线：正常推送与推送阶段异常"""
+
+import datetime
+import threading
+
+import pytest
+
+from config import USER_PROFILE
+from pipeline import PipelineRunner
+
+TARGET = datetime.date(2026, 5, 1)
+
+
+def _profiles(count):
+    return [dict(USER_PROFILE, id=f"user{i}", sckey=f"KEY{i}", birth_year=1960 + i % 40)
+            for i in range(count)]
+
+
+class _RecordingPusher:
+    def __init__(self):
+        self.messages = []
+
+    def push_many(self, messages):
+        self.messages.extend(messages)
+        results = [{"success": True} for _ in messages]
+        return {"results": results, "stats": {"success": len(messages), "failed": 0}}
+
+
+class _BrokenPusher:
+    def push_many(self, messages):
+        raise RuntimeError("pusher down")
+
+
+def _run_with_deadline(runner, profiles, seconds=60):
+    """在线程中运行，超时未返回视为卡死"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["stats"] = runner.run(profiles, TARGET)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "流水线在推送阶段异常后卡死"
+    return outcome
+
+
+def test_pipeline_pushes_every_subscriber_in_order():
+    pusher = _RecordingPusher()
+    runner = PipelineRunner(pusher, workers=2, chunk_size=5, queue_size=1)
+    outcome = _run_with_deadline(runner, iter(_profiles(23)))
+    assert "error" not in outcome
+    assert outcome["stats"]["pushed"] == outcome["stats"]["success"] == 23
+    assert sorted(m["subscriber"] for m in pusher.messages) == sorted(f"user{i}" for i in range(23))
+
+
+def test_push_stage_error_is_raised_instead_of_blocking():
+    # 队列容量 1、分片远多于队列，推送阶段退出后生产者必须停止等待
+    runner = PipelineRunner(_BrokenPusher(), workers=1, chunk_size=1, queue_size=1)
+    outcome = _run_with_deadline(runner, _profiles(20))
+    assert isinstance(outcome.get("error"), RuntimeError)
+    assert str(outcome["error"]) == "pusher down"
+
+
+def test_push_stage_error_on_last_chunk_is_raised():
+    runner = PipelineRunner(_BrokenPusher(), workers=1, chunk_size=10, queue_size=4)
+    with pytest.raises(RuntimeError, match="pusher down"):
+        runner.run(_profiles(3), TARGET)
+
+
+def _stage_counts():
+    from metrics import STAGE_SECONDS
+    return {stage: STAGE_SECONDS.labels(stage).count for stage in ("synthesize", "format", "push")}
+
+
+def test_worker_stage_timings_reach_parent_registry():
+    before = _stage_counts()
+    runner = PipelineRunner(_RecordingPusher(), workers=2, chunk_size=5)
+    stats = runner.run(_profiles(23), TARGET)
+    after = _stage_counts()
+    assert stats["chunks"] == 5
+    # 每个分片的合成、渲染耗时由工作进程带回，在主进程的注册表中记录
+    assert after["synthesize"] - before["synthesize"] == 5
+    assert after["format"] - before["format"] == 5
+    assert after["push"] - before["push"] == 5
+
+
+def test_batch_writes_metrics_textfile(tmp_path, monkeypatch):
+    import channels
+    import config
+    import main
+
+    class _Router(_RecordingPusher):
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+    path = tmp_path / "fortune.prom"
+    monkeypatch.setattr(channels, "ChannelRouter", _Router)
+    monkeypatch.setattr(config, "OUTBOX_PATH", str(tmp_path / "outbox.db"))
+    monkeypatch.setattr(config, "SUBSCRIBERS", _profiles(3))
+    monkeypatch.setattr(main, "METRICS_TEXTFILE", str(path))
+
+    stats = main.run_batch(TARGET, workers=1, chunk_size=2)
+    assert stats["success"] == 3
+    text = path.read_text(encoding="utf-8")
+    for stage in ("synthesize", "format", "push"):
+        assert f'fortune_stage_seconds_count{{stage="{stage}"}}' in text
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""分阶段性能分析：多线程同时采集（3.12 起只能同时启用一个 Profile）"""
+
+import datetime
+import os
+import pstats
+import sys
+import threading
+import time
+
+from profiler import StageProfiler, TIMED_STAGES, code_key
+from synthesizer import FortuneSynthesizer
+
+STAGES = ("analyze_day", "get_daily_fortune", "_combine_analysis")
+
+
+def _synthesize(days, errors):
+    try:
+        synthesizer = FortuneSynthesizer()
+        start = datetime.date(2026, 1, 1)
+        for i in range(days):
+            synthesizer.synthesize(start + datetime.timedelta(days=i))
+    except Exception as e:
+        errors.append(e)
+
+
+def _profile_threads(threads=4, days=50):
+    errors = []
+    with StageProfiler() as profiler:
+        workers = [threading.Thread(target=_synthesize, args=(days, errors)) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    assert errors == []
+    return profiler
+
+
+def test_concurrent_threads_are_profiled():
+    profiler = _profile_threads(threads=4, days=50)
+    summary = profiler.summary()
+    assert set(STAGES) <= set(summary)
+    assert summary["get_daily_fortune"]["calls"] == 200
+    assert summary["_combine_analysis"]["calls"] == 200
+    assert all(info["top"] for info in summary.values())
+
+
+def test_stage_stats_only_contain_calls_under_stage_entries():
+    profiler = _profile_threads(threads=3, days=20)
+    for stage in STAGES:
+        stats = profiler.stats(stage)
+        roots = {func for func, (_, _, _, _, callers) in stats.stats.items() if not callers}
+        assert roots and roots <= profiler._entries[stage]
+    entry = code_key(FortuneSynthesizer.__dict__["_combine_analysis"])
+    assert profiler._entries["_combine_analysis"] == {entry}
+
+
+def test_methods_are_restored_after_stop():
+    original = FortuneSynthesizer.__dict__["_combine_analysis"]
+    with StageProfiler():
+        assert FortuneSynthesizer.__dict__["_combine_analysis"] is not original
+    assert FortuneSynthesizer.__dict__["_combine_analysis"] is original
+
+
+def test_write_outputs_pstats_and_collapsed_stacks(tmp_path):
+    profiler = _profile_threads(threads=2, days=10)
+    paths = profiler.write(str(tmp_path))
+    names = {os.path.basename(path) for path in paths}
+    assert {"analyze_day.pstats", "analyze_day.collapsed", "all.collapsed"} <= names
+
+    assert pstats.Stats(str(tmp_path / "get_daily_fortune.pstats")).total_calls > 0
+    lines = (tmp_path / "all.collapsed").read_text(encoding="utf-8").splitlines()
+    assert lines
+    for line in lines:
+        stack, weight = line.rsplit(" ", 1)
+        assert stack.split(";")[0] in STAGES
+        assert int(weight) > 0
+
+
+class _Network:
+    """模拟等待网络的推送"""
+
+    def push(self, seconds):
+        time.sleep(seconds)
+
+
+def test_timed_stage_runs_concurrently_without_profiling():
+    stages = {"push": [(__name__, "_Network", "push")]}
+    with StageProfiler(stages=stages, timed={"push"}) as profiler:
+        network = _Network()
+        workers = [threading.Thread(target=network.push, args=(0.3,)) for _ in range(4)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+    # 只计时的阶段不持采集锁，4 个线程的等待互相重叠
+    assert elapsed < 0.9
+    summary = profiler.summary()["push"]
+    assert summary["calls"] == 4 and summary["timed"] and summary["top"] == []
+    assert summary["seconds"] >= 1.2
+    assert profiler.stats("push") is None
+
+
+def test_push_is_only_timed_on_python_312():
+    assert ("push" in TIMED_STAGES) == (sys.version_info >= (3, 12))
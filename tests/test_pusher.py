@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""ServerChanPusher 请求结果解析与重试判定"""
+
+import pytest
+
+from pusher import ServerChanPusher
+from ratelimit import RetryPolicy
+
+
+class _Response:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.headers = {}
+
+    def json(self):
+        if isinstance(self.body, str):
+            raise ValueError("Expecting value: line 1 column 1 (char 0)")
+        return self.body
+
+
+class _Session:
+    """按顺序返回预设响应的假会话"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def post(self, url, data=None, timeout=None):
+        self.calls += 1
+        response = self.responses[min(self.calls, len(self.responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def close(self):
+        pass
+
+
+def _pusher(*responses):
+    pusher = ServerChanPusher(sckey="KEY", rate_limit=0,
+                              retry_policy=RetryPolicy(max_retries=3, base_delay=0, jitter=False))
+    pusher._session = _Session(*responses)
+    return pusher
+
+
+@pytest.mark.parametrize("status", [400, 401, 403, 404])
+def test_non_json_4xx_keeps_status_and_is_not_retried(status):
+    pusher = _pusher(_Response(status, "<html>Forbidden</html>"))
+    result = pusher.push("标题", "内容")
+    assert result["success"] is False
+    assert result["status"] == status
+    assert result["attempts"] == 1
+    assert pusher.session.calls == 1
+
+
+def test_non_json_5xx_is_retried():
+    pusher = _pusher(_Response(502, "<html>Bad Gateway</html>"), _Response(200, {"code": 0}))
+    result = pusher.push("标题", "内容")
+    assert result["success"] is True
+    assert result["attempts"] == 2
+
+
+def test_network_error_has_no_status_and_is_retried():
+    pusher = _pusher(ConnectionError("reset"), _Response(200, {"code": 0}))
+    result = pusher.push("标题", "内容")
+    assert result["success"] is True
+    assert result["attempts"] == 2
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""预编译模板与原 ServerChanPusher.format_fortune_message 的输出逐字一致"""
+
+import datetime
+import io
+
+from synthesizer import FortuneSynthesizer
+from templates import FortuneTemplate
+
+
+def _report(clash=None, harmony=None, do=("出行", "会友"), dont=("争执",), warnings=("注意休息",)):
+    meta = {"ganzhi": "甲子", "day_element": "木", "day_zodiac": "鼠"}
+    if clash:
+        meta["clash_warning"] = clash
+    if harmony:
+        meta["harmony_good"] = harmony
+    return {
+        "date": "2026-05-01",
+        "weekday": "星期五",
+        "user_info": {"zodiac": "兔", "star_sign": "金牛座", "element": "火"},
+        "metaphysics": meta,
+        "horoscope": {"fortune_level": "good"},
+        "final": {
+            "score": 72,
+            "lucky_color": {"color": "绿色", "reason": "木生火"},
+            "wearing_advice": "宜穿绿色",
+            "do_list": list(do),
+            "dont_list": list(dont),
+            "warnings": list(warnings),
+            "summary": "平稳的一天"
+        }
+    }
+
+
+# 以下期望值由改造前的 format_fortune_message 生成
+HEADER = """# 🔮 每日运势提醒
+
+**📅 2026-05-01 星期五**
+
+---
+
+## 👤 您的基本信息
+
+- **生肖**: 兔
+- **星座**: 金牛座
+- **五行**: 火
+
+---
+
+## 📊 今日运势
+
+**综合评分**: 72/100 🌟🌟🌟🌟
+
+### 干支信息
+- **干支**: 甲子
+- **当日五行**: 木
+- **当日生肖**: 鼠
+
+"""
+
+EXPECTED_CLASH = HEADER + """### ⚠️ 冲煞提醒
+今日冲鸡，谨慎行事
+
+
+
+---
+
+## 👗 穿衣指南
+
+### 🎨 幸运颜色: **绿色**
+
+> 木生火
+
+宜穿绿色
+
+---
+
+## ✅ 宜做事项
+
+- 出行
+- 会友
+
+---
+
+## ❌ 不宜做事项
+
+- 争执
+
+---
+
+## 💡 运势总结
+
+平稳的一天
+
+---
+
+*🐰 火兔每日运势 | 每日21:00自动推送*
+"""
+
+EXPECTED_HARMONY = HEADER + """
+### ✨ 运势提示
+今日三合，贵人相助
+
+
+---
+
+## 👗 穿衣指南
+
+### 🎨 幸运颜色: **绿色**
+
+> 木生火
+
+宜穿绿色
+
+---
+
+## ✅ 宜做事项
+
+- 出行
+- 会友
+
+---
+
+## ❌ 不宜做事项
+
+- 争执
+
+---
+
+## 💡 运势总结
+
+平稳的一天
+
+---
+
+*🐰 火兔每日运势 | 每日21:00自动推送*
+"""
+
+EXPECTED_EMPTY = HEADER + """
+
+
+---
+
+## 👗 穿衣指南
+
+### 🎨 幸运颜色: **绿色**
+
+> 木生火
+
+宜穿绿色
+
+---
+
+## ✅ 宜做事项
+
+
+
+---
+
+## ❌ 不宜做事项
+
+
+
+---
+
+## 💡 运势总结
+
+平稳的一天
+
+---
+
+*🐰 火兔每日运势 | 每日21:00自动推送*
+"""
+
+CASES = [
+    (_report(clash="今日冲鸡，谨慎行事"), EXPECTED_CLASH),
+    (_report(harmony="今日三合，贵人相助"), EXPECTED_HARMONY),
+    (_report(do=(), dont=(), warnings=()), EXPECTED_EMPTY),
+]
+
+
+def test_render_matches_baseline_message():
+    template = FortuneTemplate()
+    for report, expected in CASES:
+        assert template.render(report) == ("📅 2026-05-01 运势提醒 | 吉", expected, "幸运色绿色 | 评分72/100 | 吉")
+
+
+def test_render_into_reuses_buffer():
+    template = FortuneTemplate()
+    buffer = io.StringIO()
+    for report, expected in CASES:
+        buffer.seek(0)
+        buffer.truncate()
+        template.render_into(report, buffer)
+        assert buffer.getvalue() == expected
+
+
+def test_render_into_matches_render_content():
+    template = FortuneTemplate()
+    report = FortuneSynthesizer().synthesize(datetime.date(2026, 3, 1))
+    buffer = io.StringIO()
+    template.render_into(report, buffer)
+    assert buffer.getvalue() == template.render_content(report)
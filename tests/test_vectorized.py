@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""向量化引擎：评分与逐个合成一致（不同星座、生肖、喜忌五行混合）"""
+
+import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from config import USER_PROFILE
+from horoscope import HoroscopeGenerator
+from synthesizer import FortuneSynthesizer
+from vectorized import VectorizedAnalyzer
+
+ZODIACS = ["鼠", "牛", "虎", "兔", "龙", "蛇", "马", "羊", "猴", "鸡", "狗", "猪"]
+ELEMENT_SETS = [(["木", "火"], ["水", "土"]), (["金"], ["火"]), (["水", "木"], []), ([], ["金", "木"])]
+
+
+def _profiles():
+    signs = HoroscopeGenerator.STAR_SIGNS + ["未知星座"]
+    profiles = []
+    for i in range(40):
+        favored, avoided = ELEMENT_SETS[i % len(ELEMENT_SETS)]
+        profiles.append(dict(USER_PROFILE, id=f"user{i}", zodiac=ZODIACS[i % 12],
+                             star_sign=signs[i * 5 % len(signs)],
+                             favored_elements=favored, **{"忌用元素": avoided}))
+    return profiles
+
+
+def test_scores_match_synthesize_many():
+    profiles = _profiles()
+    assert len({p["star_sign"] for p in profiles}) > 10
+    engine = VectorizedAnalyzer()
+    start = datetime.date(2026, 3, 1)
+    dates = engine.date_range(start, 60)
+    result = engine.analyze(dates, profiles)
+    assert result["score"].shape == (60, len(profiles))
+
+    synthesizer = FortuneSynthesizer()
+    for i in range(60):
+        reports = synthesizer.synthesize_many(profiles, start + datetime.timedelta(days=i))
+        expected = [report["final"]["score"] for report in reports]
+        levels = [report["horoscope"]["fortune_level"] for report in reports]
+        assert result["score"][i].tolist() == expected
+        assert [engine.LEVELS[level] for level in result["horoscope_level"][i]] == levels
+
+
+def test_encoded_profiles_match_list_input():
+    profiles = _profiles()
+    engine = VectorizedAnalyzer()
+    dates = engine.date_range(datetime.date(2026, 3, 1), 10)
+    encoded = engine.encode_profiles(profiles)
+    levels = engine.horoscope_levels(dates)
+    assert np.array_equal(engine.analyze(dates, encoded, levels)["score"],
+                          engine.analyze(dates, profiles)["score"])
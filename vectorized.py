@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+向量化运势计算模块
+基于 NumPy 一次性计算大量日期 × 大量用户的干支、五行、冲煞三合和综合评分
+结果与 MetaphysicsAnalyzer / FortuneSynthesizer 的逐个计算一致
+"""
+
+import datetime
+import numpy as np
+
+from config import USER_PROFILE, ZODIAC_CLASH, ZODIAC_HARMONY
+from horoscope import HoroscopeGenerator
+from rules import SCORE_TABLE
+
+
+class VectorizedAnalyzer:
+    """向量化运势分析器"""
+
+    # 天干顺序与 MetaphysicsAnalyzer.get_daily_ganzhi 一致（1900-01-01 为庚）
+    STEMS = ["庚", "辛", "壬", "癸", "甲", "乙", "丙", "丁", "戊", "己"]
+    BRANCHES = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
+    ZODIACS = ["鼠", "牛", "虎", "兔", "龙", "蛇", "马", "羊", "猴", "鸡", "狗", "猪"]
+    ELEMENTS = ["木", "火", "土", "金", "水"]
+
+    # 运势等级编码
+    LEVELS = ["excellent", "good", "normal", "challenging"]
+    # 评分表 [等级, 关系]，来自 rules.SCORE_TABLE
+    SCORE_TABLE = np.array(SCORE_TABLE, dtype=np.int16)
+
+    BASE_DATE = np.datetime64("1900-01-01", "D")
+
+    def __init__(self):
+        element_code = {e: i for i, e in enumerate(self.ELEMENTS)}
+        zodiac_code = {z: i for i, z in enumerate(self.ZODIACS)}
+        self.element_code = element_code
+        self.zodiac_code = zodiac_code
+        # 星座编码（星座运势等级按星座抽取），未知星座在 encode_profiles 时追加
+        self.star_signs = list(HoroscopeGenerator.STAR_SIGNS)
+        self.sign_code = {s: i for i, s in enumerate(self.star_signs)}
+
+        # 天干索引 -> 五行编码
+        stem_elements = {
+            "甲": "木", "乙": "木", "丙": "火", "丁": "火",
+            "戊": "土", "己": "土", "庚": "金", "辛": "金",
+            "壬": "水", "癸": "水"
+        }
+        self.stem_element = np.array(
+            [element_code[stem_elements[s]] for s in self.STEMS], dtype=np.int8
+        )
+
+        # 冲煞 / 三合矩阵: [用户生肖, 当日生肖]
+        self.clash_matrix = np.zeros((12, 12), dtype=bool)
+        self.harmony_matrix = np.zeros((12, 12), dtype=bool)
+        for user_z, days in ZODIAC_CLASH.items():
+            for day_z in days:
+                self.clash_matrix[zodiac_code[user_z], zodiac_code[day_z]] = True
+        for user_z, days in ZODIAC_HARMONY.items():
+            for day_z in days:
+                self.harmony_matrix[zodiac_code[user_z], zodiac_code[day_z]] = True
+
+    def to_day_numbers(self, dates):
+        """
+        将日期序列转换为距 1900-01-01 的天数数组
+        支持 datetime.date 列表或 numpy datetime64 数组
+        """
+        arr = np.asarray(dates)
+        if arr.dtype == object:
+            arr = arr.astype("datetime64[D]")
+        return (arr.astype("datetime64[D]") - self.BASE_DATE).astype(np.int64)
+
+    def date_range(self, start_date, days):
+        """生成从 start_date 开始连续 days 天的 datetime64 数组"""
+        return np.datetime64(start_date, "D") + np.arange(days)
+
+    def encode_profiles(self, profiles):
+        """
+        将用户信息列表编码为数组
+
+        Returns:
+            tuple: (生肖编码, 喜用神位掩码, 忌用元素位掩码, 星座编码)
+        """
+        zodiacs = np.empty(len(profiles), dtype=np.int8)
+        favored = np.zeros(len(profiles), dtype=np.uint8)
+        avoided = np.zeros(len(profiles), dtype=np.uint8)
+        signs = np.empty(len(profiles), dtype=np.int16)
+        for i, profile in enumerate(profiles):
+            zodiacs[i] = self.zodiac_code[profile["zodiac"]]
+            sign = profile["star_sign"]
+            if sign not in self.sign_code:
+                self.sign_code[sign] = len(self.star_signs)
+                self.star_signs.append(sign)
+            signs[i] = self.sign_code[sign]
+            for e in profile["favored_elements"]:
+                favored[i] |= 1 << self.element_code[e]
+            for e in profile["忌用元素"]:
+                avoided[i] |= 1 << self.element_code[e]
+        return zodiacs, favored, avoided, signs
+
+    def ganzhi(self, dates):
+        """
+        批量计算干支
+
+        Returns:
+            dict: stem / branch 索引、day_element 五行编码、day_zodiac 生肖编码
+        """
+        days = self.to_day_numbers(dates)
+        stem = (days % 10).astype(np.int8)
+        branch = (days % 12).astype(np.int8)
+        return {
+            "stem": stem,
+            "branch": branch,
+            "day_element": self.stem_element[stem],
+            "day_zodiac": branch
+        }
+
+    def horoscope_levels(self, dates, signs=None):
+        """
+        计算每个日期 × 每个星座的运势等级编码 (D, S)
+        星座运势依赖按 日期 + 星座 播种的随机数，只能逐个抽取，但与用户数量无关
+
+        Args:
+            signs: 星座名列表，默认 self.star_signs（列顺序与星座编码一致）
+        """
+        generator = HoroscopeGenerator()
+        signs = self.star_signs if signs is None else signs
+        days = np.asarray(dates).astype("datetime64[D]")
+        levels = np.empty((len(days), len(signs)), dtype=np.int8)
+        for i, d in enumerate(days.tolist()):
+            for j, sign in enumerate(signs):
+                # draw() 的第一项即 FORTUNE_LEVELS 下标，与 LEVELS 顺序一致
+                levels[i, j] = generator.draw(d, sign)[0]
+        return levels
+
+    def analyze(self, dates, profiles=None, horo_levels=None):
+        """
+        批量分析日期 × 用户
+
+        Args:
+            dates: 日期序列 (D,)
+            profiles: 用户信息列表 (U,)，或 encode_profiles 返回的数组元组；默认 USER_PROFILE
+            horo_levels: horoscope_levels 返回的日期 × 星座等级编码 (D, S)，为空时计算
+
+        Returns:
+            dict: 日期维度数组 (D,) 与日期 × 用户维度数组 (D, U)
+        """
+        if profiles is None:
+            profiles = [USER_PROFILE]
+        if isinstance(profiles, tuple):
+            zodiacs, favored, avoided, signs = profiles
+        else:
+            zodiacs, favored, avoided, signs = self.encode_profiles(profiles)
+
+        result = self.ganzhi(dates)
+        if horo_levels is None:
+            horo_levels = self.horoscope_levels(dates)
+        # 按每个用户的星座取出当日等级 (D, U)
+        horo_levels = np.asarray(horo_levels, dtype=np.int8)[:, signs]
+
+        day_element = result["day_element"][:, None]
+        day_zodiac = result["day_zodiac"][:, None]
+        element_bit = (1 << day_element.astype(np.uint8)).astype(np.uint8)
+
+        is_clash = self.clash_matrix[zodiacs[None, :], day_zodiac]
+        is_harmony = self.harmony_matrix[zodiacs[None, :], day_zodiac]
+        is_favored = (favored[None, :] & element_bit) != 0
+        is_avoided = (avoided[None, :] & element_bit) != 0
+
+        # 关系序号与 rules.RELATIONS 一致（三合 > 冲煞 > 喜用 > 忌用 > 其他），评分直接查编译好的评分表
+        relation = np.select(
+            [is_harmony, is_clash, is_favored, is_avoided],
+            [0, 1, 2, 3],
+            default=4
+        )
+        score = self.SCORE_TABLE[horo_levels, relation]
+
+        result.update({
+            "horoscope_level": horo_levels,
+            "is_clash": is_clash,
+            "is_harmony": is_harmony,
+            "is_favored": is_favored,
+            "is_avoided": is_avoided,
+            "score": score
+        })
+        return result
+
+
+# 测试
+if __name__ == "__main__":
+    import time
+    from metaphysics import MetaphysicsAnalyzer
+    from synthesizer import FortuneSynthesizer
+
+    engine = VectorizedAnalyzer()
+    start = datetime.date.today() + datetime.timedelta(days=1)
+    dates = engine.date_range(start, 365)
+
+    t0 = time.perf_counter()
+    result = engine.analyze(dates)
+    elapsed = time.perf_counter() - t0
+    print(f"向量化计算 {len(dates)} 天: {elapsed * 1000:.1f} ms")
+
+    # 与逐个计算对比
+    analyzer = MetaphysicsAnalyzer()
+    synthesizer = FortuneSynthesizer()
+    mismatches = 0
+    for i, d in enumerate(dates.tolist()):
+        ganzhi = engine.STEMS[result["stem"][i]] + engine.BRANCHES[result["branch"][i]]
+        report = synthesizer.synthesize(d)
+        if ganzhi != analyzer.get_daily_ganzhi(d) or result["score"][i, 0] != report["final"]["score"]:
+            mismatches += 1
+    print(f"与逐个计算不一致: {mismatches}")
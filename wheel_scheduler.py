@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+按用户时区推送的调度模块
+每个订阅用户有自己的时区和推送时间，待推送任务按分钟分桶放入时间轮（最小堆），
+守护进程只在下一个桶到期时醒来，同一桶内的用户作为一批发送
+"""
+
+import datetime
+import heapq
+import logging
+import threading
+import time
+from zoneinfo import ZoneInfo
+
+from config import PUSH_HOUR, PUSH_MINUTE, TIMEZONE
+
+
+logger = logging.getLogger(__name__)
+
+
+def subscriber_timezone(profile):
+    """用户时区，默认 config.TIMEZONE"""
+    return ZoneInfo(profile.get("timezone") or TIMEZONE)
+
+
+def next_push_time(profile, now=None):
+    """
+    计算用户下一次推送的时间
+
+    Args:
+        profile: 用户信息（timezone / push_hour / push_minute 可省略）
+        now: 当前时间（带时区），默认现在
+
+    Returns:
+        tuple: (推送时间 UTC datetime, 推送内容对应的用户当地日期)
+    """
+    tz = subscriber_timezone(profile)
+    now = (now or datetime.datetime.now(datetime.timezone.utc)).astimezone(tz)
+    hour = profile.get("push_hour", PUSH_HOUR)
+    minute = profile.get("push_minute", PUSH_MINUTE)
+
+    local = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if local <= now:
+        local = datetime.datetime.combine(
+            local.date() + datetime.timedelta(days=1),
+            datetime.time(hour, minute),
+            tzinfo=tz
+        )
+    # 当地时间推送时发送的是第二天的运势
+    return local.astimezone(datetime.timezone.utc), local.date() + datetime.timedelta(days=1)
+
+
+class TimingWheel:
+    """
+    分桶的时间轮
+    同一时间桶（默认 60 秒）内的任务合并为一批，桶的到期时间存放在最小堆中
+    """
+
+    def __init__(self, resolution=60):
+        self.resolution = resolution
+        self._heap = []
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(items) for items in self._buckets.values())
+
+    def add(self, due, item):
+        """
+        添加任务
+
+        Args:
+            due: 到期时间（UTC 时间戳，秒）
+            item: 任务内容
+        """
+        bucket = int(due // self.resolution)
+        with self._lock:
+            items = self._buckets.get(bucket)
+            if items is None:
+                items = self._buckets[bucket] = []
+                heapq.heappush(self._heap, bucket)
+            items.append(item)
+
+    def next_due(self):
+        """最近一个桶的到期时间戳，没有任务时返回 None"""
+        with self._lock:
+            if not self._heap:
+                return None
+            return self._heap[0] * self.resolution
+
+    def pop_due(self, now):
+        """取出所有已到期的桶，返回 [(到期时间戳, 任务列表)]"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0] * self.resolution <= now:
+                bucket = heapq.heappop(self._heap)
+                due.append((bucket * self.resolution, self._buckets.pop(bucket)))
+        return due
+
+
+class WheelScheduler:
+    """
+    按用户时区推送的调度器
+
+    Args:
+        subscribers: 订阅用户列表
+        deliver: 批量推送回调 deliver(profiles, target_date)，同一批次同一目标日期
+        resolution: 时间桶大小（秒）
+    """
+
+    def __init__(self, subscribers, deliver, resolution=60):
+        self.subscribers = list(subscribers)
+        self.deliver = deliver
+        self.wheel = TimingWheel(resolution)
+        self._stop = threading.Event()
+
+    def schedule_all(self, now=None):
+        """为所有用户安排下一次推送"""
+        for index in range(len(self.subscribers)):
+            self._schedule(index, now)
+
+    def _schedule(self, index, now=None):
+        due, target_date = next_push_time(self.subscribers[index], now)
+        self.wheel.add(due.timestamp(), (index, target_date))
+
+    def run_due(self, now=None):
+        """
+        执行所有已到期的批次并重新安排下一次推送
+
+        Returns:
+            int: 本次推送的用户数
+        """
+        now_ts = time.time() if now is None else now.timestamp()
+        delivered = 0
+        for due_ts, items in self.wheel.pop_due(now_ts):
+            # 同一时间桶内按目标日期分组
+            groups = {}
+            for index, target_date in items:
+                groups.setdefault(target_date, []).append(index)
+
+            for target_date, indexes in groups.items():
+                profiles = [self.subscribers[i] for i in indexes]
+                logger.info(f"⏰ 批次 {datetime.datetime.fromtimestamp(due_ts, datetime.timezone.utc):%H:%M} UTC: "
+                            f"{len(profiles)} 位用户, 目标日期 {target_date}")
+                try:
+                    self.deliver(profiles, target_date)
+                except Exception as e:
+                    logger.error(f"❌ 批次推送出错: {str(e)}")
+                delivered += len(profiles)
+
+            # 推送时间之后重新安排，避免同一分钟内重复
+            after = datetime.datetime.fromtimestamp(due_ts + self.wheel.resolution, datetime.timezone.utc)
+            for index, _ in items:
+                self._schedule(index, after)
+        return delivered
+
+    def run_forever(self):
+        """守护循环：睡眠到下一个桶到期，执行后继续"""
+        self.schedule_all()
+        while not self._stop.is_set():
+            next_due = self.wheel.next_due()
+            if next_due is None:
+                self._stop.wait(60)
+                continue
+            delay = next_due - time.time()
+            if delay > 0:
+                next_at = datetime.datetime.fromtimestamp(next_due, datetime.timezone.utc)
+                logger.info(f"下一批次: {next_at:%Y-%m-%d %H:%M} UTC（{delay / 60:.1f} 分钟后）")
+                if self._stop.wait(delay):
+                    break
+            self.run_due()
+
+    def stop(self):
+        self._stop.set()
+
+
+# 测试
+if __name__ == "__main__":
+    from config import USER_PROFILE
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    subscribers = [
+        dict(USER_PROFILE, name="上海", timezone="Asia/Shanghai"),
+        dict(USER_PROFILE, name="伦敦", timezone="Europe/London"),
+        dict(USER_PROFILE, name="纽约", timezone="America/New_York", push_hour=20, push_minute=30),
+        dict(USER_PROFILE, name="东京", timezone="Asia/Tokyo", push_hour=22, push_minute=0),
+    ]
+    for profile in subscribers:
+        due, target = next_push_time(profile)
+        print(f"{profile['name']}: {due:%Y-%m-%d %H:%M} UTC -> {target} 的运势")
+
+    scheduler = WheelScheduler(subscribers, lambda profiles, d: None)
+    scheduler.schedule_all()
+    print(f"时间轮中任务数: {len(scheduler.wheel)}")